@@ -8,7 +8,8 @@ from graphql.error import GraphQLError
 from sentry_sdk.integrations.ariadne import AriadneIntegration
 from sentry_sdk.integrations.flask import FlaskIntegration
 
-from .db import create_db_interface, db
+from .db import connection_pool_options, create_db_interface, db
+from .graph_ql.persisted_queries import persisted_query_registry
 from .models import MODELS
 
 
@@ -76,9 +77,13 @@ def main(*blueprints):
     # used for connecting to Google Cloud from GAE
     database_socket = os.getenv("MYSQL_SOCKET")
     replica_socket = os.getenv("MYSQL_REPLICA_SOCKET")
+    # Optionally re-use connections across requests
+    pool_options = connection_pool_options()
 
     db.database = create_db_interface(
-        unix_socket=database_socket, **db_connection_parameters
+        unix_socket=database_socket,
+        pool_options=pool_options,
+        **db_connection_parameters,
     )
     # In deployed environment: replica_socket is set
     # In integration tests: connect to same host/port as primary database
@@ -86,11 +91,19 @@ def main(*blueprints):
     # Note: for production, a replica MUST be configured via MYSQL_REPLICA_SOCKET or
     # MYSQL_HOST/MYSQL_PORT
     db.replica = create_db_interface(
-        unix_socket=replica_socket, **db_connection_parameters
+        unix_socket=replica_socket,
+        pool_options=pool_options,
+        **db_connection_parameters,
     )
 
     # Enable opening/closing DB connection before/after request
     db.register_handlers(app)
+    # Bind models to the router which switches to the replica in use_db_replica().
     # With a complete list of models no need to recursively bind dependencies
-    db.database.bind(MODELS, bind_refs=False, bind_backrefs=False)
+    db.router.initialize(db.database)
+    db.router.bind(MODELS, bind_refs=False, bind_backrefs=False)
+
+    # Optionally preload persisted queries, e.g. generated from front-end operations
+    if persisted_queries_file := os.getenv("PERSISTED_QUERIES_FILE"):
+        persisted_query_registry.load_manifest(persisted_queries_file)
     return app
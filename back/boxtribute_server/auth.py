@@ -1,10 +1,12 @@
 """Utilities for handling authentication"""
 
+import hashlib
 import json
 import os
-import subprocess
+import threading
+import time
 import urllib
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from functools import wraps
 from typing import Dict, Tuple
 
@@ -13,10 +15,12 @@ from flask import g, request
 from sentry_sdk import set_user as set_sentry_user
 
 from .exceptions import AuthenticationFailed
+from .jwks import jwks_url, public_key_cache
 
 JWT_CLAIM_PREFIX = "https://www.boxtribute.com"
 REQUIRED_CLAIMS = ("roles", "permissions", "base_ids", "organisation_id")
 GOD_ROLE = "boxtribute_god"
+DEFAULT_TOKEN_CACHE_SIZE = 1024
 
 
 def get_auth_string_from_header():
@@ -60,17 +64,27 @@ def get_token_from_auth_header(header_string):
     return token
 
 
-def get_public_key(domain):
+def get_public_key(domain, token=None):
+    """Return the public key for verifying the signature of the given token (or the
+    first signing key of the domain if no token is given). Use the AUTH0_PUBLIC_KEY
+    environment variable if set, otherwise the cached JWKS of the Auth0 domain.
+    """
     if key := os.getenv("AUTH0_PUBLIC_KEY"):
         return key
 
-    # https://community.auth0.com/t/how-to-get-public-key-pem-from-jwks-json/60355/4
-    response = urllib.request.urlopen(f"https://{domain}/pem")
-    cert = response.read()
-    p = subprocess.run(
-        ["openssl", "x509", "-pubkey", "-noout"], input=cert, capture_output=True
-    )
-    return p.stdout.decode()
+    key_id = None
+    if token is not None:
+        try:
+            key_id = jwt.get_unverified_header(token).get("kid")
+        except jwt.exceptions.PyJWTError as e:
+            raise AuthenticationFailed(
+                {
+                    "code": "invalid_header",
+                    "description": "Unable to parse authentication token.",
+                    "message": str(e),
+                },
+            )
+    return public_key_cache.get_key(jwks_url(domain), key_id)
 
 
 def decode_jwt(*, token, public_key, domain, audience):
@@ -133,15 +147,19 @@ class CurrentUser:
         max_beta_level=None,
         timezone=None,
     ):
-        """The `base_ids` field is a mapping of a permission name to a list of base IDs
-        that the permission is granted for. However it is never exposed directly to
-        avoid accidental manipulation.
+        """The `base_ids` field is a mapping of a permission name to base IDs that the
+        permission is granted for. They are stored as frozensets for constant-time
+        membership tests. However the mapping is never exposed directly to avoid
+        accidental manipulation.
         The `organisation_id` field is set to None for god users.
         """
         self._id = int(id)
         self._organisation_id = None if is_god else int(organisation_id)
         self._is_god = is_god
-        self._base_ids = base_ids or {}
+        self._base_ids = {
+            permission: frozenset(int(b) for b in bases)
+            for permission, bases in (base_ids or {}).items()
+        }
         self._max_beta_level = int(max_beta_level or 0)
         self._timezone = timezone
 
@@ -205,9 +223,6 @@ class CurrentUser:
                 if method in ["write", "create", "edit", "delete"]:
                     base_ids[f"{resource}:read"].update(ids)
 
-        # Convert to regular dict, using list for base IDs (set not JSON serializable)
-        base_ids = {permission: list(bases) for permission, bases in base_ids.items()}
-
         return cls(
             organisation_id=payload[f"{JWT_CLAIM_PREFIX}/organisation_id"],
             max_beta_level=payload.get(f"{JWT_CLAIM_PREFIX}/beta_user"),
@@ -218,8 +233,25 @@ class CurrentUser:
         )
 
     def authorized_base_ids(self, permission):
+        """Return frozenset of IDs of the bases that the given permission is granted
+        for. Raise KeyError if the permission is not granted at all.
+        """
         return self._base_ids[permission]
 
+    def has_permission(self, permission):
+        return permission in self._base_ids
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the user information."""
+        return {
+            "id": self._id,
+            "organisation_id": self._organisation_id,
+            "is_god": self._is_god,
+            "base_ids": {p: sorted(b) for p, b in self._base_ids.items()},
+            "max_beta_level": self._max_beta_level,
+            "timezone": self._timezone,
+        }
+
     @property
     def max_beta_level(self):
         return self._max_beta_level
@@ -241,6 +273,75 @@ class CurrentUser:
         return self._timezone
 
 
+class VerifiedTokenCache:
+    """Thread-safe cache mapping verified tokens to the decoded payload and the
+    CurrentUser derived from it. Entries are held until the token's expiration time
+    (tokens without `exp` claim are not cached). At most AUTH_TOKEN_CACHE_SIZE entries
+    (default: 1024, use 0 to disable the cache) are kept; the least recently used entry
+    is evicted first. Tokens are stored as hashes only.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def max_size():
+        return int(os.getenv("AUTH_TOKEN_CACHE_SIZE", DEFAULT_TOKEN_CACHE_SIZE))
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        """Return tuple of CurrentUser and payload of the given token, or None if the
+        token is not cached or has expired.
+        """
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1:]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def put(self, token, user, payload):
+        max_size = self.max_size()
+        expires_at = payload.get("exp")
+        if max_size <= 0 or expires_at is None or expires_at <= time.time():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, user, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def info(self):
+        """Return counters of cache hits and misses, and the number of entries."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+verified_token_cache = VerifiedTokenCache()
+
+
 def requires_auth(f):
     """Decorator for an endpoint that requires user authentication. In case of failure,
     an exception incl. HTTP status code is raised. Flask handles it and returns an error
@@ -248,20 +349,25 @@ def requires_auth(f):
 
     If authentication succeeds, user information is extracted from the JWT payload into
     the `user` attribute of the Flask g object. It is then available for the duration of
-    the request.
+    the request. Verified tokens are cached until they expire (see
+    `VerifiedTokenCache`).
     """
 
     @wraps(f)
     def decorated(*args, **kwargs):
         token = get_token_from_auth_header(get_auth_string_from_header())
-        domain = os.environ["AUTH0_DOMAIN"]
-        payload = decode_jwt(
-            token=token,
-            public_key=get_public_key(domain),
-            domain=domain,
-            audience=os.environ["AUTH0_AUDIENCE"],
-        )
-        g.user = CurrentUser.from_jwt(payload)
+        if cached := verified_token_cache.get(token):
+            g.user, payload = cached
+        else:
+            domain = os.environ["AUTH0_DOMAIN"]
+            payload = decode_jwt(
+                token=token,
+                public_key=get_public_key(domain, token),
+                domain=domain,
+                audience=os.environ["AUTH0_AUDIENCE"],
+            )
+            g.user = CurrentUser.from_jwt(payload)
+            verified_token_cache.put(token, g.user, payload)
         set_sentry_user({"id": g.user.id, "jwt_payload": payload})
 
         return f(*args, **kwargs)
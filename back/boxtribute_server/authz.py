@@ -77,7 +77,16 @@ def handle_unauthorized(f):
     return inner
 
 
-def _authorize(
+def is_authorized(*args: CurrentUser, **kwargs: Any) -> bool:
+    """Like `authorize()` but return False instead of raising a Forbidden exception if
+    the current user is not authorized. Meant for checks of individual items in lists
+    (e.g. the product of every box in a page).
+    """
+    kwargs["ignore_missing_base_info"] = False
+    return _is_authorized(*args, **kwargs)
+
+
+def _is_authorized(
     current_user: Optional[CurrentUser] = None,
     *,
     user_id: Optional[int] = None,
@@ -88,15 +97,14 @@ def _authorize(
     permission: Optional[str] = None,
     ignore_missing_base_info: bool = False,
 ) -> bool:
-    """Function for internal use that acts like authorize() but allows for ignoring
-    missing base information.
+    """Function for internal use that checks authorization like _authorize() but
+    returns a boolean instead of raising a Forbidden exception.
     """
     if current_user is None:
         current_user = g.user
     if current_user.is_god:
         return True
 
-    authorized = False
     if permission is not None:
         resource = permission.split(":")[0]
         if (
@@ -107,48 +115,72 @@ def _authorize(
         ):
             raise ValueError(f"Missing base_id for base-related resource '{resource}'.")
 
-        try:
-            # Look up base IDs for given permission. If the user does not have the
-            # permission at all, the look-up will result in a KeyError.
-            # It is not distinguished between base-related and base-agnostic permissions
-            # when decoding the JWT (CurrentUser.from_jwt()), instead base IDs are
-            # mapped to every permission.
-            authzed_base_ids = current_user.authorized_base_ids(permission)
-        except KeyError:
-            # Permission not granted for user
-            raise Forbidden(permission=permission)
-
-        if authzed_base_ids:
-            # Permission field exists and access for at least one base granted.
-            # Enforce base-specific permission
-            if base_id is not None:
-                # User is authorized for specified base
-                authorized = int(base_id) in authzed_base_ids
-            elif base_ids is not None:
-                # User is authorized for at least one of the specified bases
-                authorized = any([int(b) in authzed_base_ids for b in base_ids])
-            elif resource in BASE_AGNOSTIC_RESOURCES or ignore_missing_base_info:
-                authorized = True
-
-    elif organisation_id is not None:
-        authorized = organisation_id == current_user.organisation_id
-    elif organisation_ids is not None:
-        authorized = current_user.organisation_id in organisation_ids
-    elif user_id is not None:
-        authorized = user_id == current_user.id
-    else:
-        raise ValueError("Missing argument.")
+        # It is not distinguished between base-related and base-agnostic permissions
+        # when decoding the JWT (CurrentUser.from_jwt()), instead base IDs are mapped to
+        # every permission.
+        if not current_user.has_permission(permission):
+            return False
+        authzed_base_ids = current_user.authorized_base_ids(permission)
+
+        if not authzed_base_ids:
+            return False
+        # Permission field exists and access for at least one base granted.
+        # Enforce base-specific permission
+        if base_id is not None:
+            # User is authorized for specified base
+            return int(base_id) in authzed_base_ids
+        if base_ids is not None:
+            # User is authorized for at least one of the specified bases
+            return not authzed_base_ids.isdisjoint(int(b) for b in base_ids)
+        return resource in BASE_AGNOSTIC_RESOURCES or ignore_missing_base_info
+
+    if organisation_id is not None:
+        return organisation_id == current_user.organisation_id
+    if organisation_ids is not None:
+        return current_user.organisation_id in organisation_ids
+    if user_id is not None:
+        return user_id == current_user.id
+    raise ValueError("Missing argument.")
 
-    if authorized:
-        return authorized
-    else:
-        for value, _resource in zip(
-            [base_id, base_ids, organisation_id, organisation_ids, user_id],
-            ["base", "bases", "organisation", "organisations", "user"],
-        ):
-            if value is not None:
-                break
-        raise Forbidden(resource=_resource, value=value)
+
+def _authorize(
+    current_user: Optional[CurrentUser] = None,
+    *,
+    user_id: Optional[int] = None,
+    organisation_id: Optional[int] = None,
+    organisation_ids: Optional[List[int]] = None,
+    base_id: Optional[int] = None,
+    base_ids: Optional[List[int]] = None,
+    permission: Optional[str] = None,
+    ignore_missing_base_info: bool = False,
+) -> bool:
+    """Function for internal use that acts like authorize() but allows for ignoring
+    missing base information.
+    """
+    if current_user is None:
+        current_user = g.user
+    if _is_authorized(
+        current_user,
+        user_id=user_id,
+        organisation_id=organisation_id,
+        organisation_ids=organisation_ids,
+        base_id=base_id,
+        base_ids=base_ids,
+        permission=permission,
+        ignore_missing_base_info=ignore_missing_base_info,
+    ):
+        return True
+
+    if permission is not None and not current_user.has_permission(permission):
+        # Permission not granted for user
+        raise Forbidden(permission=permission)
+    for value, _resource in zip(
+        [base_id, base_ids, organisation_id, organisation_ids, user_id],
+        ["base", "bases", "organisation", "organisations", "user"],
+    ):
+        if value is not None:
+            break
+    raise Forbidden(resource=_resource, value=value)
 
 
 def authorized_bases_filter(
@@ -18,13 +18,13 @@ from ....exceptions import (
 from ....models.definitions.base import Base
 from ....models.definitions.box import Box
 from ....models.definitions.box_state import BoxState as BoxStateModel
-from ....models.definitions.history import DbChangeHistory
 from ....models.definitions.location import Location
 from ....models.definitions.product import Product
 from ....models.definitions.shipment import Shipment
 from ....models.definitions.shipment_detail import ShipmentDetail
 from ....models.definitions.tags_relation import TagsRelation
 from ....models.definitions.transfer_agreement import TransferAgreement
+from ....models.history_messages import insert_history_entries
 from ....models.utils import BATCH_SIZE, create_history_entries, utcnow
 from ..agreement.crud import retrieve_transfer_agreement_bases
 
@@ -156,7 +156,7 @@ def _bulk_update_box_state(*, boxes, state, user_id, now):
         [Box.state, Box.last_modified_on, Box.last_modified_by],
         batch_size=BATCH_SIZE,
     )
-    DbChangeHistory.bulk_create(history_entries, batch_size=BATCH_SIZE)
+    insert_history_entries(history_entries)
 
 
 def cancel_shipment(*, shipment, user):
@@ -459,7 +459,7 @@ def _update_shipment_with_received_boxes(
             TagsRelation.object_id << [box.id for box in checked_in_boxes],
             TagsRelation.deleted_on.is_null(),
         ).execute()
-        DbChangeHistory.bulk_create(history_entries, batch_size=BATCH_SIZE)
+        insert_history_entries(history_entries)
 
 
 def _complete_shipment_if_applicable(*, shipment, user_id, now):
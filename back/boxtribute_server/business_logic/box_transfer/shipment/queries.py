@@ -1,10 +1,25 @@
 from ariadne import QueryType
 
 from ....authz import authorize, authorized_bases_filter
+from ....graph_ql.lookahead import Relation, plan_joins
 from ....models.definitions.shipment import Shipment
 
 query = QueryType()
 
+SOURCE_BASE = Relation(field=Shipment.source_base, loader_name="base_loader")
+TARGET_BASE = Relation(field=Shipment.target_base, loader_name="base_loader")
+# Related resources of shipments that are joined when selected in the shipments list
+SHIPMENT_RELATIONS = {
+    "sourceBase": [SOURCE_BASE],
+    "targetBase": [TARGET_BASE],
+    "labelIdentifier": [SOURCE_BASE, TARGET_BASE],
+    "transferAgreement": [
+        Relation(
+            field=Shipment.transfer_agreement, loader_name="transfer_agreement_loader"
+        )
+    ],
+}
+
 
 @query.field("shipment")
 def resolve_shipment(*_, id):
@@ -17,13 +32,15 @@ def resolve_shipment(*_, id):
 
 
 @query.field("shipments")
-def resolve_shipments(*_, states=None):
+def resolve_shipments(_, info, states=None):
     # No state filter by default
     state_filter = Shipment.state << states if states else True
-    return Shipment.select().where(
+    join_plan = plan_joins(info, Shipment, SHIPMENT_RELATIONS)
+    selection = Shipment.select().where(
         state_filter,
         (
             authorized_bases_filter(Shipment, base_fk_field_name="source_base")
             | authorized_bases_filter(Shipment, base_fk_field_name="target_base")
         ),
     )
+    return join_plan.fetch(selection)
@@ -3,7 +3,8 @@ from ariadne import ObjectType
 from ....authz import authorize
 from ....enums import DistributionEventState, LocationType, TaggableObjectType, TagType
 from ....graph_ql.filtering import derive_beneficiary_filter, derive_product_filter
-from ....graph_ql.pagination import load_into_page
+from ....graph_ql.lookahead import Relation, plan_joins
+from ....graph_ql.pagination import first_page_limit, load_into_page
 from ....models.definitions.beneficiary import Beneficiary
 from ....models.definitions.distribution_events_tracking_group import (
     DistributionEventsTrackingGroup,
@@ -15,6 +16,32 @@ from .crud import get_base_distribution_events
 
 base = ObjectType("Base")
 
+# Related resources of products that are joined when selected in the products list
+PRODUCT_RELATIONS = {
+    "category": [
+        Relation(
+            field=Product.category,
+            loader_name="product_category_loader",
+            permission="product_category:read",
+        )
+    ],
+    "sizeRange": [
+        Relation(
+            field=Product.size_range,
+            loader_name="size_range_loader",
+            permission="size_range:read",
+        )
+    ],
+    "standardProduct": [
+        Relation(
+            field=Product.standard_product,
+            loader_name="standard_product_loader",
+            permission="standard_product:read",
+        )
+    ],
+    "base": [Relation(field=Product.base, loader_name="base_loader")],
+}
+
 
 @base.field("organisation")
 def resolve_base_organisation(base_obj, info):
@@ -22,10 +49,13 @@ def resolve_base_organisation(base_obj, info):
 
 
 @base.field("products")
-def resolve_base_products(base_obj, _, filter_input=None):
+def resolve_base_products(base_obj, info, filter_input=None):
     authorize(permission="product:read", base_id=base_obj.id)
     conditions = derive_product_filter(filter_input)
-    return Product.select().where(Product.base == base_obj.id, *conditions)
+    join_plan = plan_joins(info, Product, PRODUCT_RELATIONS)
+    return join_plan.fetch(
+        Product.select().where(Product.base == base_obj.id, *conditions)
+    )
 
 
 @base.field("locations")
@@ -54,8 +84,17 @@ def resolve_base_tags(base_obj, _, resource_type=None):
 
 
 @base.field("beneficiaries")
-def resolve_base_beneficiaries(base_obj, _, pagination_input=None, filter_input=None):
+def resolve_base_beneficiaries(
+    base_obj, info, pagination_input=None, filter_input=None
+):
     authorize(permission="beneficiary:read", base_id=base_obj.id)
+    limit = first_page_limit(pagination_input)
+    if limit is not None:
+        # Load the first pages of all bases in the request together
+        return info.context["beneficiaries_for_base_loader"].load_page(
+            base_obj.id, limit=limit, filter_input=filter_input
+        )
+
     base_filter_condition = Beneficiary.base == base_obj.id
     filter_condition = base_filter_condition & derive_beneficiary_filter(filter_input)
     return load_into_page(
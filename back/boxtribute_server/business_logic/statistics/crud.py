@@ -1,4 +1,5 @@
 import hashlib
+import os
 import random
 import string
 from dataclasses import dataclass
@@ -12,7 +13,11 @@ from ...enums import BeneficiaryReachType, BoxState, TaggableObjectType, TargetT
 from ...errors import InvalidDate
 from ...models.definitions.base import Base
 from ...models.definitions.beneficiary import Beneficiary
+from ...models.definitions.beneficiary_demographics_fact import (
+    BeneficiaryDemographicsFact,
+)
 from ...models.definitions.box import Box
+from ...models.definitions.created_boxes_fact import CreatedBoxesFact
 from ...models.definitions.history import DbChangeHistory
 from ...models.definitions.location import Location
 from ...models.definitions.organisation import Organisation
@@ -21,13 +26,21 @@ from ...models.definitions.product_category import ProductCategory
 from ...models.definitions.shareable_link import ShareableLink
 from ...models.definitions.size import Size
 from ...models.definitions.size_range import SizeRange
+from ...models.definitions.statistics_refresh import StatisticsRefresh
+from ...models.definitions.stock_overview_fact import StockOverviewFact
 from ...models.definitions.tag import Tag
 from ...models.definitions.tags_relation import TagsRelation
+from ...models.definitions.top_products_donated_fact import TopProductsDonatedFact
 from ...models.definitions.transaction import Transaction
 from ...models.utils import compute_age, convert_ids, utcnow
 from ...utils import in_ci_environment, in_production_environment
 from ..metrics.crud import exclude_test_organisation
-from .sql import BENEFICIARIES_REACHED_QUERY, MOVED_BOXES_QUERY, STOCK_OVERVIEW_QUERY
+from .history_replay import replay_moved_boxes
+from .sql import (
+    BENEFICIARIES_REACHED_QUERY,
+    SHIPPED_AND_LOST_BOXES_QUERY,
+    STOCK_OVERVIEW_QUERY,
+)
 
 
 @dataclass(kw_only=True)
@@ -44,6 +57,24 @@ def _validate_existing_base(base_id):
     Base.select(Base.id).where(Base.id == base_id).get()
 
 
+def _is_materialized(base_id):
+    """Return whether the statistics facts of the base with given ID are read from the
+    materialized fact tables. This requires the STATISTICS_STORE environment variable to
+    be set to "true", and the facts to have been computed by the `refresh-statistics`
+    cron job (see `cron/statistics.py`).
+    """
+    if os.getenv("STATISTICS_STORE") != "true":
+        return False
+    return StatisticsRefresh.select().where(StatisticsRefresh.base == base_id).exists()
+
+
+def _select_facts(model, base_id, *extra_fields):
+    fields = [
+        f for f in model._meta.sorted_fields if f.name not in ("id", model.base.name)
+    ]
+    return model.select(*fields, *extra_fields).where(model.base == base_id)
+
+
 def _generate_dimensions(*names, facts):
     """Return a dictionary holding information (ID, name) about dimensions with
     specified names.
@@ -164,20 +195,24 @@ def _generate_dimensions(*names, facts):
     return dimensions
 
 
-def compute_beneficiary_demographics(base_id):
-    """For each combination of age, gender, and day-truncated date count the number of
-    beneficiaries in the bases with specified IDs (default: all bases) and return
-    results as list.
+def beneficiary_demographics_facts(base_id, *, by_date_of_birth=False):
+    """Return query counting the number of beneficiaries in the base with specified ID
+    for each combination of age (or, if `by_date_of_birth` is set, date of birth),
+    gender, day-truncated creation and deletion date, and tags.
     """
-    _validate_existing_base(base_id)
     gender = SQL("IF(gender = '', 'D', gender)")
     created_on = Beneficiary.created_on.truncate("day")
     deleted_on = fn.IF(
         Beneficiary.deleted_on > 0, Beneficiary.deleted_on.truncate("day"), None
     )
-    age = fn.IF(
-        Beneficiary.date_of_birth > 0, compute_age(Beneficiary.date_of_birth), None
-    )
+    if by_date_of_birth:
+        birth_column = "date_of_birth"
+        birth = fn.IF(Beneficiary.date_of_birth > 0, Beneficiary.date_of_birth, None)
+    else:
+        birth_column = "age"
+        birth = fn.IF(
+            Beneficiary.date_of_birth > 0, compute_age(Beneficiary.date_of_birth), None
+        )
     tag_ids = fn.GROUP_CONCAT(TagsRelation.tag)
 
     # Subquery to select distinct beneficiaries with associated tags
@@ -187,7 +222,7 @@ def compute_beneficiary_demographics(base_id):
             gender.alias("gender"),
             fn.DATE(created_on).alias("created_on"),
             fn.DATE(deleted_on).alias("deleted_on"),
-            age.alias("age"),
+            birth.alias(birth_column),
             tag_ids.alias("tag_ids"),
         )
         .join(
@@ -202,27 +237,57 @@ def compute_beneficiary_demographics(base_id):
         .where(Beneficiary.base == base_id)
         .group_by(Beneficiary.id)
     )
-    facts = (
+    return (
         Beneficiary.select(
             beneficiaries.c.gender,
             beneficiaries.c.created_on,
             beneficiaries.c.deleted_on,
-            beneficiaries.c.age,
+            getattr(beneficiaries.c, birth_column),
             beneficiaries.c.tag_ids,
             fn.COUNT(beneficiaries.c.id).alias("count"),
         )
         .from_(beneficiaries)
         .group_by(
             SQL("gender"),
-            SQL("age"),
+            SQL(birth_column),
             SQL("created_on"),
             SQL("deleted_on"),
             SQL("tag_ids"),
         )
         .dicts()
-        .execute()
     )
 
+
+def compute_beneficiary_demographics(base_id):
+    """For each combination of age, gender, and day-truncated date count the number of
+    beneficiaries in the bases with specified IDs (default: all bases) and return
+    results as list.
+    """
+    _validate_existing_base(base_id)
+    if _is_materialized(base_id):
+        # Age is derived from the date of birth at read time
+        fact = BeneficiaryDemographicsFact
+        age = compute_age(fact.date_of_birth)
+        facts = list(
+            fact.select(
+                fact.gender,
+                fact.created_on,
+                fact.deleted_on,
+                age.alias("age"),
+                fact.tag_ids,
+                fn.SUM(fact.count).alias("count"),
+            )
+            .where(fact.base == base_id)
+            .group_by(
+                fact.gender, SQL("age"), fact.created_on, fact.deleted_on, fact.tag_ids
+            )
+            .dicts()
+        )
+        for f in facts:
+            f["count"] = int(f["count"])
+    else:
+        facts = beneficiary_demographics_facts(base_id).execute()
+
     for fact in facts:
         fact["tag_ids"] = sorted(convert_ids(fact["tag_ids"]))
     dimensions = _generate_dimensions("tag", facts=facts)
@@ -256,13 +321,11 @@ def compute_beneficiary_reach(base_id):
     return DataCube(facts=facts, dimensions=dimensions, type="BeneficiaryReachData")
 
 
-def compute_created_boxes(base_id):
-    """For each combination of product ID, category ID, gender, and day-truncated
-    creation date count the number of created boxes, and the contained items, in the
-    base with the specified ID.
-    Return fact and dimension tables in the result.
+def created_boxes_facts(base_id):
+    """For each combination of product ID, category ID, gender, tags, and day-truncated
+    creation date return query counting the number of created boxes, and the contained
+    items, in the base with the specified ID.
     """
-    _validate_existing_base(base_id)
     cte = (
         Location.select(Location.id).where(Location.base == base_id).cte("location_ids")
     )
@@ -356,7 +419,7 @@ def compute_created_boxes(base_id):
     )
 
     # Step 2: Aggregate boxes by dimensions
-    facts = (
+    return (
         Box.select(
             boxes_with_tags.c.created_on,
             fn.COUNT(boxes_with_tags.c.id).alias("boxes_count"),
@@ -381,6 +444,19 @@ def compute_created_boxes(base_id):
         .with_cte(cte)
     ).dicts()
 
+
+def compute_created_boxes(base_id):
+    """For each combination of product ID, category ID, gender, and day-truncated
+    creation date count the number of created boxes, and the contained items, in the
+    base with the specified ID.
+    Return fact and dimension tables in the result.
+    """
+    _validate_existing_base(base_id)
+    if _is_materialized(base_id):
+        facts = list(_select_facts(CreatedBoxesFact, base_id).dicts())
+    else:
+        facts = created_boxes_facts(base_id).execute()
+
     for fact in facts:
         fact["tag_ids"] = sorted(convert_ids(fact["tag_ids"]))
 
@@ -415,11 +491,10 @@ def compute_top_products_checked_out(base_id):
     )
 
 
-def compute_top_products_donated(base_id):
-    """Return list of most-donated products with rank included, grouped by distribution
-    date, creation date, size, and product category.
+def top_products_donated_facts(base_id):
+    """Return query of most-donated products with rank included, grouped by
+    distribution date, creation date, size, and product category.
     """
-    _validate_existing_base(base_id)
     selection = (
         DbChangeHistory.select(
             fn.DATE(Box.created_on).alias("created_on"),
@@ -445,7 +520,7 @@ def compute_top_products_donated(base_id):
             on=((Box.product == Product.id) & (Product.base == base_id)),
         )
     )
-    facts = selection.group_by(
+    return selection.group_by(
         SQL("created_on"),
         SQL("donated_on"),
         SQL("size_id"),
@@ -453,6 +528,21 @@ def compute_top_products_donated(base_id):
         SQL("category_id"),
     ).dicts()
 
+
+def compute_top_products_donated(base_id):
+    """Return list of most-donated products with rank included, grouped by distribution
+    date, creation date, size, and product category.
+    """
+    _validate_existing_base(base_id)
+    if _is_materialized(base_id):
+        items_count = TopProductsDonatedFact.items_count
+        rank = fn.RANK().over(order_by=[items_count.desc()])
+        facts = _select_facts(
+            TopProductsDonatedFact, base_id, rank.alias("rank")
+        ).dicts()
+    else:
+        facts = top_products_donated_facts(base_id)
+
     dimensions = _generate_dimensions("category", "product", "size", facts=facts)
     return DataCube(facts=facts, dimensions=dimensions, type="TopProductsDonatedData")
 
@@ -484,20 +574,18 @@ def compute_moved_boxes(*base_ids):
         # Earliest row ID in tables in 2023
         min_history_id = 1_324_559
 
-    facts = execute_sql(
-        base_ids,
-        min_history_id,
-        TargetType.BoxState.name,
-        TargetType.BoxState.name,
-        TargetType.OutgoingLocation.name,
-        TargetType.OutgoingLocation.name,
+    # Versions of boxes are reconstructed by replaying their history in a single pass
+    # (equivalent to the first parts of MOVED_BOXES_QUERY which runs correlated
+    # subqueries per history entry)
+    facts = replay_moved_boxes(base_ids, min_history_id=min_history_id)
+    facts += execute_sql(
         TargetType.OutgoingShipment.name,
         base_ids,
         TargetType.IncomingShipment.name,
         base_ids,
         TargetType.BoxState.name,
         base_ids,
-        query=MOVED_BOXES_QUERY,
+        query=SHIPPED_AND_LOST_BOXES_QUERY,
     )
     for fact in facts:
         fact["tag_ids"] = convert_ids(fact["tag_ids"])
@@ -506,15 +594,12 @@ def compute_moved_boxes(*base_ids):
     return DataCube(facts=facts, dimensions=dimensions, type="MovedBoxesData")
 
 
-def compute_stock_overview(base_id, *, tag_ids=None, excluded_tag_ids=None):
-    """Compute stock overview (number of boxes and number of contained items) for the
-    given base. The result can be filtered by size, location, box state, product
-    category, product name, and product gender.
-    Optionally filter by tags: all boxes with any of tag_ids are included, and all boxes
-    with any of excluded_tag_ids are excluded.
+def stock_overview_facts(base_id, *, tag_ids=None, excluded_tag_ids=None):
+    """Return list of stock overview facts (number of boxes and number of contained
+    items) for the given base, grouped by size, location, box state, product category,
+    product name, product gender, and tags. For the tag filters, see
+    `compute_stock_overview()`.
     """
-    _validate_existing_base(base_id)
-
     include_filter_active = bool(tag_ids)
     exclude_filter_active = bool(excluded_tag_ids)
 
@@ -523,7 +608,7 @@ def compute_stock_overview(base_id, *, tag_ids=None, excluded_tag_ids=None):
     included_tag_ids = tag_ids if include_filter_active else [None]
     excluded_tag_ids = excluded_tag_ids if exclude_filter_active else [None]
 
-    facts = execute_sql(
+    return execute_sql(
         base_id,
         include_filter_active,
         included_tag_ids,
@@ -533,8 +618,33 @@ def compute_stock_overview(base_id, *, tag_ids=None, excluded_tag_ids=None):
         exclude_filter_active,
         query=STOCK_OVERVIEW_QUERY,
     )
-    for fact in facts:
-        fact["tag_ids"] = convert_ids(fact["tag_ids"])
+
+
+def compute_stock_overview(base_id, *, tag_ids=None, excluded_tag_ids=None):
+    """Compute stock overview (number of boxes and number of contained items) for the
+    given base. The result can be filtered by size, location, box state, product
+    category, product name, and product gender.
+    Optionally filter by tags: all boxes with any of tag_ids are included, and all boxes
+    with any of excluded_tag_ids are excluded.
+    """
+    _validate_existing_base(base_id)
+
+    if _is_materialized(base_id):
+        facts = list(_select_facts(StockOverviewFact, base_id).dicts())
+        for fact in facts:
+            fact["tag_ids"] = convert_ids(fact["tag_ids"])
+        # All boxes of a fact have the same tags, hence filtering facts by tags is
+        # equivalent to filtering boxes
+        if tag_ids:
+            facts = [f for f in facts if not set(f["tag_ids"]).isdisjoint(tag_ids)]
+        if excluded_tag_ids:
+            facts = [f for f in facts if set(f["tag_ids"]).isdisjoint(excluded_tag_ids)]
+    else:
+        facts = stock_overview_facts(
+            base_id, tag_ids=tag_ids, excluded_tag_ids=excluded_tag_ids
+        )
+        for fact in facts:
+            fact["tag_ids"] = convert_ids(fact["tag_ids"])
 
     dimensions = _generate_dimensions(
         "size", "location", "category", "tag", "dimension", facts=facts
@@ -0,0 +1,284 @@
+"""Computation of the moved-boxes facts that require past versions of boxes (boxes
+moved between the states InStock and Donated, created in Donated state, deleted, and
+undeleted).
+
+Instead of reconstructing each box version with correlated subqueries (see
+`sql.MOVED_BOXES_QUERY`), the history of all boxes of the given bases is streamed once,
+ordered by box ID and history ID, and merged with the current boxes and their tags
+(also ordered by box ID). Per box, a backward pass determines the `from_int` value of
+the next change of each attribute, and a forward pass the `to_int` value of the
+previous change. An attribute of a box version is inferred from the next change (the
+value before it), then the previous change (the value after it), then the current box.
+"""
+
+from itertools import groupby
+
+from peewee import fn
+
+from ...enums import BoxState, TaggableObjectType, TargetType
+from ...models.definitions.box import Box
+from ...models.definitions.history import DbChangeHistory
+from ...models.definitions.location import Location
+from ...models.definitions.product import Product
+from ...models.definitions.tags_relation import TagsRelation
+from ...models.definitions.unit import Unit
+from ...models.utils import HISTORY_CREATION_MESSAGE, HISTORY_DELETION_MESSAGE
+
+BOX_UNDELETION_MESSAGE = "Box was undeleted."
+
+# Box attributes tracked in the history. Box versions are held as tuples in this order
+ATTRIBUTES = ("items", "location_id", "box_state_id", "product_id", "size_id")
+ITEMS, LOCATION, STATE, PRODUCT, SIZE = range(len(ATTRIBUTES))
+_ATTRIBUTE_INDICES = {name: index for index, name in enumerate(ATTRIBUTES)}
+
+# Kinds of box versions that are turned into facts
+DELETED, UNDELETED, CREATED_DONATED, STATE_CHANGED = range(4)
+_EVENTS = {
+    HISTORY_DELETION_MESSAGE: DELETED,
+    BOX_UNDELETION_MESSAGE: UNDELETED,
+    HISTORY_CREATION_MESSAGE: CREATED_DONATED,
+}
+_COUNTED_STATE_CHANGES = {
+    (BoxState.InStock, BoxState.Donated): 1,
+    (BoxState.Donated, BoxState.InStock): -1,
+}
+
+
+def _first_not_null(*values):
+    return next((v for v in values if v is not None), None)
+
+
+def _sum(values):
+    """Like SQL SUM(): ignore null values, and return None if all values are null."""
+    values = [v for v in values if v is not None]
+    return sum(values) if values else None
+
+
+def replay_box_history(changes, current, *, min_history_id):
+    """Reconstruct the versions of a single box at the time of the given history
+    entries (tuples of ID, change, change date, from_int, to_int; ordered by ID).
+    `current` is the tuple of the current box attributes.
+    Yield tuples of the kind of the version, the date of the change, the version tuple,
+    and the previous box state (for box state changes only).
+    Only entries with ID of at least `min_history_id` are taken into account.
+    """
+    # Backward pass: from_int of the next change of each attribute, for all entries
+    # that are turned into versions
+    next_from = [None] * len(ATTRIBUTES)
+    following = {}
+    for index in range(len(changes) - 1, -1, -1):
+        history_id, change, _, from_int, to_int = changes[index]
+        if history_id >= min_history_id and (
+            change in _EVENTS or (change == "box_state_id" and to_int is not None)
+        ):
+            following[index] = tuple(next_from)
+        if (attribute := _ATTRIBUTE_INDICES.get(change)) is not None:
+            next_from[attribute] = from_int
+
+    # Forward pass: to_int of the previous change of each attribute
+    previous_to = [None] * len(ATTRIBUTES)
+    for index, (_, change, changed_on, from_int, to_int) in enumerate(changes):
+        if index in following:
+            version = list(map(_first_not_null, following[index], previous_to, current))
+            moved_on = None if changed_on is None else changed_on.date()
+            if change == "box_state_id":
+                version[STATE] = to_int
+                previous_state = to_int if from_int is None else from_int
+                yield STATE_CHANGED, moved_on, tuple(version), previous_state
+            else:
+                yield _EVENTS[change], moved_on, tuple(version), None
+        if (attribute := _ATTRIBUTE_INDICES.get(change)) is not None:
+            previous_to[attribute] = to_int
+
+
+def _merge_box_streams(history, boxes, tags):
+    """Merge the streams of history entries (tuples of box ID, history ID, change,
+    change date, from_int, to_int), of boxes (tuples starting with the box ID), and of
+    tag relations (tuples of box ID and tag ID), all ordered by box ID.
+    Yield tuples of the box, its history entries without box ID, and its comma-
+    separated tag IDs. History of boxes that are missing from the box stream (e.g.
+    moved to another base in between the queries) is skipped.
+    """
+    box = next(boxes, None)
+    tag = next(tags, None)
+    for box_id, entries in groupby(history, key=lambda entry: entry[0]):
+        while box is not None and box[0] < box_id:
+            box = next(boxes, None)
+        tag_ids = set()
+        while tag is not None and tag[0] <= box_id:
+            if tag[0] == box_id:
+                tag_ids.add(tag[1])
+            tag = next(tags, None)
+        if box is None or box[0] != box_id:
+            continue
+        tag_ids = ",".join(str(t) for t in sorted(tag_ids)) or None
+        yield box, [entry[1:] for entry in entries], tag_ids
+
+
+def _stream_box_versions(base_ids, min_history_id):
+    """Yield tuples of the kind, date, version, previous box state, measure value, and
+    display unit ID, and tag IDs, of all versions of boxes currently located in the
+    given bases. Identical versions of a box on the same day are yielded once (like
+    the grouping in the CTEs of MOVED_BOXES_QUERY).
+    """
+    box_ids = Box.select(Box.id).join(Location).where(Location.base << base_ids)
+    boxes = (
+        Box.select(
+            Box.id,
+            Box.number_of_items,
+            Box.location,
+            Box.state,
+            Box.product,
+            Box.size,
+            Box.display_unit,
+            # Round to three significant digits, as in MOVED_BOXES_QUERY
+            fn.ROUND(Box.measure_value, 3 - fn.FLOOR(fn.LOG10(Box.measure_value) + 1)),
+        )
+        .join(Location)
+        .where(Location.base << base_ids)
+        .order_by(Box.id)
+        .tuples()
+        .iterator()
+    )
+    tags = (
+        TagsRelation.select(TagsRelation.object_id, TagsRelation.tag)
+        .where(
+            TagsRelation.object_type == TaggableObjectType.Box,
+            TagsRelation.deleted_on.is_null(),
+            TagsRelation.object_id << box_ids,
+        )
+        .order_by(TagsRelation.object_id)
+        .tuples()
+        .iterator()
+    )
+    history = (
+        DbChangeHistory.select(
+            DbChangeHistory.record_id,
+            DbChangeHistory.id,
+            DbChangeHistory.changes,
+            DbChangeHistory.change_date,
+            DbChangeHistory.from_int,
+            DbChangeHistory.to_int,
+        )
+        .where(
+            DbChangeHistory.table_name == Box._meta.table_name,
+            DbChangeHistory.changes << [*ATTRIBUTES, *_EVENTS],
+            DbChangeHistory.record_id << box_ids,
+        )
+        .order_by(DbChangeHistory.record_id, DbChangeHistory.id)
+        .tuples()
+        .iterator()
+    )
+
+    for box, changes, tag_ids in _merge_box_streams(history, boxes, tags):
+        current, display_unit_id, measure_value = box[1:6], box[6], box[7]
+        seen = set()
+        for row in replay_box_history(changes, current, min_history_id=min_history_id):
+            if row not in seen:
+                seen.add(row)
+                yield (*row, measure_value, display_unit_id, tag_ids)
+
+
+def _aggregate(versions, products, locations, dimensions):
+    """Group the box versions by product properties, size, location, measure, and tags,
+    and count boxes and items for each group. Return facts in the format of
+    MOVED_BOXES_QUERY, ordered by kind and first occurrence.
+    """
+    groups = [{} for _ in range(len(_EVENTS) + 1)]
+    for kind, moved_on, version, previous_state, measure, unit_id, tag_ids in versions:
+        if kind == CREATED_DONATED and version[STATE] != BoxState.Donated:
+            continue
+        sign = 1
+        if kind == STATE_CHANGED:
+            sign = _COUNTED_STATE_CHANGES.get((previous_state, version[STATE]))
+            if sign is None:
+                continue
+        elif kind == UNDELETED:
+            sign = -1
+
+        product = products.get(version[PRODUCT])
+        location = locations.get(version[LOCATION])
+        if product is None or location is None:
+            continue
+        base_id, category_id, product_name, gender = product
+        location_id, location_name = location
+        dimension_id = dimensions.get(unit_id)
+        key = (
+            base_id,
+            moved_on,
+            category_id,
+            product_name,
+            gender,
+            version[SIZE],
+            location_name,
+            measure,
+            dimension_id,
+            tag_ids,
+        )
+        fact = groups[kind].get(key)
+        if fact is None:
+            is_deletion = kind in (DELETED, UNDELETED)
+            fact = groups[kind][key] = {
+                "base_id": base_id,
+                "moved_on": moved_on,
+                "category_id": category_id,
+                "product_name": product_name.strip(" ").lower(),
+                "gender": gender,
+                "size_id": version[SIZE],
+                "absolute_measure_value": measure,
+                "dimension_id": dimension_id,
+                "tag_ids": tag_ids,
+                "target_id": "Deleted" if is_deletion else str(location_id),
+                "organisation_name": None,
+                "target_type": (
+                    TargetType.BoxState.name
+                    if is_deletion
+                    else TargetType.OutgoingLocation.name
+                ),
+                "boxes_count": [],
+                "items_count": [],
+            }
+        fact["boxes_count"].append(sign)
+        fact["items_count"].append(
+            None if version[ITEMS] is None else sign * version[ITEMS]
+        )
+
+    facts = [fact for kind_groups in groups for fact in kind_groups.values()]
+    for fact in facts:
+        fact["boxes_count"] = sum(fact["boxes_count"])
+        fact["items_count"] = _sum(fact["items_count"])
+    return facts
+
+
+def replay_moved_boxes(base_ids, *, min_history_id):
+    """Return the moved-boxes facts derived from the history of boxes currently located
+    in the given bases, identical to the first four parts of MOVED_BOXES_QUERY (boxes
+    deleted, undeleted, created in Donated state, and moved between InStock and
+    Donated). Only history entries with ID of at least `min_history_id` are considered.
+    """
+    versions = list(_stream_box_versions(base_ids, min_history_id))
+
+    product_ids = {v[2][PRODUCT] for v in versions} - {None}
+    location_ids = {v[2][LOCATION] for v in versions} - {None}
+    unit_ids = {v[5] for v in versions} - {None}
+    products = {
+        p[0]: p[1:]
+        for p in Product.select(
+            Product.id, Product.base, Product.category, Product.name, Product.gender
+        )
+        .where(Product.id << product_ids)
+        .tuples()
+    }
+    locations = {
+        loc[0]: loc
+        for loc in Location.select(Location.id, Location.name)
+        .where(Location.id << location_ids)
+        .tuples()
+    }
+    dimensions = {
+        u[0]: u[1]
+        for u in Unit.select(Unit.id, Unit.dimension)
+        .where(Unit.id << unit_ids)
+        .tuples()
+    }
+    return _aggregate(versions, products, locations, dimensions)
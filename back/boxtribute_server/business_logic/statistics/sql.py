@@ -1,3 +1,150 @@
+# Boxes shipped between bases, and boxes marked as Lost/Scrap. Part of
+# MOVED_BOXES_QUERY; also run separately next to the history replay in
+# `history_replay.py`
+SHIPPED_AND_LOST_BOXES_QUERY = """\
+-- Collect information about all boxes sent from the specified base as source, that
+-- were not removed from the shipment during preparation
+SELECT
+    sh.source_base_id AS base_id,
+    DATE(sh.sent_on) AS moved_on,
+    p.category_id,
+    TRIM(LOWER(p.name)) AS product_name,
+    p.gender_id AS gender,
+    t.source_size_id AS size_id,
+    -- neglect possible history of box's measure_value
+    ROUND(b.measure_value, 3 - FLOOR(LOG10(b.measure_value) + 1)) AS absolute_measure_value,
+    u.dimension_id,
+    t.tag_ids,
+    CONCAT("going-to-", c.name) AS target_id,
+    o.label AS organisation_name,
+    %s AS target_type,
+    COUNT(t.box_id) AS boxes_count,
+    SUM(t.source_quantity) AS items_count
+FROM (
+    SELECT
+        d.shipment_id,
+        d.box_id,
+        d.source_product_id,
+        d.source_size_id,
+        d.source_quantity,
+        GROUP_CONCAT(DISTINCT tr.tag_id) AS tag_ids
+    FROM shipment_detail d
+    LEFT OUTER JOIN tags_relations tr ON tr.object_id = d.box_id AND tr.object_type = "Stock" AND tr.deleted_on IS NULL
+    WHERE d.removed_on IS NULL
+    GROUP BY d.box_id, d.shipment_id, d.source_product_id, d.source_size_id, d.source_quantity
+) t
+JOIN
+    shipment sh
+ON
+    t.shipment_id = sh.id AND
+    sh.source_base_id IN %s AND
+    sh.sent_on IS NOT NULL
+JOIN camps c ON c.id = sh.target_base_id
+JOIN organisations o on o.id = c.organisation_id
+JOIN products p ON p.id = t.source_product_id
+JOIN stock b ON b.id = t.box_id
+LEFT OUTER JOIN units u ON u.id = b.display_unit_id
+GROUP BY sh.source_base_id, moved_on, p.category_id, p.name, p.gender_id, t.source_size_id, c.name, absolute_measure_value, dimension_id, tag_ids
+
+UNION ALL
+
+-- Collect information about all boxes sent and received to the specified base as target, that
+-- were not removed from the shipment during preparation
+SELECT
+    sh.target_base_id AS base_id,
+    DATE(sh.receiving_started_on) AS moved_on,
+    p.category_id,
+    TRIM(LOWER(p.name)) AS product_name,
+    p.gender_id AS gender,
+    t.target_size_id AS size_id,
+    -- neglect possible history of box's measure_value
+    ROUND(b.measure_value, 3 - FLOOR(LOG10(b.measure_value) + 1)) AS absolute_measure_value,
+    u.dimension_id,
+    t.tag_ids,
+    -- this is the source base name
+    CONCAT("sent-from-", c.name) AS target_id,
+    o.label AS organisation_name,
+    %s AS target_type,
+    COUNT(t.box_id) AS boxes_count,
+    SUM(t.target_quantity) AS items_count
+FROM (
+    SELECT
+        d.shipment_id,
+        d.box_id,
+        d.target_product_id,
+        d.target_size_id,
+        d.target_quantity,
+        GROUP_CONCAT(DISTINCT tr.tag_id) AS tag_ids
+    FROM shipment_detail d
+    LEFT OUTER JOIN tags_relations tr ON tr.object_id = d.box_id AND tr.object_type = "Stock" AND tr.deleted_on IS NULL
+    WHERE d.removed_on IS NULL
+    GROUP BY d.box_id, d.shipment_id, d.target_product_id, d.target_size_id, d.target_quantity
+) t
+JOIN
+    shipment sh
+ON
+    t.shipment_id = sh.id AND
+    sh.target_base_id IN %s AND
+    sh.receiving_started_on IS NOT NULL
+JOIN camps c ON c.id = sh.source_base_id
+JOIN organisations o on o.id = c.organisation_id
+JOIN products p ON p.id = t.target_product_id
+JOIN stock b ON b.id = t.box_id
+LEFT OUTER JOIN units u ON u.id = b.display_unit_id
+GROUP BY sh.target_base_id, moved_on, p.category_id, p.name, p.gender_id, t.target_size_id, c.name, absolute_measure_value, dimension_id, tag_ids
+
+UNION ALL
+
+-- Collect information about boxes that were turned into Lost/Scrap state; it is
+-- assumed that these boxes have not been further moved but still are part of the
+-- specified base
+SELECT
+    p.camp_id AS base_id,
+    DATE(t.changedate) AS moved_on,
+    p.category_id,
+    TRIM(LOWER(p.name)) AS product_name,
+    p.gender_id AS gender,
+    t.size_id,
+    ROUND(t.measure_value, 3 - FLOOR(LOG10(t.measure_value) + 1)) AS absolute_measure_value,
+    u.dimension_id,
+    t.tag_ids,
+    bs.label AS target_id,
+    NULL AS organisation_name,
+    %s AS target_type,
+    COUNT(t.history_id) AS boxes_count,
+    SUM(t.items) AS items_count
+FROM (
+    SELECT
+        h.id AS history_id,
+        h.changedate,
+        h.record_id,
+        h.to_int,
+        b.product_id,
+        b.size_id,
+        b.measure_value,
+        b.display_unit_id,
+        b.items,
+        GROUP_CONCAT(DISTINCT tr.tag_id) AS tag_ids
+    FROM history h
+    JOIN stock b ON h.tablename = "stock" AND
+                   h.changes = "box_state_id" AND
+                   h.record_id = b.id AND
+                   h.from_int = 1 AND
+                   h.to_int IN (2, 6) -- (Lost, Scrap)
+    LEFT OUTER JOIN tags_relations tr ON tr.object_id = b.id AND tr.object_type = "Stock" AND tr.deleted_on IS NULL
+    GROUP BY h.id, h.changedate, h.record_id, h.to_int, b.product_id, b.size_id, b.measure_value, b.display_unit_id, b.items
+) t
+JOIN products p ON p.id = t.product_id AND p.camp_id IN %s
+JOIN box_state bs on bs.id = t.to_int
+LEFT OUTER JOIN units u ON u.id = t.display_unit_id
+GROUP BY p.camp_id, moved_on, p.category_id, p.name, p.gender_id, t.size_id, bs.label, absolute_measure_value, dimension_id, tag_ids
+
+"""
+
+# Reference implementation of the moved-boxes statistic. The versions of boxes are
+# reconstructed with correlated subqueries per history entry. The facts from history
+# are computed by `history_replay.replay_moved_boxes` instead; the query is kept for
+# parity tests and benchmarks
 MOVED_BOXES_QUERY = """\
 WITH recursive ValidBoxes AS (
     -- Common Table Expression (CTE) to identify valid boxes
@@ -336,144 +483,7 @@ GROUP BY p.camp_id, moved_on, p.category_id, p.name, p.gender_id, t.size_id, loc
 
 UNION ALL
 
--- Collect information about all boxes sent from the specified base as source, that
--- were not removed from the shipment during preparation
-SELECT
-    sh.source_base_id AS base_id,
-    DATE(sh.sent_on) AS moved_on,
-    p.category_id,
-    TRIM(LOWER(p.name)) AS product_name,
-    p.gender_id AS gender,
-    t.source_size_id AS size_id,
-    -- neglect possible history of box's measure_value
-    ROUND(b.measure_value, 3 - FLOOR(LOG10(b.measure_value) + 1)) AS absolute_measure_value,
-    u.dimension_id,
-    t.tag_ids,
-    CONCAT("going-to-", c.name) AS target_id,
-    o.label AS organisation_name,
-    %s AS target_type,
-    COUNT(t.box_id) AS boxes_count,
-    SUM(t.source_quantity) AS items_count
-FROM (
-    SELECT
-        d.shipment_id,
-        d.box_id,
-        d.source_product_id,
-        d.source_size_id,
-        d.source_quantity,
-        GROUP_CONCAT(DISTINCT tr.tag_id) AS tag_ids
-    FROM shipment_detail d
-    LEFT OUTER JOIN tags_relations tr ON tr.object_id = d.box_id AND tr.object_type = "Stock" AND tr.deleted_on IS NULL
-    WHERE d.removed_on IS NULL
-    GROUP BY d.box_id, d.shipment_id, d.source_product_id, d.source_size_id, d.source_quantity
-) t
-JOIN
-    shipment sh
-ON
-    t.shipment_id = sh.id AND
-    sh.source_base_id IN %s AND
-    sh.sent_on IS NOT NULL
-JOIN camps c ON c.id = sh.target_base_id
-JOIN organisations o on o.id = c.organisation_id
-JOIN products p ON p.id = t.source_product_id
-JOIN stock b ON b.id = t.box_id
-LEFT OUTER JOIN units u ON u.id = b.display_unit_id
-GROUP BY sh.source_base_id, moved_on, p.category_id, p.name, p.gender_id, t.source_size_id, c.name, absolute_measure_value, dimension_id, tag_ids
-
-UNION ALL
-
--- Collect information about all boxes sent and received to the specified base as target, that
--- were not removed from the shipment during preparation
-SELECT
-    sh.target_base_id AS base_id,
-    DATE(sh.receiving_started_on) AS moved_on,
-    p.category_id,
-    TRIM(LOWER(p.name)) AS product_name,
-    p.gender_id AS gender,
-    t.target_size_id AS size_id,
-    -- neglect possible history of box's measure_value
-    ROUND(b.measure_value, 3 - FLOOR(LOG10(b.measure_value) + 1)) AS absolute_measure_value,
-    u.dimension_id,
-    t.tag_ids,
-    -- this is the source base name
-    CONCAT("sent-from-", c.name) AS target_id,
-    o.label AS organisation_name,
-    %s AS target_type,
-    COUNT(t.box_id) AS boxes_count,
-    SUM(t.target_quantity) AS items_count
-FROM (
-    SELECT
-        d.shipment_id,
-        d.box_id,
-        d.target_product_id,
-        d.target_size_id,
-        d.target_quantity,
-        GROUP_CONCAT(DISTINCT tr.tag_id) AS tag_ids
-    FROM shipment_detail d
-    LEFT OUTER JOIN tags_relations tr ON tr.object_id = d.box_id AND tr.object_type = "Stock" AND tr.deleted_on IS NULL
-    WHERE d.removed_on IS NULL
-    GROUP BY d.box_id, d.shipment_id, d.target_product_id, d.target_size_id, d.target_quantity
-) t
-JOIN
-    shipment sh
-ON
-    t.shipment_id = sh.id AND
-    sh.target_base_id IN %s AND
-    sh.receiving_started_on IS NOT NULL
-JOIN camps c ON c.id = sh.source_base_id
-JOIN organisations o on o.id = c.organisation_id
-JOIN products p ON p.id = t.target_product_id
-JOIN stock b ON b.id = t.box_id
-LEFT OUTER JOIN units u ON u.id = b.display_unit_id
-GROUP BY sh.target_base_id, moved_on, p.category_id, p.name, p.gender_id, t.target_size_id, c.name, absolute_measure_value, dimension_id, tag_ids
-
-UNION ALL
-
--- Collect information about boxes that were turned into Lost/Scrap state; it is
--- assumed that these boxes have not been further moved but still are part of the
--- specified base
-SELECT
-    p.camp_id AS base_id,
-    DATE(t.changedate) AS moved_on,
-    p.category_id,
-    TRIM(LOWER(p.name)) AS product_name,
-    p.gender_id AS gender,
-    t.size_id,
-    ROUND(t.measure_value, 3 - FLOOR(LOG10(t.measure_value) + 1)) AS absolute_measure_value,
-    u.dimension_id,
-    t.tag_ids,
-    bs.label AS target_id,
-    NULL AS organisation_name,
-    %s AS target_type,
-    COUNT(t.history_id) AS boxes_count,
-    SUM(t.items) AS items_count
-FROM (
-    SELECT
-        h.id AS history_id,
-        h.changedate,
-        h.record_id,
-        h.to_int,
-        b.product_id,
-        b.size_id,
-        b.measure_value,
-        b.display_unit_id,
-        b.items,
-        GROUP_CONCAT(DISTINCT tr.tag_id) AS tag_ids
-    FROM history h
-    JOIN stock b ON h.tablename = "stock" AND
-                   h.changes = "box_state_id" AND
-                   h.record_id = b.id AND
-                   h.from_int = 1 AND
-                   h.to_int IN (2, 6) -- (Lost, Scrap)
-    LEFT OUTER JOIN tags_relations tr ON tr.object_id = b.id AND tr.object_type = "Stock" AND tr.deleted_on IS NULL
-    GROUP BY h.id, h.changedate, h.record_id, h.to_int, b.product_id, b.size_id, b.measure_value, b.display_unit_id, b.items
-) t
-JOIN products p ON p.id = t.product_id AND p.camp_id IN %s
-JOIN box_state bs on bs.id = t.to_int
-LEFT OUTER JOIN units u ON u.id = t.display_unit_id
-GROUP BY p.camp_id, moved_on, p.category_id, p.name, p.gender_id, t.size_id, bs.label, absolute_measure_value, dimension_id, tag_ids
-;
-"""
+""" + SHIPPED_AND_LOST_BOXES_QUERY + ";\n"
 
 STOCK_OVERVIEW_QUERY = """\
 WITH non_deleted_boxes_with_tags AS (
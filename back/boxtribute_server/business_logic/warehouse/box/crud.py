@@ -50,6 +50,8 @@ from ....models.definitions.size import Size
 from ....models.definitions.size_range_size import SizeRangeSize
 from ....models.definitions.tags_relation import TagsRelation
 from ....models.definitions.unit import Unit
+from ....models.history_messages import insert_history_entries
+from ....models.reference_data import reference_data_cache
 from ....models.utils import (
     BATCH_SIZE,
     HISTORY_CREATION_MESSAGE,
@@ -148,7 +150,7 @@ def create_box(
         if measure_value < 0:
             raise NegativeMeasureValue()
 
-        display_unit = Unit.get_by_id(display_unit_id)
+        display_unit = reference_data_cache.get(Unit, display_unit_id)
         if display_unit.dimension_id != product.size_range_id:
             raise DisplayUnitProductMismatch()
     else:
@@ -370,7 +372,9 @@ def update_box(
     display_unit = None
     # Validate AFTER possible switch of product type (reset of display_unit)
     if display_unit_id or box.display_unit_id:
-        display_unit = Unit.get_by_id(display_unit_id or box.display_unit_id)
+        display_unit = reference_data_cache.get(
+            Unit, display_unit_id or box.display_unit_id
+        )
         if display_unit.dimension_id != new_product.size_range_id:
             raise DisplayUnitProductMismatch()
 
@@ -545,7 +549,7 @@ def delete_boxes(*, user_id, boxes):
     box_ids = [box.id for box in boxes]
     with db.database.atomic():
         Box.update(deleted_on=now).where(Box.id << box_ids).execute()
-        DbChangeHistory.bulk_create(history_entries, batch_size=BATCH_SIZE)
+        insert_history_entries(history_entries)
 
     # Re-fetch updated box data because returning "boxes" would contain outdated objects
     # with the unset deleted_on field
@@ -608,7 +612,7 @@ def move_boxes_to_location(*, user_id, boxes, location):
         #   WHERE stock.id in (1, 2, ...);
         # cf. https://docs.peewee-orm.com/en/latest/peewee/querying.html#alternatives
         Box.update(**updated_fields).where(Box.id << box_ids).execute()
-        DbChangeHistory.bulk_create(history_entries, batch_size=BATCH_SIZE)
+        insert_history_entries(history_entries)
 
     # Re-fetch updated box data because returning "boxes" would contain outdated objects
     # with the old location
@@ -833,7 +837,9 @@ def create_boxes(*, user_id, data):
         }
 
     # Prepare units look-up
-    units = {u.symbol: u for u in Unit.select()} if sanitized_data else {}
+    units = (
+        {u.symbol: u for u in reference_data_cache.rows(Unit)} if sanitized_data else {}
+    )
 
     # Bulk create
     complete_data = []
@@ -904,7 +910,7 @@ def create_boxes(*, user_id, data):
                 )
                 for box in created_boxes
             ]
-            DbChangeHistory.bulk_create(history_entries, batch_size=BATCH_SIZE)
+            insert_history_entries(history_entries)
 
             tags_relations = [
                 {
@@ -946,7 +952,7 @@ def create_boxes(*, user_id, data):
                         to_int=new_items,
                     )
                 )
-            DbChangeHistory.bulk_create(merge_history_entries, batch_size=BATCH_SIZE)
+            insert_history_entries(merge_history_entries)
             # Re-fetch updated boxes so callers see current data
             box_ids_to_refetch = [valid_merge_boxes[li].id for li in merge_items_delta]
             updated_box_list = list(Box.select().where(Box.id << box_ids_to_refetch))
@@ -1,7 +1,7 @@
 from ariadne import ObjectType
 
-from ....authz import authorize
-from ....exceptions import Forbidden
+from ....authz import authorize, is_authorized
+from ....exceptions import InvalidPaginationInput
 
 box = ObjectType("Box")
 unboxed_items_collection = ObjectType("UnboxedItemsCollection")
@@ -19,9 +19,22 @@ def resolve_box_tags(box_obj, info):
 
 
 @box.field("history")
-def resolve_box_history(box_obj, info):
+async def resolve_box_history(box_obj, info, first=None, after=None):
     authorize(permission="history:read")
-    return info.context["history_for_box_loader"].load(box_obj.id)
+    if first is not None and first < 0:
+        raise InvalidPaginationInput(reason="'first' must not be negative")
+    # The full history of the box is batch-loaded, and sliced in the response only.
+    # The entries are sorted by change date, not by their IDs which stem from several
+    # sources (e.g. 'ta1' for tag assignments), hence there's no keyset condition
+    history = await info.context["history_for_box_loader"].load(box_obj.id)
+    if after is not None:
+        entry_ids = [str(entry.id) for entry in history]
+        # An unknown cursor yields an empty page
+        start = entry_ids.index(after) + 1 if after in entry_ids else len(history)
+        history = history[start:]
+    if first is not None:
+        history = history[:first]
+    return history
 
 
 @box.field("product")
@@ -31,11 +44,8 @@ async def resolve_box_product(box_obj, info):
     # In the context of a shipment, if the target party wants to access a box that is
     # not yet in their stock, they'll query for Box.product but we don't want it to
     # raise an error; instead return None
-    try:
-        authorize(permission="product:read", base_id=product.base_id)
+    if is_authorized(permission="product:read", base_id=product.base_id):
         return product
-    except Forbidden:
-        return
 
 
 @box.field("size")
@@ -47,11 +57,8 @@ def resolve_box_size(box_obj, info):
 async def resolve_box_location(box_obj, info):
     location = await info.context["location_loader"].load(box_obj.location_id)
     # See comment in resolve_box_product()
-    try:
-        authorize(permission="location:read", base_id=location.base_id)
+    if is_authorized(permission="location:read", base_id=location.base_id):
         return location
-    except Forbidden:
-        return
 
 
 @box.field("weightDisplayUnit")
@@ -2,12 +2,25 @@ from ariadne import QueryType
 
 from ....authz import authorize, authorize_for_accessing_box
 from ....graph_ql.filtering import derive_box_filter
+from ....graph_ql.lookahead import Relation, plan_joins
 from ....graph_ql.pagination import load_into_page
 from ....models.definitions.box import Box
 from ....models.definitions.location import Location
 
 query = QueryType()
 
+# Related resources of boxes that are joined when selected in a page of boxes
+BOX_RELATIONS = {
+    "product": [Relation(field=Box.product, loader_name="product_loader")],
+    "location": [Relation(field=Box.location, loader_name="location_loader")],
+    "size": [
+        Relation(field=Box.size, loader_name="size_loader", permission="size:read")
+    ],
+    "qrCode": [
+        Relation(field=Box.qr_code, loader_name="qr_code_loader", permission="qr:read")
+    ],
+}
+
 
 @query.field("box")
 def resolve_box(*_, label_identifier):
@@ -22,7 +35,7 @@ def resolve_box(*_, label_identifier):
 
 
 @query.field("boxes")
-def resolve_boxes(*_, base_id, pagination_input=None, filter_input=None):
+def resolve_boxes(_, info, *, base_id, pagination_input=None, filter_input=None):
     authorize(permission="stock:read", base_id=base_id)
 
     selection = Box.select().join(
@@ -41,4 +54,5 @@ def resolve_boxes(*_, base_id, pagination_input=None, filter_input=None):
         selection=selection,
         order_by_field=Box.last_modified_on.desc(),
         pagination_input=pagination_input,
+        join_plan=plan_joins(info, Box, BOX_RELATIONS, "elements"),
     )
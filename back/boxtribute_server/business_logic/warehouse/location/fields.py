@@ -2,7 +2,7 @@ from ariadne import ObjectType
 
 from ....authz import authorize
 from ....graph_ql.filtering import derive_box_filter
-from ....graph_ql.pagination import load_into_page
+from ....graph_ql.pagination import first_page_limit, load_into_page
 from ....models.definitions.box import Box
 
 classic_location = ObjectType("ClassicLocation")
@@ -15,8 +15,18 @@ def resolve_location_default_box_state(location_obj, _):
 
 
 @classic_location.field("boxes")
-def resolve_location_boxes(location_obj, _, pagination_input=None, filter_input=None):
+def resolve_location_boxes(
+    location_obj, info, pagination_input=None, filter_input=None
+):
     authorize(permission="stock:read", base_id=location_obj.base_id)
+    limit = first_page_limit(pagination_input)
+    # Filtering by tags requires a distinct selection which can't be ranked per location
+    if limit is not None and (filter_input or {}).get("tag_ids") is None:
+        # Load the first pages of all locations in the request together
+        return info.context["boxes_for_location_loader"].load_page(
+            location_obj.id, limit=limit, filter_input=filter_input
+        )
+
     filter_condition, selection = derive_box_filter(filter_input)
 
     return load_into_page(
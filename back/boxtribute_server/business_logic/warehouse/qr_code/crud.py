@@ -4,6 +4,7 @@ from ....db import db
 from ....models.definitions.box import Box
 from ....models.definitions.history import DbChangeHistory
 from ....models.definitions.qr_code import QrCode
+from ....models.history_messages import save_box_history_messages
 from ....models.utils import utcnow
 
 
@@ -23,7 +24,7 @@ def create_qr_code(*, user_id, box=None):
         if box is not None:
             box.qr_code = new_qr_code.id
             box.save(only=[Box.qr_code])
-            DbChangeHistory.create(
+            entry = DbChangeHistory.create(
                 changes="New Qr-code assigned by pdf generation.",
                 table_name=box._meta.table_name,
                 record_id=box.id,
@@ -31,5 +32,6 @@ def create_qr_code(*, user_id, box=None):
                 ip=None,
                 change_date=now,
             )
+            save_box_history_messages([entry])
 
     return new_qr_code
@@ -20,7 +20,20 @@ import logging
 from ..db import create_db_interface
 from ..models import MODELS
 from ..models.definitions.base import Base
+from ..models.definitions.beneficiary_demographics_fact import (
+    BeneficiaryDemographicsFact,
+)
+from ..models.definitions.consistency_token import ConsistencyToken
+from ..models.definitions.created_boxes_fact import CreatedBoxesFact
+from ..models.definitions.history_message import HistoryMessage
 from ..models.definitions.organisation import Organisation
+from ..models.definitions.statistics_refresh import StatisticsRefresh
+from ..models.definitions.stock_overview_fact import StockOverviewFact
+from ..models.definitions.top_products_donated_fact import TopProductsDonatedFact
+from ..models.history_messages import (
+    BACKFILL_BATCH_SIZE,
+    backfill_box_history_messages,
+)
 from .remove_base_access import LOGGER as RBA_LOGGER
 from .remove_base_access import remove_base_access
 from .service import LOGGER as SERVICE_LOGGER
@@ -29,6 +42,14 @@ from .utils import setup_logger
 
 LOGGER = setup_logger(__name__)
 
+STATISTICS_MODELS = [
+    StatisticsRefresh,
+    BeneficiaryDemographicsFact,
+    CreatedBoxesFact,
+    StockOverviewFact,
+    TopProductsDonatedFact,
+]
+
 
 def _parse_options(args=None):
     parser = argparse.ArgumentParser(
@@ -72,6 +93,29 @@ def _parse_options(args=None):
         "--auth0-management-api-client-secret",
         dest="secret",
     )
+
+    backfill_parser = subparsers.add_parser(
+        "backfill-history-messages",
+        help="Render and store messages of box history entries that don't have one yet",
+    )
+    backfill_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BACKFILL_BATCH_SIZE,
+        help="number of history entries processed per statement "
+        f"(default: {BACKFILL_BATCH_SIZE})",
+    )
+
+    subparsers.add_parser(
+        "create-statistics-tables",
+        help="Create the tables of the statistics store if they don't exist",
+    )
+
+    subparsers.add_parser(
+        "create-consistency-tokens-table",
+        help="Create the table of consistency tokens for replica reads if it doesn't "
+        "exist",
+    )
     return vars(parser.parse_args(args=args))
 
 
@@ -128,6 +172,28 @@ def _confirm_removal(*, force, base_id):
         raise RuntimeError("Operation was not confirmed, cancelling.")
 
 
+def _backfill_history_messages(*, batch_size):
+    HistoryMessage.create_table(safe=True)
+
+    def log_progress(last_id, max_id, total):
+        LOGGER.info(f"Processed history entries up to ID {last_id} of {max_id}")
+
+    total = backfill_box_history_messages(
+        batch_size=batch_size, on_progress=log_progress
+    )
+    LOGGER.info(f"Stored {total} messages of box history entries")
+
+
+def _create_statistics_tables():
+    StatisticsRefresh._meta.database.create_tables(STATISTICS_MODELS, safe=True)
+    LOGGER.info("Created statistics tables")
+
+
+def _create_consistency_tokens_table():
+    ConsistencyToken.create_table(safe=True)
+    LOGGER.info("Created consistency tokens table")
+
+
 def main(args=None):
     options = _parse_options(args=args)
 
@@ -156,6 +222,12 @@ def main(args=None):
                 **{n: options.pop(n) for n in ["domain", "client_id", "secret"]}
             )
             remove_base_access(**options, service=service)
+        elif command == "backfill-history-messages":
+            _backfill_history_messages(**options)
+        elif command == "create-statistics-tables":
+            _create_statistics_tables()
+        elif command == "create-consistency-tokens-table":
+            _create_consistency_tokens_table()
     except Exception as e:
         LOGGER.exception(e) if verbose else LOGGER.error(e)
         raise SystemExit("Exiting due to above error.")
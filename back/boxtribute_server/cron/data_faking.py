@@ -694,12 +694,8 @@ class Generator:
         self.qr_codes = tuple(qr_codes)
 
     def _generate_transfer_agreements(self):
-        org1_user = CurrentUser(
-            id=2, organisation_id=1, base_ids=[1], timezone="Europe/Rome"
-        )
-        org2_user = CurrentUser(
-            id=10, organisation_id=2, base_ids=[2, 3, 4], timezone="Europe/Athens"
-        )
+        org1_user = CurrentUser(id=2, organisation_id=1, timezone="Europe/Rome")
+        org2_user = CurrentUser(id=10, organisation_id=2, timezone="Europe/Athens")
 
         # Rejected agreement
         agreement = create_transfer_agreement(
@@ -903,12 +899,8 @@ class Generator:
             self.boxes[b] = boxes
 
     def _generate_shipments(self):
-        org1_user = CurrentUser(
-            id=2, organisation_id=1, base_ids=[1], timezone="Europe/Rome"
-        )
-        org2_user = CurrentUser(
-            id=10, organisation_id=2, base_ids=[2, 3, 4], timezone="Europe/Athens"
-        )
+        org1_user = CurrentUser(id=2, organisation_id=1, timezone="Europe/Rome")
+        org2_user = CurrentUser(id=10, organisation_id=2, timezone="Europe/Athens")
 
         def _prepare_shipment(source_base_id, target_base_id, *, intra_org=False):
             agreement_id = None if intra_org else self.accepted_agreement.id
@@ -0,0 +1,176 @@
+"""Incremental refresh of the materialized statistics facts.
+
+The facts of beneficiary demographics, created boxes, stock overview, and top donated
+products are stored per base (see `StatisticsRefresh` and the `*Fact` models), and read
+by the corresponding functions in `business_logic/statistics/crud.py` if the
+STATISTICS_STORE environment variable is set to "true".
+
+The ID of the newest history entry at the time of a refresh serves as watermark. On the
+next refresh, only the facts of bases affected by newer history entries (changes of
+boxes, products, locations, beneficiaries, or tags), or by tag assignments since the
+last refresh (they are not recorded in the history) are re-computed. Bases that have
+not been materialized yet are computed entirely.
+"""
+
+from peewee import fn
+
+from ..business_logic.statistics.crud import (
+    beneficiary_demographics_facts,
+    created_boxes_facts,
+    stock_overview_facts,
+    top_products_donated_facts,
+)
+from ..db import db
+from ..enums import TaggableObjectType
+from ..models.definitions.base import Base
+from ..models.definitions.beneficiary import Beneficiary
+from ..models.definitions.beneficiary_demographics_fact import (
+    BeneficiaryDemographicsFact,
+)
+from ..models.definitions.box import Box
+from ..models.definitions.created_boxes_fact import CreatedBoxesFact
+from ..models.definitions.history import DbChangeHistory
+from ..models.definitions.location import Location
+from ..models.definitions.product import Product
+from ..models.definitions.statistics_refresh import StatisticsRefresh
+from ..models.definitions.stock_overview_fact import StockOverviewFact
+from ..models.definitions.tag import Tag
+from ..models.definitions.tags_relation import TagsRelation
+from ..models.definitions.top_products_donated_fact import TopProductsDonatedFact
+from ..models.utils import BATCH_SIZE, utcnow
+
+FACT_SOURCES = {
+    BeneficiaryDemographicsFact: lambda base_id: beneficiary_demographics_facts(
+        base_id, by_date_of_birth=True
+    ),
+    CreatedBoxesFact: created_boxes_facts,
+    StockOverviewFact: stock_overview_facts,
+    TopProductsDonatedFact: top_products_donated_facts,
+}
+
+
+def refresh_base_statistics(base_id, *, history_id, now):
+    """Re-compute all statistics facts of the base with given ID, and replace the
+    stored ones. Record the given history ID as watermark.
+    """
+    facts = {model: list(source(base_id)) for model, source in FACT_SOURCES.items()}
+    with db.database.atomic():
+        for model, rows in facts.items():
+            fields = [
+                f.name
+                for f in model._meta.sorted_fields
+                if f.name not in ("id", model.base.name)
+            ]
+            model.delete().where(model.base == base_id).execute()
+            rows = [{"base": base_id, **{f: row[f] for f in fields}} for row in rows]
+            for start in range(0, len(rows), BATCH_SIZE):
+                end = start + BATCH_SIZE
+                model.insert_many(rows[start:end]).execute()
+        StatisticsRefresh.replace(
+            base=base_id, history_id=history_id, refreshed_on=now
+        ).execute()
+
+
+def _bases_with_changes(history_id, since):
+    """Return IDs of bases whose statistics facts might be affected by history entries
+    newer than the given ID, or by tags assigned or unassigned since the given time.
+    """
+    new_entries = DbChangeHistory.id > history_id
+
+    def changed(model):
+        return (
+            (DbChangeHistory.record_id == model.id)
+            & (DbChangeHistory.table_name == model._meta.table_name)
+            & new_entries
+        )
+
+    queries = [
+        Location.select(Location.base)
+        .join(Box, on=(Box.location == Location.id))
+        .join(DbChangeHistory, on=changed(Box)),
+        # Boxes moved between bases, e.g. by shipments
+        Location.select(Location.base).join(
+            DbChangeHistory,
+            on=(
+                (
+                    (DbChangeHistory.from_int == Location.id)
+                    | (DbChangeHistory.to_int == Location.id)
+                )
+                & (DbChangeHistory.table_name == Box._meta.table_name)
+                & (DbChangeHistory.changes == Box.location.column_name)
+                & new_entries
+            ),
+        ),
+        Product.select(Product.base).join(DbChangeHistory, on=changed(Product)),
+        Location.select(Location.base).join(DbChangeHistory, on=changed(Location)),
+        Beneficiary.select(Beneficiary.base).join(
+            DbChangeHistory, on=changed(Beneficiary)
+        ),
+        Tag.select(Tag.base).join(DbChangeHistory, on=changed(Tag)),
+    ]
+
+    tags_changed = (TagsRelation.created_on >= since) | (
+        TagsRelation.deleted_on >= since
+    )
+    queries.extend(
+        [
+            Location.select(Location.base)
+            .join(Box, on=(Box.location == Location.id))
+            .join(
+                TagsRelation,
+                on=(
+                    (TagsRelation.object_id == Box.id)
+                    & (TagsRelation.object_type == TaggableObjectType.Box)
+                    & tags_changed
+                ),
+            ),
+            Beneficiary.select(Beneficiary.base).join(
+                TagsRelation,
+                on=(
+                    (TagsRelation.object_id == Beneficiary.id)
+                    & (TagsRelation.object_type == TaggableObjectType.Beneficiary)
+                    & tags_changed
+                ),
+            ),
+        ]
+    )
+    return {base_id for query in queries for (base_id,) in query.distinct().tuples()}
+
+
+def refresh_statistics():
+    """Refresh the statistics facts of bases that are not materialized yet, and of
+    materialized bases with changes since their last refresh. Return the IDs of the
+    refreshed bases. The statistics tables must exist (see `bwiz
+    create-statistics-tables`).
+    All facts of a base are re-computed, since a single change (e.g. of a product
+    category) affects facts of several kinds, and tracking the affected facts per kind
+    would mean duplicating the grouping of the statistics queries.
+    """
+    # Determine the watermark before computing facts. Changes made during the refresh
+    # are taken into account again on the next refresh
+    history_id = DbChangeHistory.select(fn.MAX(DbChangeHistory.id)).scalar() or 0
+    now = utcnow()
+
+    refreshes = list(StatisticsRefresh.select())
+    materialized_base_ids = {r.base_id for r in refreshes}
+    base_ids = {
+        base.id
+        for base in Base.select(Base.id).where(
+            Base.deleted_on.is_null(), Base.id.not_in(materialized_base_ids)
+        )
+    }
+    if refreshes:
+        changed_base_ids = _bases_with_changes(
+            min(r.history_id for r in refreshes),
+            min(r.refreshed_on for r in refreshes),
+        )
+        base_ids.update(changed_base_ids & materialized_base_ids)
+
+    for base_id in sorted(base_ids):
+        refresh_base_statistics(base_id, history_id=history_id, now=now)
+
+    # Advance the watermark of bases without changes
+    StatisticsRefresh.update(history_id=history_id, refreshed_on=now).where(
+        StatisticsRefresh.base.not_in(base_ids)
+    ).execute()
+    return sorted(base_ids)
@@ -1,8 +1,13 @@
+import contextlib
+import os
+import threading
+from contextvars import ContextVar
 from functools import wraps
 from typing import Any
 
 from flask import request
-from peewee import MySQLDatabase
+from peewee import Database, DatabaseProxy, MySQLDatabase, ProgrammingError
+from playhouse.pool import MaxConnectionsExceeded, PooledMySQLDatabase
 
 from .blueprints import (
     API_GRAPHQL_PATH,
@@ -13,8 +18,12 @@ from .blueprints import (
     app_bp,
     shared_bp,
 )
-from .business_logic.statistics import statistics_queries
+from .graph_ql.persisted_queries import persisted_query_registry
+from .logging import add_fields_to_request_log
 from .models import MODELS
+from .models.definitions.consistency_token import ConsistencyToken
+from .models.utils import NO_SUCH_TABLE
+from .sql_counter import CountingMySQLDatabase, SqlQueryCountingMixin
 
 
 class DatabaseManager:
@@ -25,14 +34,28 @@ class DatabaseManager:
     Most importantly, this class handles opening/closing database connection(s)
     before/after handling incoming requests.
 
-    It connects to the database replica for statistics-related GraphQL queries. To use
-    the replica for database queries, wrap the calling code in the `use_db_replica`
-    decorator.
+    The connection to the database replica is opened lazily on first use, i.e. when
+    entering `use_replica()` (e.g. for read-only operations, see `execute_async`, or in
+    resolvers wrapped in the `use_db_replica` decorator).
+
+    If the databases are pooled (see `connection_pool_options()`), opening/closing a
+    connection means checking it out from/returning it to the pool.
+
+    The data models are bound to the `router` which forwards to the primary database
+    unless the replica is selected for the current execution context.
+
+    Since the replica might lag behind, clients can require it to have caught up with
+    a previous write (read-your-writes): mutations return a consistency token (see
+    `consistency_token()`) that subsequent requests send back.
     """
 
     def __init__(self) -> None:
         self.database: MySQLDatabase | None = None
         self.replica: MySQLDatabase | None = None
+        self.router = DatabaseRouter()
+        self._required_consistency: ContextVar[dict[str, Any] | None] = ContextVar(
+            "required_replica_consistency", default=None
+        )
 
     def register_handlers(self, app) -> None:
         app.before_request(self.connect_db)
@@ -57,9 +80,10 @@ class DatabaseManager:
         ):
             return
 
-        # Provide fallback for non-JSON and non-GraphQL requests
+        # Provide fallback for non-JSON and non-GraphQL requests. The query text might
+        # have to be looked up if the client sent a persisted query hash
         payload = request.get_json(silent=True) or {}
-        if "query" not in payload or payload["query"] is None:
+        if persisted_query_registry.lookup(payload) is None:
             return
 
         if not self.database:
@@ -67,11 +91,8 @@ class DatabaseManager:
 
         self.database.connect()
 
-        if self.replica and (
-            any([q in payload["query"] for q in statistics_queries()])
-            or request.blueprint == shared_bp.name
-        ):
-            self.replica.connect()
+        if pool_stats := self.pool_stats():
+            add_fields_to_request_log(db_pool=pool_stats)
 
     def close_db(self, _) -> None:
         if self.database and not self.database.is_closed():
@@ -80,6 +101,138 @@ class DatabaseManager:
         if self.replica and not self.replica.is_closed():
             self.replica.close()
 
+    @contextlib.contextmanager
+    def use_replica(self):
+        """Route all database operations of the current execution context to the
+        replica (if configured) while in the context. Connect to the replica if not
+        done yet for the current request.
+        """
+        if self.replica is None:
+            yield
+            return
+
+        if self.replica.is_closed():
+            self.replica.connect()
+        if not self._replica_is_consistent():
+            yield
+            return
+
+        with self.router.use(self.replica):
+            yield
+
+    def consistency_token(self) -> int | None:
+        """Return a token representing the current state of the primary database,
+        namely the ID of a new row in the consistency_tokens table. Since the replica
+        applies transactions in commit order, it has applied all preceding writes once
+        it contains this row. Older rows are removed.
+        Return None if the table doesn't exist (yet).
+        """
+        if not self.database:
+            raise RuntimeError("DatabaseManager.database not set")
+
+        table = ConsistencyToken._meta.table_name
+        try:
+            cursor = self.database.execute_sql(
+                f"INSERT INTO {table} (id) VALUES (NULL)"
+            )
+        except ProgrammingError as e:
+            if e.args[0] != NO_SUCH_TABLE:
+                raise
+            return None
+        token = cursor.lastrowid
+        self.database.execute_sql(
+            f"DELETE FROM {table} WHERE id < {self.database.param}", (token,)
+        )
+        return token
+
+    @contextlib.contextmanager
+    def require_consistency(self, token: int):
+        """Only use the replica in the current execution context if it has caught up
+        with the state represented by the given consistency token; otherwise fall back
+        to the primary database. The replica is checked once, on first use.
+        """
+        context_token = self._required_consistency.set(
+            {"token": token, "caught_up": None}
+        )
+        try:
+            yield
+        finally:
+            self._required_consistency.reset(context_token)
+
+    def _replica_is_consistent(self) -> bool:
+        required = self._required_consistency.get()
+        if required is None:
+            return True
+
+        if required["caught_up"] is None:
+            lag = required["token"] - _latest_consistency_token(self.replica)
+            required["caught_up"] = lag <= 0
+            add_fields_to_request_log(
+                replica_lag={"tokens": max(lag, 0), "fallback": lag > 0}
+            )
+        return required["caught_up"]
+
+    def pool_stats(self) -> dict[str, dict[str, int]]:
+        """Return statistics of the connection pools of primary and replica database,
+        if pooled.
+        """
+        return {
+            name: database.stats()
+            for name, database in [
+                ("primary", self.database),
+                ("replica", self.replica),
+            ]
+            if isinstance(database, PooledDatabase)
+        }
+
+
+class DatabaseRouter(DatabaseProxy):
+    """Database proxy that data models are bound to. It forwards to the database
+    selected for the current execution context (thread or asyncio task) via `use()`, and
+    to the default database (set via `initialize()`) otherwise.
+    Unlike `Database.bind_ctx()` which re-binds the models globally, routing doesn't
+    affect concurrent requests handled in other threads or tasks.
+    """
+
+    __slots__ = ("obj", "_callbacks", "_Model", "_selected")
+
+    def __init__(self) -> None:
+        self._selected: ContextVar[Database | None] = ContextVar(
+            "selected_database", default=None
+        )
+        super().__init__()
+
+    @property
+    def target(self) -> Database | None:
+        return self._selected.get() or self.obj
+
+    @contextlib.contextmanager
+    def use(self, database: Database):
+        """Route all database operations of the current execution context to the given
+        database while in the context.
+        """
+        token = self._selected.set(database)
+        try:
+            yield database
+        finally:
+            self._selected.reset(token)
+
+    def bind(self, models, bind_refs=True, bind_backrefs=True) -> None:
+        for model in models:
+            model.bind(self, bind_refs=bind_refs, bind_backrefs=bind_backrefs)
+
+    def __getattr__(self, attr):
+        database = self.target
+        if database is None:
+            raise AttributeError("Cannot use uninitialized DatabaseRouter.")
+        return getattr(database, attr)
+
+    def __enter__(self):
+        return self.target.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.target.__exit__(*exc_info)
+
 
 db = DatabaseManager()
 
@@ -89,20 +242,104 @@ def use_db_replica(f):
 
     @wraps(f)
     def decorated(*args, **kwargs):
-        if db.replica is not None:
-            # With a complete list of models no need to recursively bind dependencies
-            with db.replica.bind_ctx(MODELS, bind_refs=False, bind_backrefs=False):
-                return f(*args, **kwargs)
-
-        return f(*args, **kwargs)
+        with db.use_replica():
+            return f(*args, **kwargs)
 
     return decorated
 
 
-def create_db_interface(**mysql_kwargs) -> MySQLDatabase:
+class PooledDatabase(SqlQueryCountingMixin, PooledMySQLDatabase):
+    """MySQL database interface maintaining a pool of connections. Connections are
+    - checked out from the pool on `connect()`, and returned to it on `close()`
+    - closed and replaced when exceeding the stale timeout
+    - optionally checked by a ping before being checked out (health check)
+    The numbers of checkouts, of checkouts that had to wait for an available connection
+    (because all were in use), and of recycled (stale or broken) connections are
+    recorded.
+    """
+
+    def __init__(self, *args, health_check=True, **kwargs):
+        self.health_check = health_check
+        self._stats_lock = threading.Lock()
+        self._checkout_state = threading.local()
+        self.checkouts = 0
+        self.waits = 0
+        self.recycled = 0
+        super().__init__(*args, **kwargs)
+
+    def _count(self, name):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def connect(self, reuse_if_open=False):
+        # The base class retries checking out until the wait timeout is exceeded
+        self._checkout_state.waited = False
+        return super().connect(reuse_if_open)
+
+    def _connect(self):
+        try:
+            connection = super()._connect()
+        except MaxConnectionsExceeded:
+            if not getattr(self._checkout_state, "waited", False):
+                self._checkout_state.waited = True
+                self._count("waits")
+            raise
+        self._count("checkouts")
+        return connection
+
+    def _is_closed(self, conn):
+        if not self.health_check:
+            return False
+        closed = super()._is_closed(conn)
+        if closed:
+            self._count("recycled")
+        return closed
+
+    def _is_stale(self, timestamp):
+        stale = super()._is_stale(timestamp)
+        if stale:
+            self._count("recycled")
+        return stale
+
+    def stats(self) -> dict[str, int]:
+        with self._pool_lock:
+            return {
+                "in_use": len(self._in_use),
+                "available": len(self._connections),
+                "max_connections": self._max_connections,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "recycled": self.recycled,
+            }
+
+
+def connection_pool_options() -> dict[str, Any] | None:
+    """Return options for pooled database interfaces if the MYSQL_CONNECTION_POOL
+    environment variable is set to "true", otherwise None. The options are read from
+    - MYSQL_POOL_MAX_CONNECTIONS: maximum number of connections (default: 10)
+    - MYSQL_POOL_STALE_TIMEOUT: seconds after which a connection is recycled
+      (default: 300)
+    - MYSQL_POOL_WAIT_TIMEOUT: seconds to wait for an available connection before
+      failing (default: 10)
+    - MYSQL_POOL_HEALTH_CHECK: whether to ping connections before checkout (default:
+      true)
+    """
+    if os.getenv("MYSQL_CONNECTION_POOL") != "true":
+        return None
+    return dict(
+        max_connections=int(os.getenv("MYSQL_POOL_MAX_CONNECTIONS", 10)),
+        stale_timeout=int(os.getenv("MYSQL_POOL_STALE_TIMEOUT", 300)),
+        timeout=int(os.getenv("MYSQL_POOL_WAIT_TIMEOUT", 10)),
+        health_check=os.getenv("MYSQL_POOL_HEALTH_CHECK", "true") == "true",
+    )
+
+
+def create_db_interface(*, pool_options=None, **mysql_kwargs) -> MySQLDatabase:
     """Create MySQL database interface using given connection parameters. `mysql_kwargs`
     are validated to not be None and forwarded to `pymysql.connect`.
-    Configure primary keys to be unsigned integer.
+    Configure primary keys to be unsigned integer. Executed statements are counted
+    per GraphQL operation (see `sql_counter` module).
+    If `pool_options` are given, a PooledDatabase is created.
     """
     for field in ["user", "password", "database"]:
         if mysql_kwargs.get(field) is None:
@@ -110,16 +347,33 @@ def create_db_interface(**mysql_kwargs) -> MySQLDatabase:
                 f"Field '{field}' for database configuration must not be None"
             )
 
-    return MySQLDatabase(
-        **mysql_kwargs, field_types={"AUTO": "INTEGER UNSIGNED AUTO_INCREMENT"}
-    )
+    field_types = {"AUTO": "INTEGER UNSIGNED AUTO_INCREMENT"}
+    if pool_options is not None:
+        return PooledDatabase(**mysql_kwargs, **pool_options, field_types=field_types)
+    return CountingMySQLDatabase(**mysql_kwargs, field_types=field_types)
+
+
+def _latest_consistency_token(database) -> int:
+    try:
+        cursor = database.execute_sql(
+            f"SELECT MAX(id) FROM {ConsistencyToken._meta.table_name}"
+        )
+    except ProgrammingError as e:
+        if e.args[0] != NO_SUCH_TABLE:
+            raise
+        # Table not replicated yet
+        return 0
+    return cursor.fetchone()[0] or 0
 
 
 def current_database() -> MySQLDatabase:
-    """Return the database object that the data models currently are bound to.
+    """Return the database object that the data models currently are bound to (if bound
+    to a DatabaseRouter, the database that it currently routes to).
     Raise RuntimeError if run without prior Database.bind() or Database.bind_ctx() call.
     """
     database = MODELS[0]._meta.database
+    if isinstance(database, DatabaseRouter):
+        database = database.target
     if database is None:
         raise RuntimeError("Data models not bound to database.")
     return database
@@ -28,7 +28,7 @@ def format_database_errors(error, debug=False):
             error.extensions = {}
         from flask import g
 
-        error.extensions["user"] = g.user.__dict__ if hasattr(g, "user") else {}
+        error.extensions["user"] = g.user.to_dict() if hasattr(g, "user") else {}
 
     return error.formatted
 
@@ -176,10 +176,12 @@ class InvalidShipmentDetailUpdateInput(Exception):
 
 
 class InvalidPaginationInput(Exception):
-    extensions = {
-        "code": "BAD_USER_INPUT",
-        "description": "Invalid pagination input: missing 'before' field.",
-    }
+    def __init__(self, *args, reason="missing 'before' field", **kwargs):
+        self.extensions = {
+            "code": "BAD_USER_INPUT",
+            "description": f"Invalid pagination input: {reason}.",
+        }
+        super().__init__(*args, **kwargs)
 
 
 class IncompatibleTagTypeAndResourceType(Exception):
@@ -0,0 +1,201 @@
+"""Static cost and depth analysis of GraphQL operations.
+
+The cost of an operation is estimated from the parsed document before any resolver is
+run. Every field returning an object type costs 1 (e.g. a database query or DataLoader
+call), scalar fields are free. Individual weights can be assigned to expensive fields.
+The cost of a field's sub-selection is multiplied by the number of expected elements:
+- for paginated fields, the `first`/`last` values of the `paginationInput` argument
+  (default: DEFAULT_PAGINATION_LIMIT)
+- for other list fields, DEFAULT_LIST_SIZE (except for the elements of a page)
+
+For fragments on abstract types, the costs of all fragments are summed up, hence the
+estimate is an upper bound.
+"""
+
+import os
+from dataclasses import dataclass
+
+import graphql
+
+from .pagination import DEFAULT_PAGINATION_LIMIT
+
+# Assumed number of elements for list fields without pagination
+DEFAULT_LIST_SIZE = 10
+
+# Weights of fields known to be expensive, of form 'ParentType.field'
+FIELD_WEIGHTS = {
+    "Box.history": 5,
+    "Query.beneficiaryDemographics": 100,
+    "Query.beneficiaryReach": 100,
+    "Query.createdBoxes": 100,
+    "Query.movedBoxes": 200,
+    "Query.stockOverview": 100,
+    "Query.topProductsCheckedOut": 100,
+    "Query.topProductsDonated": 100,
+    "Query.newlyCreatedBoxNumbers": 20,
+    "Query.newlyRegisteredBeneficiaryNumbers": 20,
+    "Query.reachedBeneficiariesNumbers": 20,
+    "ResolvedLink.data": 200,
+}
+
+
+@dataclass(kw_only=True)
+class CostLimits:
+    """Maximum cost and depth of an operation. None means unlimited."""
+
+    max_cost: int | None = None
+    max_depth: int | None = None
+
+
+QUERY_API_COST_LIMITS = CostLimits(
+    max_cost=int(os.getenv("QUERY_API_MAX_COST", 50_000)),
+    max_depth=int(os.getenv("QUERY_API_MAX_DEPTH", 12)),
+)
+PUBLIC_API_COST_LIMITS = CostLimits(
+    max_cost=int(os.getenv("PUBLIC_API_MAX_COST", 5_000)),
+    max_depth=int(os.getenv("PUBLIC_API_MAX_DEPTH", 8)),
+)
+
+
+class _CostCalculator:
+    def __init__(self, *, schema, fragments, variables, weights):
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables
+        self.weights = weights
+
+    def multiplier(self, parent_type, field_def, field_node):
+        if "paginationInput" in field_def.args:
+            pagination_input = None
+            for argument in field_node.arguments:
+                if argument.name.value == "paginationInput":
+                    pagination_input = graphql.value_from_ast_untyped(
+                        argument.value, self.variables
+                    )
+            if isinstance(pagination_input, dict):
+                size = pagination_input.get("first") or pagination_input.get("last")
+                if isinstance(size, int):
+                    return max(size, 1)
+            return DEFAULT_PAGINATION_LIMIT
+
+        field_type = graphql.get_nullable_type(field_def.type)
+        if graphql.is_list_type(field_type) and not parent_type.name.endswith("Page"):
+            return DEFAULT_LIST_SIZE
+        return 1
+
+    def selection_set_cost(self, parent_type, selection_set, depth):
+        """Return cost and maximum depth of the given selection set."""
+        cost = 0
+        max_depth = depth
+        for selection in selection_set.selections:
+            if isinstance(selection, graphql.FieldNode):
+                name = selection.name.value
+                fields = getattr(parent_type, "fields", {})
+                if name.startswith("__") or name not in fields:
+                    # Introspection fields are not taken into account
+                    continue
+
+                field_def = fields[name]
+                weight = self.weights.get(f"{parent_type.name}.{name}")
+                max_depth = max(max_depth, depth + 1)
+                if selection.selection_set is None:
+                    cost += weight or 0
+                    continue
+
+                child_cost, child_depth = self.selection_set_cost(
+                    graphql.get_named_type(field_def.type),
+                    selection.selection_set,
+                    depth + 1,
+                )
+                multiplier = self.multiplier(parent_type, field_def, selection)
+                cost += (1 if weight is None else weight) + multiplier * child_cost
+                max_depth = max(max_depth, child_depth)
+
+            else:
+                if isinstance(selection, graphql.FragmentSpreadNode):
+                    fragment = self.fragments.get(selection.name.value)
+                    if fragment is None:
+                        continue
+                    type_condition = fragment.type_condition
+                else:
+                    fragment = selection
+                    type_condition = selection.type_condition
+
+                fragment_type = (
+                    parent_type
+                    if type_condition is None
+                    else self.schema.get_type(type_condition.name.value)
+                )
+                if fragment_type is None:
+                    continue
+                child_cost, child_depth = self.selection_set_cost(
+                    fragment_type, fragment.selection_set, depth
+                )
+                cost += child_cost
+                max_depth = max(max_depth, child_depth)
+
+        return cost, max_depth
+
+
+def analyze_query_cost(
+    *, schema, document, operation_name=None, variables=None, weights=None
+):
+    """Return the estimated cost and the depth of the operation in the given document
+    (the one matching `operation_name`, or the first one). The document is assumed to
+    be validated against the schema.
+    """
+    fragments = {}
+    operation = None
+    for definition in document.definitions:
+        if isinstance(definition, graphql.FragmentDefinitionNode):
+            fragments[definition.name.value] = definition
+        elif isinstance(definition, graphql.OperationDefinitionNode):
+            if operation is None or (
+                operation_name is not None
+                and definition.name is not None
+                and definition.name.value == operation_name
+            ):
+                operation = definition
+
+    if operation is None:
+        return 0, 0
+
+    root_type = schema.get_root_type(operation.operation)
+    if root_type is None:
+        return 0, 0
+
+    calculator = _CostCalculator(
+        schema=schema,
+        fragments=fragments,
+        variables=variables or {},
+        weights=FIELD_WEIGHTS if weights is None else weights,
+    )
+    return calculator.selection_set_cost(root_type, operation.selection_set, 0)
+
+
+def check_cost_limits(*, cost, depth, limits):
+    """Return a list with a GraphQLError if given cost or depth exceed the limits,
+    otherwise an empty list.
+    """
+    if limits is None:
+        return []
+
+    description = None
+    if limits.max_depth is not None and depth > limits.max_depth:
+        description = (
+            f"The query depth ({depth}) exceeds the maximum of {limits.max_depth}."
+        )
+    elif limits.max_cost is not None and cost > limits.max_cost:
+        description = (
+            f"The estimated query cost ({cost}) exceeds the maximum of "
+            f"{limits.max_cost}. Consider requesting fewer fields or elements per page."
+        )
+
+    if description is None:
+        return []
+    return [
+        graphql.GraphQLError(
+            description,
+            extensions={"code": "BAD_USER_INPUT", "description": description},
+        )
+    ]
@@ -0,0 +1,94 @@
+"""Process-wide cache of parsed and validated GraphQL documents.
+
+The front-end sends the same few operations over and over. Parsing the query text and
+validating the resulting document against the schema is repeated work that can be
+skipped if the identical query text has been seen before.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import graphql
+
+DEFAULT_MAX_SIZE = 256
+
+
+class CachedDocument:
+    """Container for a parsed GraphQL document, the result of validating it against a
+    schema, and the results of beta-level checks for the document.
+    """
+
+    __slots__ = ("document", "validation_errors", "beta_level_checks")
+
+    def __init__(self, document):
+        self.document = document
+        # None as long as the document has not been validated
+        self.validation_errors = None
+        # Mapping of (is_god, max_beta_level) to the result of check_user_beta_level()
+        self.beta_level_checks = {}
+
+
+class DocumentCache:
+    """Bounded, thread-safe LRU cache of `CachedDocument`s. Entries are keyed by schema,
+    introspection flag, and the SHA-256 hash of the query text.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(schema, query, introspection):
+        digest = hashlib.sha256(query.encode()).hexdigest()
+        return id(schema), bool(introspection), digest
+
+    def get(self, *, schema, query, introspection):
+        """Return the cached entry for the given query. On a cache miss, parse the query
+        and store the result. Parsing errors are raised and nothing is cached.
+        """
+        key = self._key(schema, query, introspection)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = CachedDocument(graphql.parse(query))
+        if self.max_size <= 0:
+            return entry
+
+        with self._lock:
+            # Another thread might have stored the same query in the meantime
+            entry = self._entries.setdefault(key, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """Return hit/miss counters and current size of the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+
+document_cache = DocumentCache(
+    max_size=int(os.getenv("GRAPHQL_DOCUMENT_CACHE_SIZE", DEFAULT_MAX_SIZE))
+)
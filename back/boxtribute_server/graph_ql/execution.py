@@ -1,4 +1,9 @@
 import asyncio
+import contextlib
+import os
+import threading
+from collections.abc import Collection
+from functools import partial
 from typing import Any
 
 import ariadne
@@ -6,13 +11,23 @@ import graphql
 from flask import current_app, g, jsonify, request
 
 from ..authz import check_user_beta_level
+from ..db import db
 from ..exceptions import format_database_errors
+from ..logging import add_fields_to_request_log
+from ..models.reference_data import reference_data_cache
+from ..sql_counter import track_sql_queries
+from .cost import analyze_query_cost, check_cost_limits
+from .document_cache import document_cache
 from .loaders import (
     BaseLoader,
+    BeneficiariesForBaseLoader,
+    BoxesForLocationLoader,
     BoxLoader,
+    DataLoaderRegistry,
     HistoryForBoxLoader,
     InstockCountForBaseLoader,
     InstockItemsCountForProductLoader,
+    LanguagesForBeneficiaryLoader,
     LocationLoader,
     OrganisationLoader,
     ProductCategoryLoader,
@@ -30,86 +45,315 @@ from .loaders import (
     SourceBasesForAgreementLoader,
     StandardProductLoader,
     TagLastUsedOnLoader,
+    TagsForBeneficiaryLoader,
     TagsForBoxLoader,
     TargetBasesForAgreementLoader,
+    TokensForBeneficiaryLoader,
+    TransactionsForBeneficiaryLoader,
     TransferAgreementLoader,
     TransferItemsCountForProductLoader,
     UnitLoader,
     UnitsForDimensionLoader,
     UserLoader,
 )
+from .profiling import ProfilingExtension, should_profile_request
 
+# Factories for all DataLoaders available to resolvers via `info.context[name]`
+LOADER_FACTORIES = {
+    # fmt: off
+    "base_loader": BaseLoader,
+    "beneficiaries_for_base_loader": BeneficiariesForBaseLoader,
+    "box_loader": BoxLoader,
+    "boxes_for_location_loader": BoxesForLocationLoader,
+    "history_for_box_loader": HistoryForBoxLoader,
+    "instock_boxes_count_for_base_loader": InstockCountForBaseLoader,
+    "instock_items_count_for_base_loader": partial(InstockCountForBaseLoader, count_boxes=False),  # noqa
+    "instock_items_count_for_product_loader": InstockItemsCountForProductLoader,
+    "languages_for_beneficiary_loader": LanguagesForBeneficiaryLoader,
+    "transfer_items_count_for_product_loader": TransferItemsCountForProductLoader,
+    "location_loader": LocationLoader,
+    "organisation_loader": OrganisationLoader,
+    "product_category_loader": ProductCategoryLoader,
+    "product_loader": ProductLoader,
+    "qr_code_loader": QrCodeLoader,
+    "resources_for_tag_loader": ResourcesForTagLoader,
+    "shipment_detail_auto_matching_loader": ShipmentDetailAutoMatchingLoader,
+    "shipment_detail_for_box_loader": ShipmentDetailForBoxLoader,
+    "shipment_details_for_shipment_loader": ShipmentDetailsForShipmentLoader,
+    "shipment_loader": ShipmentLoader,
+    "shipments_for_agreement_loader": ShipmentsForAgreementLoader,
+    "size_loader": SizeLoader,
+    "size_range_loader": SizeRangeLoader,
+    "sizes_for_size_range_loader": SizesForSizeRangeLoader,
+    "source_bases_for_agreement_loader": SourceBasesForAgreementLoader,
+    "standard_product_loader": StandardProductLoader,
+    "tag_last_used_on_loader": TagLastUsedOnLoader,
+    "tags_for_beneficiary_loader": TagsForBeneficiaryLoader,
+    "tags_for_box_loader": TagsForBoxLoader,
+    "target_bases_for_agreement_loader": TargetBasesForAgreementLoader,
+    "tokens_for_beneficiary_loader": TokensForBeneficiaryLoader,
+    "transactions_for_beneficiary_loader": TransactionsForBeneficiaryLoader,
+    "transfer_agreement_loader": TransferAgreementLoader,
+    "units_for_dimension_loader": UnitsForDimensionLoader,
+    "unit_loader": UnitLoader,
+    "user_loader": UserLoader,
+    # fmt: on
+}
 
-def parse_with_beta_level_check(_, data: dict[str, Any]) -> graphql.DocumentNode:
-    """Custom GraphQL parser running a beta-level check on the payload of the incoming
-    request.
+
+def _top_level_field_names(selection_set, fragments):
+    for selection in selection_set.selections:
+        if isinstance(selection, graphql.FieldNode):
+            yield selection.name.value
+        elif isinstance(selection, graphql.InlineFragmentNode):
+            yield from _top_level_field_names(selection.selection_set, fragments)
+        elif fragment := fragments.get(selection.name.value):
+            yield from _top_level_field_names(fragment.selection_set, fragments)
+
+
+def is_read_only_operation(document, *, operation_name=None, fields) -> bool:
+    """Return True if the operation of the given validated document is a query that
+    selects only top-level fields contained in `fields` (fields of fragments on the
+    Query type included). Introspection fields like `__typename` are always permitted.
+    """
+    operation = graphql.get_operation_ast(document, operation_name)
+    if operation is None or operation.operation != graphql.OperationType.QUERY:
+        return False
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, graphql.FragmentDefinitionNode)
+    }
+    return all(
+        name.startswith("__") or name in fields
+        for name in _top_level_field_names(operation.selection_set, fragments)
+    )
+
+
+def create_cached_query_handlers(
+    *,
+    schema,
+    introspection,
+    check_beta_level,
+    cost_limits=None,
+    replica_fields=None,
+    routing=None,
+):
+    """Create a custom GraphQL parser and validator for the current request. Both
+    consult the process-wide document cache, hence parsing the query text and validating
+    the document against the schema is skipped for known queries.
+    If `check_beta_level` is set, the parser runs a beta-level check on the payload of
+    the incoming request. Its result is cached per document and user beta-level.
+    After successful validation, the cost of the requested operation is estimated and
+    added to the request log. Operations exceeding the given `cost_limits` are rejected.
+    Accepted read-only operations (see `is_read_only_operation`) are routed to the
+    database replica for the remainder of the `routing` context (an ExitStack) if
+    `replica_fields` are given.
+    """
+    # The parser stores the request data and the cache entry of the request's query for
+    # the validator
+    current = {}
+
+    def parse(_, data: dict[str, Any]) -> graphql.DocumentNode:
+        entry = document_cache.get(
+            schema=schema, query=data["query"], introspection=introspection
+        )
+        current["entry"] = entry
+        current["data"] = data
+
+        if check_beta_level:
+            beta_level_key = (g.user.is_god, g.user.max_beta_level)
+            authzed = entry.beta_level_checks.get(beta_level_key)
+            if authzed is None:
+                authzed = check_user_beta_level(entry.document, current_user=g.user)
+                entry.beta_level_checks[beta_level_key] = authzed
+            if not authzed:
+                # This will be caught in ariadne.graphql() and added to the "errors"
+                # field of the response
+                raise graphql.GraphQLError("Insufficient beta-level")
+        return entry.document
+
+    def validate(schema, document_ast, *args, **kwargs) -> list[graphql.GraphQLError]:
+        entry = current.get("entry")
+        if entry is None or entry.document is not document_ast:
+            return graphql.validate(schema, document_ast, *args, **kwargs)
+        if entry.validation_errors is None:
+            entry.validation_errors = graphql.validate(
+                schema, document_ast, *args, **kwargs
+            )
+        if entry.validation_errors:
+            return entry.validation_errors
+
+        data = current["data"]
+        cost, depth = analyze_query_cost(
+            schema=schema,
+            document=document_ast,
+            operation_name=data.get("operationName"),
+            variables=data.get("variables"),
+        )
+        add_fields_to_request_log(query_cost=cost, query_depth=depth)
+        errors = check_cost_limits(cost=cost, depth=depth, limits=cost_limits)
+        if (
+            not errors
+            and replica_fields is not None
+            and routing is not None
+            and is_read_only_operation(
+                document_ast,
+                operation_name=data.get("operationName"),
+                fields=replica_fields,
+            )
+        ):
+            routing.enter_context(db.use_replica())
+        return errors
+
+    return parse, validate
+
+
+# Storage for event loops that are kept alive across requests (one per thread)
+_thread_local = threading.local()
+
+
+def use_persistent_event_loop() -> bool:
+    return os.getenv("PERSISTENT_EVENT_LOOP") == "true"
+
+
+def _get_persistent_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the event loop of the current thread. It is created on first usage (i.e.
+    after the gunicorn worker has been forked) and then re-used for all subsequent
+    requests handled by the thread.
     """
-    graphql_document = graphql.parse(data["query"])
-    authzed = check_user_beta_level(graphql_document, current_user=g.user)
-    if not authzed:
-        # This will be caught in ariadne.graphql() and added to the "errors" field of
-        # the response
-        raise graphql.GraphQLError("Insufficient beta-level")
-    return graphql_document
-
-
-def execute_async(*, schema, introspection=None, data=None, check_beta_level=False):
-    """Create coroutine and execute it with high-level `asyncio.run` which takes care of
-    managing the asyncio event loop, finalizing asynchronous generators, and closing
-    the threadpool.
+    loop = getattr(_thread_local, "event_loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _thread_local.event_loop = loop
+    return loop
+
+
+def run_coroutine(coroutine, *, persistent_loop=None):
+    """Run the given coroutine until completion and return its result.
+    By default (or if `persistent_loop` is False), the high-level `asyncio.run` is used
+    which takes care of creating the asyncio event loop, finalizing asynchronous
+    generators, and closing the threadpool. This setup/teardown has to be paid for on
+    every call.
+    If `persistent_loop` is True (default: value of the PERSISTENT_EVENT_LOOP
+    environment variable), the coroutine is run in a long-lived event loop that is
+    private to the current thread. Any tasks left pending by the coroutine are cancelled
+    such that no state leaks into the next call.
     """
+    if persistent_loop is None:
+        persistent_loop = use_persistent_event_loop()
+    if not persistent_loop:
+        return asyncio.run(coroutine)
+
+    loop = _get_persistent_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        pending_tasks = asyncio.all_tasks(loop)
+        for task in pending_tasks:
+            task.cancel()
+        if pending_tasks:
+            loop.run_until_complete(
+                asyncio.gather(*pending_tasks, return_exceptions=True)
+            )
+        asyncio.set_event_loop(None)
+
+
+def _extract_consistency_token(payload):
+    try:
+        return int(payload["extensions"]["consistencyToken"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def execute_async(
+    *,
+    schema,
+    introspection=None,
+    data=None,
+    check_beta_level=False,
+    cost_limits=None,
+    replica_fields: Collection[str] | None = None,
+):
+    """Create coroutine and execute it with `run_coroutine`, either in a fresh or in a
+    persistent event loop.
+    DataLoaders are instantiated inside of the coroutine, hence their state is isolated
+    per request regardless of the event loop mode.
+    Operations exceeding the given `cost_limits` (a `CostLimits` instance) are rejected
+    before execution.
+    Queries selecting only top-level fields among `replica_fields` are executed against
+    the database replica. If the request sends a consistency token (as
+    `extensions.consistencyToken`), the replica is only used if it has caught up with
+    it. Operations that modified data return a new token in the response extensions.
+    A sampled fraction of requests is profiled (see PROFILING_SAMPLE_RATE). In debug
+    mode the profile is part of the response, otherwise it is added to the request log.
+    The executed SQL statements are counted and statements repeated suspiciously often
+    are logged; in debug mode the full report is part of the response. If the
+    reference data cache was accessed, its hit rate is logged.
+    """
+    if introspection is None:
+        introspection = current_app.debug
+    extensions = None
+    if should_profile_request():
+        extensions = [partial(ProfilingExtension, in_response=current_app.debug)]
+    # Request body was already parsed (and cached) in DatabaseManager.connect_db
+    data = data or request.get_json()
+    consistency_token = _extract_consistency_token(data)
+    routing = contextlib.ExitStack()
+    query_parser, query_validator = create_cached_query_handlers(
+        schema=schema,
+        introspection=introspection,
+        check_beta_level=check_beta_level,
+        cost_limits=cost_limits,
+        replica_fields=replica_fields,
+        routing=routing,
+    )
 
     async def run():
-        # Create DataLoaders and persist them for the time of processing the request.
-        # DataLoaders require an event loop which is set up by asyncio.run
-        context = {
-            # fmt: off
-            "base_loader": BaseLoader(),
-            "box_loader": BoxLoader(),
-            "history_for_box_loader": HistoryForBoxLoader(),
-            "instock_boxes_count_for_base_loader": InstockCountForBaseLoader(),
-            "instock_items_count_for_base_loader": InstockCountForBaseLoader(count_boxes=False),  # noqa
-            "instock_items_count_for_product_loader": InstockItemsCountForProductLoader(),  # noqa
-            "transfer_items_count_for_product_loader": TransferItemsCountForProductLoader(),  # noqa
-            "location_loader": LocationLoader(),
-            "organisation_loader": OrganisationLoader(),
-            "product_category_loader": ProductCategoryLoader(),
-            "product_loader": ProductLoader(),
-            "qr_code_loader": QrCodeLoader(),
-            "resources_for_tag_loader": ResourcesForTagLoader(),
-            "shipment_detail_auto_matching_loader": ShipmentDetailAutoMatchingLoader(),
-            "shipment_detail_for_box_loader": ShipmentDetailForBoxLoader(),
-            "shipment_details_for_shipment_loader": ShipmentDetailsForShipmentLoader(),
-            "shipment_loader": ShipmentLoader(),
-            "shipments_for_agreement_loader": ShipmentsForAgreementLoader(),
-            "size_loader": SizeLoader(),
-            "size_range_loader": SizeRangeLoader(),
-            "sizes_for_size_range_loader": SizesForSizeRangeLoader(),
-            "source_bases_for_agreement_loader": SourceBasesForAgreementLoader(),
-            "standard_product_loader": StandardProductLoader(),
-            "tag_last_used_on_loader": TagLastUsedOnLoader(),
-            "tags_for_box_loader": TagsForBoxLoader(),
-            "target_bases_for_agreement_loader": TargetBasesForAgreementLoader(),
-            "transfer_agreement_loader": TransferAgreementLoader(),
-            "units_for_dimension_loader": UnitsForDimensionLoader(),
-            "unit_loader": UnitLoader(),
-            "user_loader": UserLoader(),
-            # fmt: on
-        }
+        # Provide DataLoaders for the time of processing the request. They are created
+        # lazily on first access. DataLoaders require an event loop which is running at
+        # this point
+        context = DataLoaderRegistry(LOADER_FACTORIES)
 
         # Execute the GraphQL request against schema, passing in context
-        results = await ariadne.graphql(
-            schema,
-            data=data or request.get_json(),
-            query_parser=parse_with_beta_level_check if check_beta_level else None,
-            context_value=context,
-            debug=current_app.debug,
-            introspection=current_app.debug if introspection is None else introspection,
-            error_formatter=format_database_errors,
+        with routing:
+            if consistency_token is not None:
+                routing.enter_context(db.require_consistency(consistency_token))
+            results = await ariadne.graphql(
+                schema,
+                data=data,
+                query_parser=query_parser,
+                query_validator=query_validator,
+                context_value=context,
+                debug=current_app.debug,
+                introspection=introspection,
+                error_formatter=format_database_errors,
+                extensions=extensions,
+            )
+        add_fields_to_request_log(
+            data_loaders={
+                "used": context.used_loaders,
+                "available": len(LOADER_FACTORIES),
+            }
         )
         return results
 
-    success, result = asyncio.run(run())
+    reference_data_accesses = reference_data_cache.accesses
+    with track_sql_queries() as sql_counter:
+        success, result = run_coroutine(run())
+    add_fields_to_request_log(
+        sql_queries={
+            "count": sql_counter.count,
+            "repeated": sql_counter.repeated_shapes(),
+        }
+    )
+    if reference_data_cache.accesses != reference_data_accesses:
+        add_fields_to_request_log(reference_data_cache=reference_data_cache.info())
+    if current_app.debug:
+        result.setdefault("extensions", {})["sqlQueries"] = sql_counter.report()
+    if sql_counter.writes and (token := db.consistency_token()) is not None:
+        result.setdefault("extensions", {})["consistencyToken"] = token
 
     status_code = 200 if success or "data" in result else 400
     return jsonify(result), status_code
@@ -1,20 +1,17 @@
 from collections import defaultdict
-from datetime import datetime
-from functools import partial
 
 from aiodataloader import DataLoader as _DataLoader
-from peewee import SQL, Case, NodeList, fn
+from peewee import fn
 
 from ..authz import authorize, authorized_bases_filter
-from ..db import execute_sql
 from ..enums import BoxState as BoxStateEnum
 from ..enums import TaggableObjectType
 from ..exceptions import Forbidden
 from ..models.definitions.base import Base
 from ..models.definitions.beneficiary import Beneficiary
 from ..models.definitions.box import Box
-from ..models.definitions.box_state import BoxState
 from ..models.definitions.history import DbChangeHistory
+from ..models.definitions.history_message import HistoryMessage
 from ..models.definitions.location import Location
 from ..models.definitions.organisation import Organisation
 from ..models.definitions.product import Product
@@ -28,12 +25,17 @@ from ..models.definitions.size_range_size import SizeRangeSize
 from ..models.definitions.standard_product import StandardProduct
 from ..models.definitions.tag import Tag
 from ..models.definitions.tags_relation import TagsRelation
+from ..models.definitions.transaction import Transaction
 from ..models.definitions.transfer_agreement import TransferAgreement
 from ..models.definitions.transfer_agreement_detail import TransferAgreementDetail
 from ..models.definitions.unit import Unit
 from ..models.definitions.user import User
-from ..models.utils import convert_ids
+from ..models.definitions.x_beneficiary_language import XBeneficiaryLanguage
+from ..models.history_messages import select_box_history_messages
+from ..models.reference_data import reference_data_cache
 from ..utils import convert_pascal_to_snake_case
+from .filtering import derive_beneficiary_filter, derive_box_filter
+from .pagination import load_first_pages
 
 
 class DataLoader(_DataLoader):
@@ -45,6 +47,37 @@ class DataLoader(_DataLoader):
         return super().load(key)
 
 
+class DataLoaderRegistry(dict):
+    """Mapping of names to the DataLoaders of the current request. A DataLoader is only
+    instantiated when it is accessed for the first time (e.g. by
+    `info.context["box_loader"]` in a resolver), using the factory registered under the
+    same name. Accessing an unknown name raises a KeyError.
+    If a profile is attached (see ProfilingExtension), new DataLoaders are instrumented.
+    """
+
+    profile = None
+
+    def __init__(self, factories):
+        super().__init__()
+        self._factories = factories
+
+    def __missing__(self, name):
+        loader = self._factories[name]()
+        if self.profile is not None:
+            self.profile.instrument(name, loader)
+        self[name] = loader
+        return loader
+
+    @property
+    def used_loaders(self):
+        """Names of all DataLoaders instantiated so far."""
+        return sorted(name for name in self if name in self._factories)
+
+    @property
+    def available_loaders(self):
+        return sorted(self._factories)
+
+
 class SimpleDataLoader(DataLoader):
     """Custom implementation that batch-loads all requested rows of the specified data
     model, optionally enforcing authorization for the resource.
@@ -68,6 +101,21 @@ class SimpleDataLoader(DataLoader):
         return [rows.get(i) for i in ids]
 
 
+class ReferenceDataLoader(SimpleDataLoader):
+    """Loader for rows of rarely changing catalog tables. They are served by the
+    process-wide reference data cache, if enabled.
+    """
+
+    async def batch_load_fn(self, ids):
+        if not reference_data_cache.enabled():
+            return await super().batch_load_fn(ids)
+
+        if not self.skip_authorize:
+            authorize(permission=self.permission)
+        rows = reference_data_cache.by_id(self.model)
+        return [rows.get(i) for i in ids]
+
+
 class BaseLoader(SimpleDataLoader):
     def __init__(self):
         super().__init__(Base, skip_authorize=True)
@@ -98,12 +146,12 @@ class QrCodeLoader(SimpleDataLoader):
         super().__init__(QrCode, permission="qr:read")
 
 
-class SizeLoader(SimpleDataLoader):
+class SizeLoader(ReferenceDataLoader):
     def __init__(self):
         super().__init__(Size)
 
 
-class UnitLoader(SimpleDataLoader):
+class UnitLoader(ReferenceDataLoader):
     def __init__(self):
         super().__init__(Unit)
 
@@ -118,17 +166,17 @@ class UserLoader(SimpleDataLoader):
         super().__init__(User)
 
 
-class ProductCategoryLoader(SimpleDataLoader):
+class ProductCategoryLoader(ReferenceDataLoader):
     def __init__(self):
         super().__init__(ProductCategory)
 
 
-class SizeRangeLoader(SimpleDataLoader):
+class SizeRangeLoader(ReferenceDataLoader):
     def __init__(self):
         super().__init__(SizeRange)
 
 
-class StandardProductLoader(SimpleDataLoader):
+class StandardProductLoader(ReferenceDataLoader):
     def __init__(self):
         super().__init__(StandardProduct)
 
@@ -232,300 +280,221 @@ class TagsForBoxLoader(DataLoader):
         return [sorted(tags.get(i, []), key=lambda t: t.id) for i in keys]
 
 
-class HistoryForBoxLoader(DataLoader):
-    async def batch_load_fn(self, box_ids):
-        History = DbChangeHistory.alias()
-        ToProduct = Product.alias()
-        ToLocation = Location.alias()
-        ToSize = Size.alias()
-        ToBoxState = BoxState.alias()
-        ToUnit = Unit.alias()
-
-        # Subquery to exclude assigned-tag messages at the time of box creation
-        CreatedTagsRelation = (
-            TagsRelation.select(
-                fn.CONCAT("ta", TagsRelation.id).alias("change_id"),
-                TagsRelation.created_on,
-                TagsRelation.created_by,
-                fn.CONCAT("assigned tag '", Tag.name, "' to box").alias("message"),
-                TagsRelation.object_id,
-            )
+class TagsForBeneficiaryLoader(DataLoader):
+    async def batch_load_fn(self, beneficiary_ids):
+        tags = defaultdict(list)
+        for relation in (
+            TagsRelation.select(TagsRelation.object_id, Tag)
             .join(Tag)
-            .join(
-                Box,
-                on=(
-                    (TagsRelation.object_id == Box.id)
-                    & (TagsRelation.object_type == TaggableObjectType.Box),
-                ),
-            )
             .where(
-                TagsRelation.created_on != Box.created_on,
-                TagsRelation.created_on.is_null(False),
+                (TagsRelation.object_type == TaggableObjectType.Beneficiary)
+                & (TagsRelation.object_id << beneficiary_ids)
+                & (TagsRelation.deleted_on.is_null())
             )
+        ):
+            tags[relation.object_id].append(relation.tag)
+        # Return empty list if beneficiary has no tags assigned
+        return [sorted(tags.get(i, []), key=lambda t: t.id) for i in beneficiary_ids]
+
+
+class TokensForBeneficiaryLoader(DataLoader):
+    async def batch_load_fn(self, beneficiary_ids):
+        tokens = {
+            transaction.beneficiary_id: transaction.total_tokens
+            for transaction in Transaction.select(
+                Transaction.beneficiary,
+                fn.SUM(Transaction.tokens).alias("total_tokens"),
+            )
+            .where(Transaction.beneficiary << beneficiary_ids)
+            .group_by(Transaction.beneficiary)
+        }
+        # Return 0 if beneficiary has no transactions yet
+        return [tokens.get(i) or 0 for i in beneficiary_ids]
+
+
+class TransactionsForBeneficiaryLoader(DataLoader):
+    async def batch_load_fn(self, beneficiary_ids):
+        transactions = defaultdict(list)
+        for transaction in (
+            Transaction.select()
+            .where(Transaction.beneficiary << beneficiary_ids)
+            .order_by(Transaction.id)
+        ):
+            transactions[transaction.beneficiary_id].append(transaction)
+        # Return empty list if beneficiary has no transactions
+        return [transactions.get(i, []) for i in beneficiary_ids]
+
+
+class LanguagesForBeneficiaryLoader(DataLoader):
+    async def batch_load_fn(self, beneficiary_ids):
+        languages = defaultdict(list)
+        for relation in XBeneficiaryLanguage.select(
+            XBeneficiaryLanguage.beneficiary, XBeneficiaryLanguage.language
+        ).where(XBeneficiaryLanguage.beneficiary << beneficiary_ids):
+            # Use the foreign key value to avoid fetching the Language row
+            languages[relation.beneficiary_id].append(relation.language_id)
+        # Return empty list if beneficiary has no languages assigned
+        return [languages.get(i, []) for i in beneficiary_ids]
+
+
+class FirstPageLoader(DataLoader):
+    """Load the first page of elements of the `model` for multiple parents (referenced
+    by `parent_field`) with a single query (see `load_first_pages()`). Keys are tuples
+    of parent ID, page size, and filter input (converted to a hashable tuple). Pages
+    with equal size and filter input are loaded together.
+    `derive_filter` returns filter condition and model selection for a filter input.
+    """
+
+    def __init__(self, model, *, parent_field, derive_filter):
+        super().__init__()
+        self.model = model
+        self.parent_field = parent_field
+        self.derive_filter = derive_filter
+
+    def load_page(self, parent_id, *, limit, filter_input=None):
+        frozen_filter_input = tuple(
+            sorted(
+                (name, tuple(value) if isinstance(value, list) else value)
+                for name, value in (filter_input or {}).items()
+            )
+        )
+        return self.load((parent_id, limit, frozen_filter_input))
+
+    async def batch_load_fn(self, keys):
+        parent_ids = defaultdict(list)
+        for parent_id, limit, frozen_filter_input in keys:
+            parent_ids[(limit, frozen_filter_input)].append(parent_id)
+
+        pages = {}
+        for (limit, frozen_filter_input), ids in parent_ids.items():
+            condition, selection = self.derive_filter(dict(frozen_filter_input))
+            for parent_id, page in load_first_pages(
+                self.model,
+                condition,
+                parent_field=self.parent_field,
+                parent_ids=ids,
+                selection=selection,
+                limit=limit,
+            ).items():
+                pages[(parent_id, limit, frozen_filter_input)] = page
+        return [pages[key] for key in keys]
+
+
+class BoxesForLocationLoader(FirstPageLoader):
+    def __init__(self):
+        super().__init__(
+            Box, parent_field=Box.location, derive_filter=derive_box_filter
         )
 
-        # Increase the default of 1024 (would be exceeded for concat'ing the change_date
-        # column of a box with 54 or more history entries).
-        execute_sql(query="SET SESSION group_concat_max_len = 10000;")
-        # Return formatted history entries of boxes with given IDs, sorted by most
-        # recent first.
-        # Group history entry IDs, change dates, user IDs, and formatted messages for
-        # each box. Convert these into Python lists of appropriate data type
+
+class BeneficiariesForBaseLoader(FirstPageLoader):
+    def __init__(self):
+        super().__init__(
+            Beneficiary,
+            parent_field=Beneficiary.base,
+            derive_filter=lambda filter_input: (
+                derive_beneficiary_filter(filter_input),
+                Beneficiary.select(),
+            ),
+        )
+
+
+def _history_sort_key(entry):
+    # Sort by change date; for identical dates, list history entries (most recent
+    # first), then tag assignments, then tag removals
+    entry_id = str(entry.id)
+    rank = {"ta": 1, "tr": 2}.get(entry_id[:2], 0)
+    return entry.change_date, -rank, int(entry_id.lstrip("tar"))
+
+
+class HistoryForBoxLoader(DataLoader):
+    async def batch_load_fn(self, box_ids):
+        # Select one row per history entry (as opposed to aggregating all entries of a
+        # box with GROUP_CONCAT), hence the result size is not limited by the
+        # group_concat_max_len setting. All parts of the union are restricted to the
+        # requested boxes. The ID columns are strings (e.g. 'ta1' for tag assignments),
+        # hence the conversion to int of DbChangeHistory.id is disabled
         result = (
             (
-                History.select(
-                    # This translates to 'GROUP_CONCAT(h.id ORDER BY h.id DESC)'
-                    fn.GROUP_CONCAT(
-                        NodeList((History.id, SQL("ORDER BY"), History.id.desc()))
-                    )
-                    .python_value(partial(convert_ids, converter=str))
-                    .alias("ids"),
-                    fn.GROUP_CONCAT(
-                        NodeList(
-                            (History.change_date, SQL("ORDER BY"), History.id.desc())
-                        )
-                    )
-                    .python_value(
-                        partial(convert_ids, converter=datetime.fromisoformat)
-                    )
-                    .alias("change_dates"),
-                    fn.GROUP_CONCAT(
-                        NodeList(
-                            (
-                                (
-                                    fn.IFNULL(History.user, SQL("NULL")),
-                                    SQL("ORDER BY"),
-                                    History.id.desc(),
-                                )
-                            )
-                        )
-                    )
-                    .python_value(convert_ids)
-                    .alias("user_ids"),
-                    fn.GROUP_CONCAT(
-                        NodeList(
-                            (
-                                (
-                                    Case(
-                                        None,
-                                        (
-                                            (
-                                                (History.changes == "location_id"),
-                                                fn.CONCAT(
-                                                    "changed box location from ",
-                                                    Location.name,
-                                                    " to ",
-                                                    ToLocation.name,
-                                                ),
-                                            ),
-                                            (
-                                                (History.changes == "product_id"),
-                                                fn.CONCAT(
-                                                    "changed product type from ",
-                                                    Product.name,
-                                                    " to ",
-                                                    ToProduct.name,
-                                                ),
-                                            ),
-                                            (
-                                                (History.changes == "size_id"),
-                                                fn.CONCAT(
-                                                    "changed size from ",
-                                                    Size.label,
-                                                    " to ",
-                                                    ToSize.label,
-                                                ),
-                                            ),
-                                            (
-                                                (History.changes == "display_unit_id"),
-                                                fn.CONCAT(
-                                                    "changed unit from ",
-                                                    Unit.symbol,
-                                                    " to ",
-                                                    ToUnit.symbol,
-                                                ),
-                                            ),
-                                            (
-                                                (History.changes == "box_state_id"),
-                                                fn.CONCAT(
-                                                    "changed box state from ",
-                                                    BoxState.label,
-                                                    " to ",
-                                                    ToBoxState.label,
-                                                ),
-                                            ),
-                                            (
-                                                (History.changes == "items"),
-                                                fn.CONCAT(
-                                                    "changed the number of items from ",
-                                                    History.from_int,
-                                                    " to ",
-                                                    History.to_int,
-                                                ),
-                                            ),
-                                            (
-                                                (
-                                                    History.changes.startswith(
-                                                        "comments"
-                                                    )
-                                                ),
-                                                fn.REPLACE(
-                                                    History.changes,
-                                                    "comments changed",
-                                                    "changed comments",
-                                                ),
-                                            ),
-                                            (
-                                                # Convert "Record created/deleted"
-                                                # into "created/deleted box"
-                                                (History.changes.startswith("Record")),
-                                                fn.CONCAT(
-                                                    fn.SUBSTRING(History.changes, 8),
-                                                    " box",
-                                                ),
-                                            ),
-                                            (
-                                                (
-                                                    History.changes
-                                                    == "New Qr-code assigned by pdf generation."  # noqa
-                                                ),
-                                                "created QR code label for box",
-                                            ),
-                                        ),
-                                        History.changes,
-                                    ),
-                                    SQL("ORDER BY"),
-                                    History.id.desc(),
-                                )
-                            )
-                        )
-                    )
-                    .python_value(partial(convert_ids, converter=str))
-                    .alias("messages"),
-                    History.record_id,
-                )
-                .left_outer_join(
-                    Product,
-                    on=(
-                        (Product.id == History.from_int)
-                        & (History.changes == "product_id")
-                    ),
+                # History entries with the messages stored when writing the entries
+                DbChangeHistory.select(
+                    fn.CONCAT("", DbChangeHistory.id).coerce(False).alias("change_id"),
+                    DbChangeHistory.change_date.alias("change_date"),
+                    DbChangeHistory.user.alias("user_id"),
+                    HistoryMessage.message.alias("message"),
+                    DbChangeHistory.record_id,
                 )
                 .left_outer_join(
-                    ToProduct,
-                    on=(
-                        (ToProduct.id == History.to_int)
-                        & (History.changes == "product_id")
-                    ),
+                    HistoryMessage, on=(HistoryMessage.history == DbChangeHistory.id)
                 )
-                .left_outer_join(
-                    Location,
-                    on=(
-                        (Location.id == History.from_int)
-                        & (History.changes == "location_id")
-                    ),
-                )
-                .left_outer_join(
-                    ToLocation,
-                    on=(
-                        (ToLocation.id == History.to_int)
-                        & (History.changes == "location_id")
-                    ),
-                )
-                .left_outer_join(
-                    Size,
-                    on=((Size.id == History.from_int) & (History.changes == "size_id")),
-                )
-                .left_outer_join(
-                    ToSize,
-                    on=((ToSize.id == History.to_int) & (History.changes == "size_id")),
-                )
-                .left_outer_join(
-                    Unit,
-                    on=(
-                        (Unit.id == History.from_int)
-                        & (History.changes == "display_unit_id")
-                    ),
-                )
-                .left_outer_join(
-                    ToUnit,
-                    on=(
-                        (ToUnit.id == History.to_int)
-                        & (History.changes == "display_unit_id")
-                    ),
-                )
-                .left_outer_join(
-                    BoxState,
-                    on=(
-                        (BoxState.id == History.from_int)
-                        & (History.changes == "box_state_id")
-                    ),
-                )
-                .left_outer_join(
-                    ToBoxState,
-                    on=(
-                        (ToBoxState.id == History.to_int)
-                        & (History.changes == "box_state_id")
-                    ),
+                .where(
+                    DbChangeHistory.table_name == Box._meta.table_name,
+                    DbChangeHistory.record_id << box_ids,
                 )
-                .where(History.table_name == "stock", History.record_id << box_ids)
-                .group_by(History.record_id)
             )
             + (
                 # Information about tag assignments
                 TagsRelation.select(
-                    fn.GROUP_CONCAT(CreatedTagsRelation.c.change_id).alias("ids"),
-                    fn.GROUP_CONCAT(CreatedTagsRelation.c.created_on).alias(
-                        "change_dates"
-                    ),
-                    fn.GROUP_CONCAT(CreatedTagsRelation.c.created_by_id).alias(
-                        "user_ids"
-                    ),
-                    fn.GROUP_CONCAT(CreatedTagsRelation.c.message).alias("messages"),
-                    CreatedTagsRelation.c.object_id.alias("record_id"),
+                    fn.CONCAT("ta", TagsRelation.id),
+                    TagsRelation.created_on,
+                    TagsRelation.created_by,
+                    fn.CONCAT("assigned tag '", Tag.name, "' to box"),
+                    TagsRelation.object_id,
+                )
+                .join(Tag)
+                .join(Box, on=(TagsRelation.object_id == Box.id))
+                .where(
+                    TagsRelation.object_type == TaggableObjectType.Box,
+                    TagsRelation.object_id << box_ids,
+                    TagsRelation.created_on.is_null(False),
+                    # Exclude assigned-tag messages at the time of box creation
+                    TagsRelation.created_on != Box.created_on,
                 )
-                .from_(CreatedTagsRelation)
-                .group_by(CreatedTagsRelation.c.object_id)
             )
             + (
-                # Information about all tag removals
+                # Information about tag removals
                 TagsRelation.select(
-                    fn.GROUP_CONCAT(fn.CONCAT("tr", TagsRelation.id)).alias("ids"),
-                    fn.GROUP_CONCAT(TagsRelation.deleted_on).alias("change_dates"),
-                    fn.GROUP_CONCAT(TagsRelation.deleted_by).alias("user_ids"),
-                    fn.GROUP_CONCAT(
-                        fn.CONCAT("removed tag '", Tag.name, "' from box")
-                    ).alias("messages"),
-                    TagsRelation.object_id.alias("record_id"),
+                    fn.CONCAT("tr", TagsRelation.id),
+                    TagsRelation.deleted_on,
+                    TagsRelation.deleted_by,
+                    fn.CONCAT("removed tag '", Tag.name, "' from box"),
+                    TagsRelation.object_id,
                 )
                 .join(Tag)
                 .where(
                     TagsRelation.object_type == TaggableObjectType.Box,
+                    TagsRelation.object_id << box_ids,
                     TagsRelation.deleted_on.is_null(False),
                 )
-                .group_by(TagsRelation.object_id)
             )
         )
+        rows = list(result.dicts())
+
+        # Render messages of entries that were written without (e.g. by the legacy app)
+        missing_ids = [int(r["change_id"]) for r in rows if r["message"] is None]
+        messages = {}
+        if missing_ids:
+            messages = dict(
+                select_box_history_messages(DbChangeHistory.id << missing_ids).tuples()
+            )
 
-        # Construct mapping of box IDs and their history information
+        # Construct mapping of box IDs and their history entries
         box_histories = defaultdict(list)
-        for row in result.dicts():
-            box_histories[row["record_id"]].extend(
-                [
-                    DbChangeHistory(id=i, user=u, changes=c, change_date=d)
-                    for i, u, c, d in zip(
-                        row["ids"],
-                        row["user_ids"],
-                        row["messages"],
-                        row["change_dates"],
-                    )
-                ]
+        for row in rows:
+            message = row["message"]
+            if message is None:
+                message = messages.get(int(row["change_id"]))
+            box_histories[row["record_id"]].append(
+                DbChangeHistory(
+                    id=row["change_id"],
+                    user=row["user_id"],
+                    changes=message,
+                    change_date=row["change_date"],
+                )
             )
         # Sort combined history by change date, newest first
-        for box_id, history in box_histories.items():
-            box_histories[box_id] = sorted(
-                history, key=lambda e: e.change_date, reverse=True
-            )
+        for history in box_histories.values():
+            history.sort(key=_history_sort_key, reverse=True)
 
         return [box_histories.get(i, []) for i in box_ids]
 
@@ -634,11 +603,20 @@ class InstockCountForBaseLoader(DataLoader):
 class SizesForSizeRangeLoader(DataLoader):
     async def batch_load_fn(self, keys):
         authorize(permission="size:read")
+        if reference_data_cache.enabled():
+            size_range_sizes = reference_data_cache.grouped(SizeRangeSize.size_range)
+            sizes = reference_data_cache.by_id(Size)
+            return [
+                [sizes[srs.size_id] for srs in size_range_sizes.get(i, [])]
+                for i in keys
+            ]
+
         # Mapping of size range ID to list of sizes
         sizes = defaultdict(list)
         for srs in (
             SizeRangeSize.select(SizeRangeSize, Size)
             .join(Size)
+            .where(SizeRangeSize.size_range << keys)
             .order_by(SizeRangeSize.size_range, SizeRangeSize.seq)
         ):
             sizes[srs.size_range_id].append(srs.size)
@@ -648,9 +626,13 @@ class SizesForSizeRangeLoader(DataLoader):
 
 class UnitsForDimensionLoader(DataLoader):
     async def batch_load_fn(self, keys):
+        if reference_data_cache.enabled():
+            units = reference_data_cache.grouped(Unit.dimension)
+            return [units.get(i, []) for i in keys]
+
         # Mapping of size range ID (dimension) to list of units
         units = defaultdict(list)
-        for unit in Unit.select().iterator():
+        for unit in Unit.select().where(Unit.dimension << keys).order_by(Unit.id):
             units[unit.dimension_id].append(unit)
         return [units.get(i, []) for i in keys]
 
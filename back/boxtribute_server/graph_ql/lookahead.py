@@ -0,0 +1,142 @@
+"""Look-ahead planning of joins for resolvers that return lists of data model instances.
+
+By default, the related resources of list elements (e.g. the product of every box in a
+page) are loaded by DataLoaders, i.e. with one query per related field. Since the
+fields that the client selects are known when the list is queried, the tables of the
+selected related resources can instead be joined in the same query. The joined rows are
+primed into the DataLoaders of the request, hence the field resolvers don't have to
+query the database again.
+
+A resolver declares which foreign keys of its model serve which GraphQL fields (see
+`Relation`), and fetches its elements through the plan returned by `plan_joins()`.
+"""
+
+from dataclasses import dataclass
+
+import graphql
+from peewee import JOIN, ForeignKeyField
+
+from ..authz import is_authorized
+from ..models.reference_data import reference_data_cache
+
+
+@dataclass(kw_only=True)
+class Relation:
+    """Foreign key of a data model, and the name of the DataLoader that the GraphQL
+    resolver uses to load the referenced row. If the DataLoader enforces a permission,
+    it has to be given too, and the table is only joined if the user is granted it.
+    """
+
+    field: ForeignKeyField
+    loader_name: str
+    permission: str | None = None
+
+
+def _field_nodes(selection_set, fragments):
+    for selection in selection_set.selections:
+        if isinstance(selection, graphql.FieldNode):
+            yield selection
+        elif isinstance(selection, graphql.InlineFragmentNode):
+            yield from _field_nodes(selection.selection_set, fragments)
+        elif fragment := fragments.get(selection.name.value):
+            yield from _field_nodes(fragment.selection_set, fragments)
+
+
+def selected_field_names(info, *path):
+    """Return the names of the fields that the client selected on the result of the
+    field being resolved, or on a nested field given by `path` (e.g. `"elements"` for
+    the elements of a page). Fields of fragments are included.
+    """
+    selection_sets = [node.selection_set for node in info.field_nodes]
+    for name in path:
+        selection_sets = [
+            node.selection_set
+            for selection_set in selection_sets
+            if selection_set is not None
+            for node in _field_nodes(selection_set, info.fragments)
+            if node.name.value == name
+        ]
+    return {
+        node.name.value
+        for selection_set in selection_sets
+        if selection_set is not None
+        for node in _field_nodes(selection_set, info.fragments)
+    }
+
+
+def _is_permitted(permission):
+    # If not permitted, the DataLoader raises the error when the field is resolved
+    return permission is None or is_authorized(permission=permission)
+
+
+class JoinPlan:
+    """Joins of the tables referenced by the given relations into a select-query of the
+    given model, and priming of the joined rows into the DataLoaders of the given
+    context.
+    """
+
+    def __init__(self, model, relations, context):
+        self.model = model
+        self.relations = relations
+        self.context = context
+
+    @staticmethod
+    def _attribute_name(relation):
+        return f"_joined_{relation.field.name}"
+
+    def join(self, query):
+        """Extend the given select-query by left-joining the referenced tables. Aliases
+        are used since the query might join the tables already (e.g. for filtering).
+        """
+        for relation in self.relations:
+            target = relation.field.rel_model.alias()
+            query = query.select_extend(target).join_from(
+                self.model,
+                target,
+                JOIN.LEFT_OUTER,
+                on=(relation.field == target.id),
+                attr=self._attribute_name(relation),
+            )
+        return query
+
+    def prime(self, elements):
+        """Prime the rows joined to the given elements into the DataLoaders."""
+        for relation in self.relations:
+            loader = self.context[relation.loader_name]
+            attribute = self._attribute_name(relation)
+            for element in elements:
+                row_id = getattr(element, relation.field.object_id_name)
+                row = getattr(element, attribute, None)
+                if row_id is not None and row is not None and row.id == row_id:
+                    loader.prime(row_id, row)
+
+    def fetch(self, query):
+        """Run the given select-query with joins, prime the joined rows, and return the
+        elements as list.
+        """
+        elements = list(self.join(query).iterator())
+        self.prime(elements)
+        return elements
+
+
+def plan_joins(info, model, relations, *path):
+    """Return a JoinPlan for the relations (mapping of GraphQL field names to lists of
+    Relations) whose fields the client selected on the result of the field being
+    resolved (or on the nested field given by `path`, see `selected_field_names()`).
+    Tables served by the reference data cache (if enabled) are not joined.
+    """
+    selected = selected_field_names(info, *path)
+    planned = {}
+    for name, field_relations in relations.items():
+        if name not in selected:
+            continue
+        for relation in field_relations:
+            if relation.field.name in planned:
+                continue
+            if reference_data_cache.enabled() and (
+                relation.field.rel_model in reference_data_cache.version_fields
+            ):
+                continue
+            if _is_permitted(relation.permission):
+                planned[relation.field.name] = relation
+    return JoinPlan(model, list(planned.values()), info.context)
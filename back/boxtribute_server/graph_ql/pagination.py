@@ -35,29 +35,78 @@ The algorithm
 - assigns ID 7 as start and ID 9 as end cursor
 
 For backward pagination, the procedure works in reverse.
+
+If the elements are ordered by another field than the ID (e.g. boxes by modification
+date), keyset pagination is used: the cursor encodes the value of the sort field along
+with the ID, and the slice is selected by comparing both, i.e. `(sort_field, id)` in the
+order of the query. The ID acts as tie-breaker for elements with equal sort values,
+hence pages are stable, and an index on the sort field (and ID) can be used to find the
+slice.
+
+Only fetching the elements is done right away. Querying for elements before the slice,
+and counting the total number of elements are only performed if the client selects the
+`pageInfo.hasPreviousPage` (resp. `hasNextPage`) or the `totalCount` field.
 """
 
 import base64
+import os
+from collections import defaultdict
+from functools import partial
+
+from peewee import SQL, Ordering, fn
 
 from ..exceptions import InvalidPaginationInput
 
+# Number of elements per page if not specified in the pagination input
+DEFAULT_PAGINATION_LIMIT = 50
+
+
+def total_count_limit() -> int | None:
+    """Maximum number of elements to count for the `totalCount` field of pages, set via
+    the PAGINATION_TOTAL_COUNT_LIMIT environment variable. Default: None (no limit).
+    """
+    limit = os.getenv("PAGINATION_TOTAL_COUNT_LIMIT")
+    return None if limit is None else int(limit)
+
 
 class PageInfo:
-    """Container for pagination information."""
+    """Container for pagination information. The `has*Page` flags may be set to a
+    callable which is evaluated once when the flag is accessed for the first time.
+    """
 
     def __init__(self):
-        self.has_previous_page = False
-        self.has_next_page = False
+        self._has_previous_page = False
+        self._has_next_page = False
         self.start_cursor = ""
         self.end_cursor = ""
 
+    @property
+    def has_previous_page(self):
+        if callable(self._has_previous_page):
+            self._has_previous_page = self._has_previous_page()
+        return self._has_previous_page
+
+    @has_previous_page.setter
+    def has_previous_page(self, value):
+        self._has_previous_page = value
+
+    @property
+    def has_next_page(self):
+        if callable(self._has_next_page):
+            self._has_next_page = self._has_next_page()
+        return self._has_next_page
+
+    @has_next_page.setter
+    def has_next_page(self, value):
+        self._has_next_page = value
+
 
 def pagination_parameters(pagination_input):
     """Retrieve cursor and limit (default: Cursor() and 50, resp.) from the given
     pagination input dictionary.
     The values of `after`/`first` take precedence over `before`/`last`.
     """
-    limit = 50
+    limit = DEFAULT_PAGINATION_LIMIT
     if pagination_input is None:
         return Cursor(), limit
 
@@ -71,29 +120,78 @@ def pagination_parameters(pagination_input):
     )
 
 
+def first_page_limit(pagination_input):
+    """Return the number of elements per page if the given pagination input requests
+    the first page in forward direction, otherwise None.
+    """
+    cursor, limit = pagination_parameters(pagination_input)
+    if cursor.forwards and cursor.value == 0:
+        return limit
+    return None
+
+
 class Cursor:
     """Representation of pagination cursor, translating from GraphQL to data layer."""
 
     def __init__(self, value=None, forwards=True):
         """Decode and store value (a base64-encoded string).
         The value serves as point to start a select query after/before (default: 0 for
-        forward pagination; not supported for backward pagination).
+        forward pagination; not supported for backward pagination). It consists of an
+        ID, and optionally the value of the sort field (see `_encode_cursor()`).
         Assume forward pagination by default.
         """
         if value is None and not forwards:
             raise InvalidPaginationInput()
-        self.value = 0 if value is None else int(base64.b64decode(value))
         self.forwards = forwards
-
-    def pagination_condition(self, model):
+        self.value = 0
+        self.has_sort_value = False
+        self.sort_value = None
+        if value is not None:
+            decoded = base64.b64decode(value).decode()
+            id_value, separator, sort_value = decoded.partition(_SEPARATOR)
+            self.value = int(id_value)
+            if separator:
+                self.has_sort_value = True
+                self.sort_value = sort_value or None
+
+    def _sort_value(self, model, sort_field):
+        """Return the cursor's value of the sort field. For plain ID cursors (e.g.
+        issued before the sort order was introduced), look up the value.
+        """
+        if self.has_sort_value:
+            return (
+                None
+                if self.sort_value is None
+                else sort_field.python_value(self.sort_value)
+            )
+        element = (
+            model.select(model.id, sort_field)
+            .where(model.id == self.value)
+            .get_or_none()
+        )
+        return None if element is None else getattr(element, sort_field.name)
+
+    def pagination_condition(self, model, sort_field=None, descending=False):
         """Convert internal value into a condition that can be plugged into a
-        ModelSelect.where() clause for the given model.
+        ModelSelect.where() clause for the given model. The condition selects all
+        elements after (forward pagination) or before (backward pagination) the cursor
+        in the order given by sort field and direction.
         """
-        if self.forwards:
-            return model.id > self.value
-        return model.id < self.value
-
-    def has_next_previous_page(self, *conditions, elements, selection):
+        if self.value == 0 and self.forwards:
+            return model.id > 0
+
+        sort_value = None if sort_field is None else self._sort_value(model, sort_field)
+        return _comes_after_condition(
+            model,
+            sort_field=sort_field,
+            descending=descending if self.forwards else not descending,
+            sort_value=sort_value,
+            id_value=self.value,
+        )
+
+    def has_next_previous_page(
+        self, *conditions, elements, selection, sort_field=None, descending=False
+    ):
         """For forward/backward pagination, determine whether a previous/next page
         exists (i.e. if the model holds elements before the first / after the last one).
         To this end, the given model selection is used (might contain joins required by
@@ -101,14 +199,71 @@ class Cursor:
         Additional conditions, e.g. for filtering, are taken into account.
         """
         model = selection.model
-        if self.forwards:
-            base_condition = model.id < elements[0].id
-        else:
-            base_condition = model.id > elements[-1].id
-
+        element = elements[0] if self.forwards else elements[-1]
+        base_condition = _comes_after_condition(
+            model,
+            sort_field=sort_field,
+            descending=not descending if self.forwards else descending,
+            sort_value=(
+                None if sort_field is None else getattr(element, sort_field.name)
+            ),
+            id_value=element.id,
+        )
         return selection.where(base_condition, *conditions).get_or_none() is not None
 
 
+# Separates ID and sort value in encoded cursors
+_SEPARATOR = "|"
+
+
+def _sort_field_and_direction(order_by_field):
+    """Split the given field or ordering (e.g. `Box.last_modified_on.desc()`) into
+    field and flag whether the order is descending. Ordering by ID is the default.
+    """
+    if order_by_field is None:
+        return None, False
+    if isinstance(order_by_field, Ordering):
+        return order_by_field.node, order_by_field.direction.upper() == "DESC"
+    return order_by_field, False
+
+
+def _order_by(model, sort_field, descending):
+    """Return the ordering terms for the given sort field (ID as tie-breaker)."""
+    id_ordering = model.id.desc() if descending else model.id.asc()
+    if sort_field is None:
+        return [id_ordering]
+    return [sort_field.desc() if descending else sort_field.asc(), id_ordering]
+
+
+def _comes_after_condition(model, *, sort_field, descending, sort_value, id_value):
+    """Return a condition that selects all elements coming after the element with given
+    sort value and ID when ordering by `(sort_field, id)`, both ascending or both
+    descending. MySQL sorts NULL values first in ascending, and last in descending
+    order.
+    The row-value comparison `(sort_field, id) > (sort_value, id_value)` is expanded
+    because MySQL can only use an index range scan for the expanded form.
+    """
+    if sort_field is None:
+        return model.id < id_value if descending else model.id > id_value
+
+    if descending:
+        if sort_value is None:
+            return sort_field.is_null() & (model.id < id_value)
+        return (
+            (sort_field < sort_value)
+            | ((sort_field == sort_value) & (model.id < id_value))
+            | sort_field.is_null()
+        )
+
+    if sort_value is None:
+        return (sort_field.is_null() & (model.id > id_value)) | sort_field.is_null(
+            False
+        )
+    return (sort_field > sort_value) | (
+        (sort_field == sort_value) & (model.id > id_value)
+    )
+
+
 def _encode_id(element):
     """Zero-pad the element's ID to a byte-string of length 8, and base64-encode it.
     Return encoded result as unicode string.
@@ -116,13 +271,29 @@ def _encode_id(element):
     return base64.b64encode(f"{element.id:08}".encode()).decode()
 
 
+def _encode_cursor(element, sort_field=None):
+    """Encode the element's ID, and the value of the sort field (if given) separated by
+    `_SEPARATOR`. A NULL sort value is encoded as empty string.
+    Return base64-encoded result as unicode string.
+    """
+    if sort_field is None:
+        return _encode_id(element)
+    sort_value = getattr(element, sort_field.name)
+    sort_value = "" if sort_value is None else str(sort_value)
+    return base64.b64encode(
+        f"{element.id:08}{_SEPARATOR}{sort_value}".encode()
+    ).decode()
+
+
 def _generate_page_info(*conditions, elements, cursor, limit, **kwargs):
     """Generate pagination information from given elements and page limit. The elements
     comprise the current page and possibly the first element of the next/previous page.
     During forward/backward pagination, the following applies: If the number of elements
     exceeds the limit, a next/previous page exists. Determining whether a previous/next
-    page exists is delegated to `Cursor.has_next_previous_page()`, passing `kwargs`.
-    Derive cursors from the page's last/first elements.
+    page exists is delegated to `Cursor.has_next_previous_page()`, passing `kwargs`. The
+    corresponding database query is deferred until the flag is accessed.
+    Derive cursors from the page's last/first elements (including the value of the sort
+    field, if any).
     Return default PageInfo if no elements given (next/previous page cannot be
     determined efficiently even if existing). This is an edge case because it implies
     that the user e.g. ignored hasNextPage=False and requested the next page anyways.
@@ -131,40 +302,49 @@ def _generate_page_info(*conditions, elements, cursor, limit, **kwargs):
     if not elements:
         return info
 
-    has_next_previous_page = cursor.has_next_previous_page(
-        *conditions, elements=elements, **kwargs
+    encode = partial(_encode_cursor, sort_field=kwargs.get("sort_field"))
+    has_next_previous_page = partial(
+        cursor.has_next_previous_page, *conditions, elements=elements, **kwargs
     )
     if cursor.forwards:
         info.has_previous_page = has_next_previous_page
-        info.start_cursor = _encode_id(elements[0])
+        info.start_cursor = encode(elements[0])
         if len(elements) > limit:
             info.has_next_page = True
-            info.end_cursor = _encode_id(elements[-2])
+            info.end_cursor = encode(elements[-2])
         else:
-            info.end_cursor = _encode_id(elements[-1])
+            info.end_cursor = encode(elements[-1])
 
     else:
         info.has_next_page = has_next_previous_page
-        info.end_cursor = _encode_id(elements[-1])
+        info.end_cursor = encode(elements[-1])
         if len(elements) > limit:
             info.has_previous_page = True
-            info.start_cursor = _encode_id(elements[1])
+            info.start_cursor = encode(elements[1])
         else:
-            info.start_cursor = _encode_id(elements[0])
+            info.start_cursor = encode(elements[0])
 
     return info
 
 
-def _compute_total_count(*conditions, selection):
-    """Compute total count, taking given conditions and model selection into account."""
+def _compute_total_count(*conditions, selection, limit=None):
+    """Compute total count, taking given conditions and model selection into account.
+    If a limit is given, count at most that many elements (the database can stop
+    scanning early).
+    """
     if conditions:
         selection = selection.where(*conditions)
+    if limit is not None:
+        # peewee wraps the limited selection in a subquery for counting
+        selection = selection.order_by().limit(limit)
     return selection.count()
 
 
 def generate_page(*conditions, elements, cursor, selection, **page_info_kwargs):
     """Return a GraphQL Page type wrapping the given elements, and including appropriate
     page info.
+    The total count is returned as callable which is only invoked by the GraphQL
+    resolver if the client selects the field. It is capped at `total_count_limit()`.
     """
     page_info = _generate_page_info(
         *conditions,
@@ -175,7 +355,9 @@ def generate_page(*conditions, elements, cursor, selection, **page_info_kwargs):
     )
     page = {
         "page_info": page_info,
-        "total_count": _compute_total_count(*conditions, selection=selection),
+        "total_count": lambda _: _compute_total_count(
+            *conditions, selection=selection, limit=total_count_limit()
+        ),
     }
 
     if cursor.forwards:
@@ -187,28 +369,121 @@ def generate_page(*conditions, elements, cursor, selection, **page_info_kwargs):
 
 
 def load_into_page(
-    model, *conditions, selection=None, order_by_field=None, pagination_input
+    model,
+    *conditions,
+    selection=None,
+    order_by_field=None,
+    pagination_input,
+    join_plan=None,
 ):
     """High-level convenience function to load result query of given model into a
     GraphQL page type.
     The query is constructed from the given selection (default: `model.select()`), and
-    optional conditions. The query results are ordered by the given field (default:
-    model ID).
+    optional conditions. The query results are ordered by the given field or ordering
+    (e.g. `Box.last_modified_on.desc()`; default: model ID), using the ID as
+    tie-breaker.
+    If a join plan is given (see `lookahead.plan_joins()`), the related rows selected by
+    the client are fetched along with the elements (but not for page info and count).
     """
     cursor, limit = pagination_parameters(pagination_input)
-    pagination_condition = cursor.pagination_condition(model)
+    sort_field, descending = _sort_field_and_direction(order_by_field)
+    pagination_condition = cursor.pagination_condition(
+        model, sort_field=sort_field, descending=descending
+    )
 
     if selection is None:
         selection = model.select()
+    # For backward pagination, select the elements closest to the cursor by reversing
+    # the order, and restore the order afterwards
     query_result = (
         selection.where(pagination_condition, *conditions)
-        .order_by(order_by_field or model.id)
+        .order_by(
+            *_order_by(
+                model, sort_field, descending if cursor.forwards else not descending
+            )
+        )
         .limit(limit + 1)
     )
+    if join_plan is None:
+        elements = list(query_result.iterator())
+    else:
+        elements = join_plan.fetch(query_result)
+    if not cursor.forwards:
+        elements.reverse()
     return generate_page(
         *conditions,
-        elements=list(query_result.iterator()),
+        elements=elements,
         cursor=cursor,
         limit=limit,
         selection=selection,
+        sort_field=sort_field,
+        descending=descending,
+    )
+
+
+def load_first_pages(
+    model, *conditions, parent_field, parent_ids, selection=None, limit
+):
+    """Load the first page of the given model's elements for each of the given parents
+    (e.g. the boxes of several locations) with a single query. The elements are ranked
+    per parent by ID, and the first `limit + 1` elements per parent are selected (the
+    extra element indicates a next page).
+    The total counts of all parents are computed by a single grouped query when the
+    first of them is accessed.
+    Return a dict mapping parent IDs to pages.
+    """
+    if selection is None:
+        selection = model.select()
+    page_rank = (
+        fn.ROW_NUMBER()
+        .over(partition_by=[parent_field], order_by=[model.id])
+        .alias("page_rank")
+    )
+    ranked = (
+        selection.select_extend(page_rank)
+        .where(parent_field << parent_ids, *conditions)
+        .alias("ranked")
     )
+    elements = defaultdict(list)
+    for element in (
+        model.select(SQL("*"))
+        .from_(ranked)
+        .where(ranked.c.page_rank <= limit + 1)
+        .order_by(ranked.c.id)
+    ):
+        elements[getattr(element, parent_field.object_id_name)].append(element)
+
+    total_counts = {}
+
+    def compute_total_count(parent_id):
+        if not total_counts:
+            total_counts.update(
+                selection.select(parent_field, fn.COUNT(model.id))
+                .where(parent_field << parent_ids, *conditions)
+                .group_by(parent_field)
+                .tuples()
+            )
+            # Mark counts as computed even if no parent has any elements
+            total_counts.setdefault(None, 0)
+        count = total_counts.get(parent_id, 0)
+        count_limit = total_count_limit()
+        return count if count_limit is None else min(count, count_limit)
+
+    pages = {}
+    for parent_id in parent_ids:
+        parent_elements = elements[parent_id]
+        page_info = _generate_page_info(
+            elements=parent_elements, cursor=Cursor(), limit=limit
+        )
+        # This is the first page
+        page_info.has_previous_page = False
+        pages[parent_id] = {
+            "page_info": page_info,
+            "total_count": lambda _, parent_id=parent_id: compute_total_count(
+                parent_id
+            ),
+            "elements": (
+                parent_elements[:-1] if page_info.has_next_page else parent_elements
+            ),
+        }
+    return pages
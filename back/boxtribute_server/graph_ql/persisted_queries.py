@@ -0,0 +1,149 @@
+"""Support for automatic persisted queries (APQ) as specified by Apollo
+(https://www.apollographql.com/docs/apollo-server/performance/apq).
+
+Instead of the full query text the client sends the SHA-256 hash of the query in the
+`extensions.persistedQuery.sha256Hash` field of the request payload. If the hash is
+unknown to the server, a PERSISTED_QUERY_NOT_FOUND error is returned, and the client
+sends the query text along with the hash which is then registered.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# Maximum number of queries registered on first use. Preloaded queries are not counted
+DEFAULT_MAX_SIZE = 1000
+
+
+class PersistedQueryError(Exception):
+    def __init__(self, *args, code, message, status_code=200, **kwargs):
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+        super().__init__(*args, **kwargs)
+
+    @property
+    def error(self):
+        return {
+            "errors": [{"message": self.message, "extensions": {"code": self.code}}]
+        }
+
+
+class PersistedQueryNotFound(PersistedQueryError):
+    def __init__(self, *args, **kwargs):
+        super().__init__(
+            *args,
+            code="PERSISTED_QUERY_NOT_FOUND",
+            message="PersistedQueryNotFound",
+            **kwargs,
+        )
+
+
+class PersistedQueryHashMismatch(PersistedQueryError):
+    def __init__(self, *args, **kwargs):
+        super().__init__(
+            *args,
+            code="BAD_REQUEST",
+            message="provided sha does not match query",
+            status_code=400,
+            **kwargs,
+        )
+
+
+def compute_query_hash(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def _extract_query_hash(payload):
+    try:
+        persisted_query = payload["extensions"]["persistedQuery"]
+        return persisted_query["sha256Hash"]
+    except (KeyError, TypeError):
+        return None
+
+
+class PersistedQueryRegistry:
+    """Thread-safe mapping of query hashes to query texts. Queries are either preloaded
+    (e.g. from the front-end's generated operations), or registered on first use. The
+    latter are bounded in number, the least recently used one being evicted first.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self._preloaded = {}
+        self._registered = OrderedDict()
+        self._lock = threading.Lock()
+
+    def preload(self, queries):
+        """Preload the given query texts."""
+        for query in queries:
+            self._preloaded[compute_query_hash(query)] = query
+
+    def load_manifest(self, path):
+        """Preload queries from a JSON file. Accepted formats are
+        - an Apollo persisted query manifest `{"operations": [{"body": ...}, ...]}`
+        - a mapping of query hashes to query texts
+        """
+        with open(path) as f:
+            manifest = json.load(f)
+        if "operations" in manifest:
+            self.preload(op["body"] for op in manifest["operations"])
+        else:
+            self.preload(manifest.values())
+
+    def get(self, query_hash):
+        if (query := self._preloaded.get(query_hash)) is not None:
+            return query
+        with self._lock:
+            query = self._registered.get(query_hash)
+            if query is not None:
+                self._registered.move_to_end(query_hash)
+            return query
+
+    def register(self, query_hash, query):
+        if compute_query_hash(query) != query_hash:
+            raise PersistedQueryHashMismatch()
+        if query_hash in self._preloaded:
+            return
+        with self._lock:
+            self._registered[query_hash] = query
+            self._registered.move_to_end(query_hash)
+            while len(self._registered) > self.max_size:
+                self._registered.popitem(last=False)
+
+    def lookup(self, payload):
+        """Return the query text of the given request payload, or None if neither the
+        payload nor the registry contain it.
+        """
+        if not isinstance(payload, dict):
+            return None
+        if (query := payload.get("query")) is not None:
+            return query
+        query_hash = _extract_query_hash(payload)
+        if query_hash is None:
+            return None
+        return self.get(query_hash)
+
+    def resolve(self, payload):
+        """Return the request payload including the query text.
+        If the payload contains a query hash and a query, register the query. If it
+        contains only a hash, look up the query; raise PersistedQueryNotFound if the
+        hash is unknown.
+        """
+        query_hash = _extract_query_hash(payload)
+        if query_hash is None:
+            return payload
+
+        query = payload.get("query")
+        if query is not None:
+            self.register(query_hash, query)
+            return payload
+
+        query = self.get(query_hash)
+        if query is None:
+            raise PersistedQueryNotFound()
+        return {**payload, "query": query}
+
+
+persisted_query_registry = PersistedQueryRegistry()
@@ -0,0 +1,143 @@
+"""Instrumentation of GraphQL execution for finding hot paths.
+
+A sampled fraction of requests is profiled by the ProfilingExtension. It records
+- cumulative time and number of calls per resolver path (list indices are omitted, and
+  default resolvers are not profiled)
+- time, number of batches, batch sizes, and number of deduplicated keys per DataLoader
+"""
+
+import os
+import random
+import time
+from collections import defaultdict
+from inspect import isawaitable
+
+from ariadne.contrib.tracing.utils import should_trace
+from ariadne.types import Extension
+
+from ..logging import add_fields_to_request_log
+
+
+def profiling_sample_rate() -> float:
+    return float(os.getenv("PROFILING_SAMPLE_RATE", 0.0))
+
+
+def should_profile_request() -> bool:
+    return random.random() < profiling_sample_rate()
+
+
+class ExecutionProfile:
+    """Container for timings of resolvers and DataLoaders during a single request."""
+
+    def __init__(self):
+        self.resolvers = defaultdict(lambda: {"calls": 0, "duration": 0.0})
+        self.data_loaders = defaultdict(
+            lambda: {"loads": 0, "batch_sizes": [], "duration": 0.0}
+        )
+
+    def record_resolver(self, path, duration):
+        stats = self.resolvers[path]
+        stats["calls"] += 1
+        stats["duration"] += duration
+
+    def record_load(self, loader_name):
+        self.data_loaders[loader_name]["loads"] += 1
+
+    def record_batch(self, loader_name, batch_size, duration):
+        stats = self.data_loaders[loader_name]
+        stats["batch_sizes"].append(batch_size)
+        stats["duration"] += duration
+
+    def instrument(self, loader_name, loader):
+        """Wrap the `load` and `batch_load_fn` methods of the given DataLoader to record
+        calls and timings.
+        """
+        load = loader.load
+        batch_load_fn = loader.batch_load_fn
+
+        def profiled_load(key):
+            if key is not None:
+                self.record_load(loader_name)
+            return load(key)
+
+        async def profiled_batch_load_fn(keys):
+            start_time = time.perf_counter()
+            try:
+                return await batch_load_fn(keys)
+            finally:
+                duration = time.perf_counter() - start_time
+                self.record_batch(loader_name, len(keys), duration)
+
+        loader.load = profiled_load
+        loader.batch_load_fn = profiled_batch_load_fn
+
+    def as_dict(self):
+        """Return JSON-serializable summary. Durations are given in milliseconds. The
+        number of deduplicated keys is the number of loads that did not end up in a
+        batch because the key had been requested before.
+        """
+        resolvers = {
+            path: {"calls": s["calls"], "duration": round(s["duration"] * 1000, 3)}
+            for path, s in sorted(
+                self.resolvers.items(), key=lambda i: i[1]["duration"], reverse=True
+            )
+        }
+        data_loaders = {}
+        for name, stats in sorted(self.data_loaders.items()):
+            nr_keys = sum(stats["batch_sizes"])
+            data_loaders[name] = {
+                "duration": round(stats["duration"] * 1000, 3),
+                "batches": len(stats["batch_sizes"]),
+                "batch_sizes": stats["batch_sizes"],
+                "keys": nr_keys,
+                "deduplicated_keys": max(stats["loads"] - nr_keys, 0),
+            }
+        return {"resolvers": resolvers, "data_loaders": data_loaders}
+
+
+class ProfilingExtension(Extension):
+    """Extension recording resolver and DataLoader timings of the current request.
+    The context value must be a DataLoaderRegistry (it instruments all DataLoaders
+    created during the request).
+    If `in_response` is set, the results are added to the `extensions` field of the
+    response, otherwise to the request log.
+    """
+
+    def __init__(self, *, in_response=False):
+        self.in_response = in_response
+        self.profile = ExecutionProfile()
+
+    def request_started(self, context):
+        context.profile = self.profile
+
+    def request_finished(self, context):
+        if not self.in_response:
+            add_fields_to_request_log(profile=self.profile.as_dict())
+
+    def resolve(self, next_, obj, info, **kwargs):
+        if not should_trace(info):
+            return next_(obj, info, **kwargs)
+
+        path = ".".join(k for k in info.path.as_list() if isinstance(k, str))
+        start_time = time.perf_counter()
+        result = next_(obj, info, **kwargs)
+        if not isawaitable(result):
+            self.profile.record_resolver(path, time.perf_counter() - start_time)
+            return result
+
+        async def await_result():
+            # Also covers waiting for DataLoaders to dispatch their batches
+            try:
+                value = await result
+                if isawaitable(value):
+                    value = await value
+                return value
+            finally:
+                duration = time.perf_counter() - start_time
+                self.profile.record_resolver(path, duration)
+
+        return await_result()
+
+    def format(self, context):
+        if self.in_response:
+            return {"profile": self.profile.as_dict()}
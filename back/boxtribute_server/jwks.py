@@ -0,0 +1,162 @@
+"""Process-wide cache of the public keys that Auth0 uses to sign JWTs.
+
+The keys are obtained from the JSON Web Key Set (JWKS) of the Auth0 domain, and parsed
+natively by PyJWT. The key set is fetched on first use. Afterwards, if it is older than
+AUTH0_JWKS_TTL seconds, the cached keys continue to be used while the key set is
+re-fetched in a background thread. If a token refers to a key ID that is not in the
+cached key set (e.g. after Auth0 rotated its signing keys), the key set is re-fetched
+right away, however at most every AUTH0_JWKS_MIN_REFRESH_INTERVAL seconds to avoid
+hitting Auth0 for every token with a forged key ID.
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.request
+
+import jwt
+
+from .exceptions import AuthenticationFailed
+
+DEFAULT_TTL = 600  # seconds
+DEFAULT_MIN_REFRESH_INTERVAL = 30  # seconds
+FETCH_TIMEOUT = 10  # seconds
+
+
+def jwks_url(domain):
+    return f"https://{domain}/.well-known/jwks.json"
+
+
+class CachedKeySet:
+    """Container for the signing keys of a JWKS (mapping of key ID to key), and the
+    time when they were fetched.
+    """
+
+    __slots__ = ("keys", "fetched_at")
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.fetched_at = time.monotonic()
+
+
+class PublicKeyCache:
+    """Thread-safe cache of the signing keys of JWKS, by URL."""
+
+    def __init__(self):
+        self._key_sets = {}
+        self._lock = threading.Lock()
+        # URLs whose key set is currently being re-fetched in the background
+        self._refreshing = set()
+        self.hits = 0
+        self.fetches = 0
+
+    @staticmethod
+    def ttl():
+        return float(os.getenv("AUTH0_JWKS_TTL", DEFAULT_TTL))
+
+    @staticmethod
+    def min_refresh_interval():
+        return float(
+            os.getenv("AUTH0_JWKS_MIN_REFRESH_INTERVAL", DEFAULT_MIN_REFRESH_INTERVAL)
+        )
+
+    def _fetch(self, url):
+        with urllib.request.urlopen(url, timeout=FETCH_TIMEOUT) as response:
+            data = json.loads(response.read().decode())
+        key_set = jwt.PyJWKSet.from_dict(data)
+        keys = {
+            k.key_id: k.key
+            for k in key_set.keys
+            if k.public_key_use in (None, "sig") and k.key_id is not None
+        }
+        cached = CachedKeySet(keys)
+        with self._lock:
+            self.fetches += 1
+            self._key_sets[url] = cached
+        return cached
+
+    def _fetch_for_request(self, url):
+        try:
+            return self._fetch(url)
+        except Exception as e:
+            raise AuthenticationFailed(
+                {
+                    "code": "internal_server_error",
+                    "description": "Unable to fetch the public keys for verifying "
+                    "the authentication token.",
+                    "message": str(e),
+                },
+                500,
+            )
+
+    def _refresh_in_background(self, url):
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+
+        def refresh():
+            try:
+                self._fetch(url)
+            except Exception:
+                # Keep using the cached keys; the next request past the TTL retries
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing.discard(url)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get_key(self, url, key_id=None):
+        """Return the public key with the given ID from the JWKS at the given URL. If no
+        key ID is given, return the first signing key.
+        Raise AuthenticationFailed if the key set can't be fetched, or if it doesn't
+        contain the key.
+        """
+        with self._lock:
+            cached = self._key_sets.get(url)
+        if cached is None:
+            cached = self._fetch_for_request(url)
+        elif time.monotonic() - cached.fetched_at >= self.ttl():
+            self._refresh_in_background(url)
+
+        if key_id is None:
+            key = next(iter(cached.keys.values()), None)
+        else:
+            key = cached.keys.get(key_id)
+            if key is None and (
+                time.monotonic() - cached.fetched_at >= self.min_refresh_interval()
+            ):
+                # Possibly the signing keys were rotated
+                key = self._fetch_for_request(url).keys.get(key_id)
+
+        if key is None:
+            raise AuthenticationFailed(
+                {
+                    "code": "invalid_header",
+                    "description": "Unable to find the key that signed the "
+                    "authentication token.",
+                }
+            )
+        with self._lock:
+            self.hits += 1
+        return key
+
+    def info(self):
+        """Return counters of served keys and of fetched key sets."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "fetches": self.fetches,
+                "key_sets": len(self._key_sets),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._key_sets.clear()
+            self.hits = 0
+            self.fetches = 0
+
+
+public_key_cache = PublicKeyCache()
@@ -3,7 +3,7 @@
 import contextlib
 import time
 
-from flask import request
+from flask import g, request
 
 from .utils import in_ci_environment, in_development_environment
 
@@ -33,15 +33,26 @@ else:  # pragma: no cover
     }
 
 
+def add_fields_to_request_log(**fields):
+    """Collect fields to be added to the log entry of the current request (e.g. from
+    within the GraphQL execution).
+    """
+    if "request_log_fields" not in g:
+        g.request_log_fields = {}
+    g.request_log_fields.update(fields)
+
+
 def log_request_to_gcloud(*, context, **extra_info):
     """Log the current request's JSON body to Google Cloud, depending on context.
-    Optionally add extra info fields to the log entry.
+    Optionally add extra info fields, and fields collected during request processing
+    to the log entry.
     """
     if request_loggers is None:
         # Render function ineffective if loggers not defined
         return
 
     content = request.get_json()
+    content |= g.get("request_log_fields", {})
     if extra_info:
         content |= extra_info
     request_loggers[context].log_struct(content, severity="INFO")
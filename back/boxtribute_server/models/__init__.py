@@ -1,7 +1,10 @@
 from .definitions.base import Base
 from .definitions.beneficiary import Beneficiary
+from .definitions.beneficiary_demographics_fact import BeneficiaryDemographicsFact
 from .definitions.box import Box
 from .definitions.box_state import BoxState
+from .definitions.consistency_token import ConsistencyToken
+from .definitions.created_boxes_fact import CreatedBoxesFact
 from .definitions.distribution_event import DistributionEvent
 from .definitions.distribution_event_tracking_log_entry import (
     DistributionEventTrackingLogEntry,
@@ -10,6 +13,7 @@ from .definitions.distribution_events_tracking_group import (
     DistributionEventsTrackingGroup,
 )
 from .definitions.history import DbChangeHistory
+from .definitions.history_message import HistoryMessage
 from .definitions.language import Language
 from .definitions.location import Location
 from .definitions.organisation import Organisation
@@ -27,8 +31,11 @@ from .definitions.size import Size
 from .definitions.size_range import SizeRange
 from .definitions.size_range_size import SizeRangeSize
 from .definitions.standard_product import StandardProduct
+from .definitions.statistics_refresh import StatisticsRefresh
+from .definitions.stock_overview_fact import StockOverviewFact
 from .definitions.tag import Tag
 from .definitions.tags_relation import TagsRelation
+from .definitions.top_products_donated_fact import TopProductsDonatedFact
 from .definitions.transaction import Transaction
 from .definitions.transfer_agreement import TransferAgreement
 from .definitions.transfer_agreement_detail import TransferAgreementDetail
@@ -51,12 +58,16 @@ from .definitions.x_beneficiary_language import XBeneficiaryLanguage
 MODELS = (
     Base,
     Beneficiary,
+    BeneficiaryDemographicsFact,
     Box,
     BoxState,
+    ConsistencyToken,
+    CreatedBoxesFact,
     DistributionEvent,
     DistributionEventTrackingLogEntry,
     DistributionEventsTrackingGroup,
     DbChangeHistory,
+    HistoryMessage,
     Language,
     Location,
     Organisation,
@@ -74,8 +85,11 @@ MODELS = (
     SizeRange,
     SizeRangeSize,
     StandardProduct,
+    StatisticsRefresh,
+    StockOverviewFact,
     Tag,
     TagsRelation,
+    TopProductsDonatedFact,
     Transaction,
     TransferAgreement,
     TransferAgreementDetail,
@@ -0,0 +1,28 @@
+from peewee import CharField, DateField, IntegerField, TextField
+
+from ..fields import UIntForeignKeyField
+from . import Model
+from .base import Base
+
+
+class BeneficiaryDemographicsFact(Model):
+    """Beneficiaries are counted by date of birth (instead of age which changes without
+    the data changing).
+    """
+
+    base = UIntForeignKeyField(
+        model=Base,
+        column_name="base_id",
+        field="id",
+        on_update="CASCADE",
+        on_delete="CASCADE",
+    )
+    gender = CharField()
+    created_on = DateField(null=True)
+    deleted_on = DateField(null=True)
+    date_of_birth = DateField(null=True)
+    tag_ids = TextField(null=True)
+    count = IntegerField()
+
+    class Meta:
+        table_name = "statistics_beneficiary_demographics"
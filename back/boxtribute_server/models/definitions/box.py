@@ -152,3 +152,7 @@ class Box(Model):
 # the MySQL table)
 Box.add_index(SQL("CREATE UNIQUE INDEX box_id_unique ON stock (box_id)"))
 Box.add_index(SQL("CREATE UNIQUE INDEX qr_id_unique ON stock (qr_id)"))
+# Supports keyset pagination of boxes ordered by modification date (see pagination.py)
+Box.add_index(
+    SQL("CREATE INDEX location_modified_id ON stock (location_id, modified, id)")
+)
@@ -0,0 +1,11 @@
+from . import Model
+
+
+class ConsistencyToken(Model):
+    """Every operation that modified data inserts a row. Its ID is handed out to the
+    client as consistency token (see `DatabaseManager.consistency_token()`). Only the
+    latest row is kept.
+    """
+
+    class Meta:
+        table_name = "consistency_tokens"
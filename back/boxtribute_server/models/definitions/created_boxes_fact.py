@@ -0,0 +1,25 @@
+from peewee import DateTimeField, IntegerField, TextField
+
+from ..fields import UIntForeignKeyField
+from . import Model
+from .base import Base
+
+
+class CreatedBoxesFact(Model):
+    base = UIntForeignKeyField(
+        model=Base,
+        column_name="base_id",
+        field="id",
+        on_update="CASCADE",
+        on_delete="CASCADE",
+    )
+    created_on = DateTimeField(null=True)
+    product_id = IntegerField()
+    category_id = IntegerField()
+    gender = IntegerField()
+    tag_ids = TextField(null=True)
+    boxes_count = IntegerField()
+    items_count = IntegerField()
+
+    class Meta:
+        table_name = "statistics_created_boxes"
@@ -0,0 +1,20 @@
+from peewee import TextField
+
+from ..fields import UIntForeignKeyField
+from . import Model
+from .history import DbChangeHistory
+
+
+class HistoryMessage(Model):
+    history = UIntForeignKeyField(
+        model=DbChangeHistory,
+        column_name="history_id",
+        field="id",
+        primary_key=True,
+        on_update="CASCADE",
+        on_delete="CASCADE",
+    )
+    message = TextField()
+
+    class Meta:
+        table_name = "history_messages"
@@ -0,0 +1,26 @@
+from peewee import DateTimeField, IntegerField
+
+from ..fields import UIntForeignKeyField
+from . import Model
+from .base import Base
+
+
+class StatisticsRefresh(Model):
+    """The statistics facts of a base are materialized if it has a row in this table.
+    `history_id` is the watermark of the last refresh (ID of the newest history entry
+    taken into account).
+    """
+
+    base = UIntForeignKeyField(
+        model=Base,
+        column_name="base_id",
+        field="id",
+        primary_key=True,
+        on_update="CASCADE",
+        on_delete="CASCADE",
+    )
+    history_id = IntegerField()
+    refreshed_on = DateTimeField()
+
+    class Meta:
+        table_name = "statistics_refreshes"
@@ -0,0 +1,29 @@
+from peewee import CharField, DoubleField, IntegerField, TextField
+
+from ..fields import UIntForeignKeyField
+from . import Model
+from .base import Base
+
+
+class StockOverviewFact(Model):
+    base = UIntForeignKeyField(
+        model=Base,
+        column_name="base_id",
+        field="id",
+        on_update="CASCADE",
+        on_delete="CASCADE",
+    )
+    size_id = IntegerField(null=True)
+    location_id = IntegerField()
+    box_state = IntegerField(null=True)
+    category_id = IntegerField()
+    product_name = CharField()
+    absolute_measure_value = DoubleField(null=True)
+    dimension_id = IntegerField(null=True)
+    gender = IntegerField()
+    tag_ids = TextField(null=True)
+    boxes_count = IntegerField()
+    items_count = IntegerField(null=True)
+
+    class Meta:
+        table_name = "statistics_stock_overview"
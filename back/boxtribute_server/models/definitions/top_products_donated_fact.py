@@ -0,0 +1,24 @@
+from peewee import DateField, IntegerField
+
+from ..fields import UIntForeignKeyField
+from . import Model
+from .base import Base
+
+
+class TopProductsDonatedFact(Model):
+    base = UIntForeignKeyField(
+        model=Base,
+        column_name="base_id",
+        field="id",
+        on_update="CASCADE",
+        on_delete="CASCADE",
+    )
+    created_on = DateField(null=True)
+    donated_on = DateField(null=True)
+    size_id = IntegerField(null=True)
+    product_id = IntegerField()
+    category_id = IntegerField()
+    items_count = IntegerField()
+
+    class Meta:
+        table_name = "statistics_top_products_donated"
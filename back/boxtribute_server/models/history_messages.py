@@ -0,0 +1,234 @@
+"""Rendering of human-readable messages of box history entries (e.g. "changed box
+location from X to Y").
+
+Messages are rendered once when the history entries are written (see
+`save_box_history_messages`), and stored in the history_messages table. Hence reading
+the history of a box doesn't require joining all resources referenced by the entries.
+Entries without stored message (e.g. written by the legacy app, or before the table was
+backfilled using `bwiz backfill-history-messages`) are rendered on read.
+
+The table is created by `bwiz backfill-history-messages`, which has to be run before
+deploying this module. As long as the table is missing, no messages are stored.
+"""
+
+from peewee import Case, ProgrammingError, fn
+
+from .definitions.box import Box
+from .definitions.box_state import BoxState
+from .definitions.history import DbChangeHistory
+from .definitions.history_message import HistoryMessage
+from .definitions.location import Location
+from .definitions.product import Product
+from .definitions.size import Size
+from .definitions.unit import Unit
+from .utils import BATCH_SIZE, NO_SUCH_TABLE
+
+# Number of history entries processed per statement during backfilling
+BACKFILL_BATCH_SIZE = 10000
+
+
+def select_box_history_messages(*conditions, missing_only=False):
+    """Return query selecting the ID and the rendered message of box history entries
+    that match the given conditions (expressions on DbChangeHistory fields). Entries
+    whose message can't be rendered (e.g. because a referenced resource is missing) are
+    skipped.
+    If `missing_only` is set, skip entries that already have a stored message.
+    """
+    ToProduct = Product.alias()
+    ToLocation = Location.alias()
+    ToSize = Size.alias()
+    ToBoxState = BoxState.alias()
+    ToUnit = Unit.alias()
+    changes = DbChangeHistory.changes
+
+    message = Case(
+        None,
+        (
+            (
+                (changes == "location_id"),
+                fn.CONCAT(
+                    "changed box location from ",
+                    Location.name,
+                    " to ",
+                    ToLocation.name,
+                ),
+            ),
+            (
+                (changes == "product_id"),
+                fn.CONCAT(
+                    "changed product type from ", Product.name, " to ", ToProduct.name
+                ),
+            ),
+            (
+                (changes == "size_id"),
+                fn.CONCAT("changed size from ", Size.label, " to ", ToSize.label),
+            ),
+            (
+                (changes == "display_unit_id"),
+                fn.CONCAT("changed unit from ", Unit.symbol, " to ", ToUnit.symbol),
+            ),
+            (
+                (changes == "box_state_id"),
+                fn.CONCAT(
+                    "changed box state from ", BoxState.label, " to ", ToBoxState.label
+                ),
+            ),
+            (
+                (changes == "items"),
+                fn.CONCAT(
+                    "changed the number of items from ",
+                    DbChangeHistory.from_int,
+                    " to ",
+                    DbChangeHistory.to_int,
+                ),
+            ),
+            (
+                (changes.startswith("comments")),
+                fn.REPLACE(changes, "comments changed", "changed comments"),
+            ),
+            (
+                # Convert "Record created/deleted" into "created/deleted box"
+                (changes.startswith("Record")),
+                fn.CONCAT(fn.SUBSTRING(changes, 8), " box"),
+            ),
+            (
+                (changes == "New Qr-code assigned by pdf generation."),
+                "created QR code label for box",
+            ),
+        ),
+        changes,
+    )
+
+    query = (
+        DbChangeHistory.select(DbChangeHistory.id, message.alias("message"))
+        .left_outer_join(
+            Product,
+            on=((Product.id == DbChangeHistory.from_int) & (changes == "product_id")),
+        )
+        .left_outer_join(
+            ToProduct,
+            on=((ToProduct.id == DbChangeHistory.to_int) & (changes == "product_id")),
+        )
+        .left_outer_join(
+            Location,
+            on=((Location.id == DbChangeHistory.from_int) & (changes == "location_id")),
+        )
+        .left_outer_join(
+            ToLocation,
+            on=((ToLocation.id == DbChangeHistory.to_int) & (changes == "location_id")),
+        )
+        .left_outer_join(
+            Size,
+            on=((Size.id == DbChangeHistory.from_int) & (changes == "size_id")),
+        )
+        .left_outer_join(
+            ToSize,
+            on=((ToSize.id == DbChangeHistory.to_int) & (changes == "size_id")),
+        )
+        .left_outer_join(
+            Unit,
+            on=((Unit.id == DbChangeHistory.from_int) & (changes == "display_unit_id")),
+        )
+        .left_outer_join(
+            ToUnit,
+            on=((ToUnit.id == DbChangeHistory.to_int) & (changes == "display_unit_id")),
+        )
+        .left_outer_join(
+            BoxState,
+            on=(
+                (BoxState.id == DbChangeHistory.from_int) & (changes == "box_state_id")
+            ),
+        )
+        .left_outer_join(
+            ToBoxState,
+            on=(
+                (ToBoxState.id == DbChangeHistory.to_int) & (changes == "box_state_id")
+            ),
+        )
+    )
+    if missing_only:
+        query = query.left_outer_join(
+            HistoryMessage, on=(HistoryMessage.history == DbChangeHistory.id)
+        ).where(HistoryMessage.history.is_null())
+
+    return query.where(
+        DbChangeHistory.table_name == Box._meta.table_name,
+        message.is_null(False),
+        *conditions,
+    )
+
+
+def _insert_box_history_messages(*conditions):
+    """Render and store the messages of box history entries that match the given
+    conditions and don't have a stored message yet. Return the number of stored
+    messages.
+    """
+    query = select_box_history_messages(*conditions, missing_only=True)
+    return (
+        HistoryMessage.insert_from(
+            query, [HistoryMessage.history, HistoryMessage.message]
+        )
+        .on_conflict_ignore()
+        .as_rowcount()
+        .execute()
+    )
+
+
+def save_box_history_messages(entries, *, first_id=None):
+    """Render and store the messages of the given DbChangeHistory entries that refer to
+    boxes. Must be called after the entries have been written. Only entries with an ID
+    of at least `first_id` (default: the smallest ID of the given entries) are taken
+    into account. Skip storing if the history_messages table doesn't exist yet.
+    """
+    box_ids = sorted(
+        {e.record_id for e in entries if e.table_name == Box._meta.table_name}
+    )
+    if not box_ids:
+        return
+    if first_id is None:
+        first_id = min(e.id for e in entries)
+    try:
+        for start in range(0, len(box_ids), BATCH_SIZE):
+            end = start + BATCH_SIZE
+            _insert_box_history_messages(
+                DbChangeHistory.id >= first_id,
+                DbChangeHistory.record_id << box_ids[start:end],
+            )
+    except ProgrammingError as e:
+        if e.args[0] != NO_SUCH_TABLE:
+            raise
+
+
+def insert_history_entries(entries):
+    """Write the given DbChangeHistory entries in batches, and store the messages of the
+    ones that refer to boxes. For a multi-row insert MySQL returns the ID of the first
+    inserted row, which restricts rendering the messages to the new entries (bulk
+    inserts don't return the IDs of the new rows).
+    """
+    first_id = None
+    for start in range(0, len(entries), BATCH_SIZE):
+        end = start + BATCH_SIZE
+        inserted_id = DbChangeHistory.insert_many(
+            [entry.__data__ for entry in entries[start:end]]
+        ).execute()
+        if first_id is None:
+            first_id = inserted_id
+    if first_id is not None:
+        save_box_history_messages(entries, first_id=first_id)
+
+
+def backfill_box_history_messages(*, batch_size=BACKFILL_BATCH_SIZE, on_progress=None):
+    """Render and store the messages of all box history entries that don't have a
+    stored message yet, processing batches of `batch_size` consecutive history IDs.
+    After each batch, `on_progress` (if given) is called with the last processed ID, the
+    maximum ID, and the number of messages stored so far. Return the total number of
+    stored messages.
+    """
+    max_id = DbChangeHistory.select(fn.MAX(DbChangeHistory.id)).scalar() or 0
+    total = 0
+    for start in range(1, max_id + 1, batch_size):
+        end = min(start + batch_size - 1, max_id)
+        total += _insert_box_history_messages(DbChangeHistory.id.between(start, end))
+        if on_progress is not None:
+            on_progress(end, max_id, total)
+    return total
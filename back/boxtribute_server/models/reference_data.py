@@ -0,0 +1,245 @@
+"""Process-wide cache of reference data, i.e. of catalog tables that change a few times
+a year at most (sizes, units, product categories, size ranges, standard products).
+
+The rows of a table are loaded entirely on first access. Afterwards, at most every
+REFERENCE_DATA_CACHE_CHECK_INTERVAL seconds, a version of the table is queried (the
+number of rows, and the maximum values of a few columns, e.g. the ID). If it differs
+from the version of the cached rows, the table is reloaded.
+Limitations:
+- in-place updates that don't affect the version (e.g. fixing the label of an existing
+  size, or the conversion factor of a unit) are only picked up after a restart of the
+  server, or after calling `clear()`
+- the cached rows are peewee model instances shared by all threads and requests. Since
+  peewee stores related instances on a row when accessing a foreign key, the accessors
+  hand out copies of the rows instead
+
+The cache is used if the REFERENCE_DATA_CACHE environment variable is set to "true".
+Otherwise the data is loaded from the database on every access.
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Mapping
+
+from peewee import SQL, ForeignKeyField, fn
+
+from .definitions.product_category import ProductCategory
+from .definitions.size import Size
+from .definitions.size_range import SizeRange
+from .definitions.size_range_size import SizeRangeSize
+from .definitions.standard_product import StandardProduct
+from .definitions.unit import Unit
+
+DEFAULT_CHECK_INTERVAL = 60  # seconds
+
+# Columns whose maximum value (together with the number of rows) identifies the
+# version of a table's content
+VERSION_FIELDS = {
+    ProductCategory: [ProductCategory.id],
+    Size: [Size.id],
+    SizeRange: [SizeRange.id],
+    SizeRangeSize: [SizeRangeSize.size_range, SizeRangeSize.seq],
+    # Standard products are deprecated by setting a timestamp
+    StandardProduct: [StandardProduct.id, StandardProduct.deprecated_on],
+    Unit: [Unit.id],
+}
+
+
+def _attribute_name(field):
+    # For ForeignKeyFields, avoid an additional DB lookup triggered by accessing the
+    # field via getattr(row, field.name)
+    return field.object_id_name if isinstance(field, ForeignKeyField) else field.name
+
+
+def _copy(row):
+    """Return a copy of the given row that shares neither field data nor related
+    instances with the cached row.
+    """
+    duplicate = copy.copy(row)
+    duplicate.__data__ = dict(row.__data__)
+    duplicate.__rel__ = {}
+    duplicate._dirty = set()
+    return duplicate
+
+
+class CopyingMapping(Mapping):
+    """Read-only view of a mapping of keys to rows, or to lists of rows. Rows are copied
+    on access, hence only the accessed rows are copied.
+    """
+
+    __slots__ = ("_mapping",)
+
+    def __init__(self, mapping):
+        self._mapping = mapping
+
+    def __getitem__(self, key):
+        value = self._mapping[key]
+        if isinstance(value, list):
+            return [_copy(row) for row in value]
+        return _copy(value)
+
+    def __iter__(self):
+        return iter(self._mapping)
+
+    def __len__(self):
+        return len(self._mapping)
+
+
+class CachedTable:
+    """Container for the rows of a table, their version, and look-ups derived from
+    the rows.
+    """
+
+    __slots__ = ("rows", "version", "checked_at", "_by_id", "_groups")
+
+    def __init__(self, rows, version):
+        self.rows = rows
+        self.version = version
+        self.checked_at = time.monotonic()
+        self._by_id = None
+        self._groups = {}
+
+    def by_id(self):
+        if self._by_id is None:
+            self._by_id = {row.id: row for row in self.rows}
+        return self._by_id
+
+    def grouped(self, field):
+        if field not in self._groups:
+            groups = defaultdict(list)
+            attribute = _attribute_name(field)
+            for row in self.rows:
+                groups[getattr(row, attribute)].append(row)
+            self._groups[field] = dict(groups)
+        return self._groups[field]
+
+
+class ReferenceDataCache:
+    """Thread-safe cache of the rows of the tables in `VERSION_FIELDS`. The cached rows
+    are shared by all requests; `rows()`, `by_id()`, `grouped()`, and `get()` return
+    copies of them.
+    """
+
+    def __init__(self, version_fields=None):
+        self.version_fields = version_fields or VERSION_FIELDS
+        self._tables = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.version_checks = 0
+
+    @staticmethod
+    def enabled():
+        return os.getenv("REFERENCE_DATA_CACHE") == "true"
+
+    @staticmethod
+    def check_interval():
+        return float(
+            os.getenv("REFERENCE_DATA_CACHE_CHECK_INTERVAL", DEFAULT_CHECK_INTERVAL)
+        )
+
+    def _select(self, model):
+        selection = model.select()
+        if model is SizeRangeSize:
+            return selection.order_by(SizeRangeSize.size_range, SizeRangeSize.seq)
+        return selection.order_by(model.id)
+
+    def _query_version(self, model):
+        fields = self.version_fields[model]
+        return tuple(
+            model.select(fn.COUNT(SQL("*")), *[fn.MAX(f) for f in fields])
+            .tuples()
+            .get()
+        )
+
+    def _compute_version(self, model, rows):
+        version = [len(rows)]
+        for field in self.version_fields[model]:
+            attribute = _attribute_name(field)
+            values = [v for r in rows if (v := getattr(r, attribute)) is not None]
+            version.append(max(values, default=None))
+        return tuple(version)
+
+    def table(self, model):
+        """Return the CachedTable of the given model. Load the rows from the database if
+        the cache is disabled, if they have not been loaded yet, or if the table's
+        version changed.
+        """
+        if not self.enabled():
+            return CachedTable(list(self._select(model)), version=None)
+
+        with self._lock:
+            table = self._tables.get(model)
+        if table is not None:
+            if time.monotonic() - table.checked_at < self.check_interval():
+                with self._lock:
+                    self.hits += 1
+                return table
+
+            version = self._query_version(model)
+            with self._lock:
+                self.version_checks += 1
+                if version == table.version:
+                    self.hits += 1
+                    table.checked_at = time.monotonic()
+                    return table
+
+        rows = list(self._select(model))
+        table = CachedTable(rows, version=self._compute_version(model, rows))
+        with self._lock:
+            self.loads += 1
+            self._tables[model] = table
+        return table
+
+    def rows(self, model):
+        return [_copy(row) for row in self.table(model).rows]
+
+    def by_id(self, model):
+        """Return mapping of ID to row for all rows of the given model."""
+        return CopyingMapping(self.table(model).by_id())
+
+    def grouped(self, field):
+        """Return mapping of the values of the given field to lists of rows."""
+        return CopyingMapping(self.table(field.model).grouped(field))
+
+    def get(self, model, id):
+        """Return row of the given model with given ID. Raise `model.DoesNotExist` if
+        it doesn't exist.
+        """
+        if not self.enabled():
+            return model.get_by_id(id)
+        try:
+            return self.by_id(model)[id]
+        except KeyError:
+            raise model.DoesNotExist(
+                f"{model.__name__} instance matching ID {id} does not exist"
+            )
+
+    def info(self):
+        """Return counters of cache hits, loads (i.e. misses), and version checks."""
+        with self._lock:
+            accesses = self.hits + self.loads
+            return {
+                "hits": self.hits,
+                "loads": self.loads,
+                "version_checks": self.version_checks,
+                "hit_rate": round(self.hits / accesses, 3) if accesses else None,
+                "tables": len(self._tables),
+            }
+
+    @property
+    def accesses(self):
+        return self.hits + self.loads
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self.hits = 0
+            self.loads = 0
+            self.version_checks = 0
+
+
+reference_data_cache = ReferenceDataCache()
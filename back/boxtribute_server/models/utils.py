@@ -18,6 +18,9 @@ from .fields import EnumCharField
 # Batch size for bulk insert/update operations
 BATCH_SIZE = 100
 
+# MySQL error code ER_NO_SUCH_TABLE
+NO_SUCH_TABLE = 1146
+
 # Number of attempts when trying to a generate unique random sequence
 RANDOM_SEQUENCE_GENERATION_ATTEMPTS = 10
 
@@ -120,7 +123,7 @@ def _save_to_history(f, changes):
                 result.deleted_on = now
                 result.save()
 
-            DbChangeHistory.create(
+            entry = DbChangeHistory.create(
                 changes=changes,
                 table_name=result._meta.table_name,
                 record_id=result.id,
@@ -128,6 +131,10 @@ def _save_to_history(f, changes):
                 ip=None,
                 change_date=now,
             )
+            # Avoid circular import (history_messages depends on this module)
+            from .history_messages import save_box_history_messages
+
+            save_box_history_messages([entry])
 
         return result
 
@@ -180,8 +187,11 @@ def save_update_to_history(*, id_field_name="id", fields):
                 fields=fields,
                 change_date=now,
             )
+            # Avoid circular import (history_messages depends on this module)
+            from .history_messages import insert_history_entries
+
             with DbChangeHistory._meta.database.atomic():
-                DbChangeHistory.bulk_create(entries, batch_size=BATCH_SIZE)
+                insert_history_entries(entries)
                 if entries:
                     result.last_modified_on = now
                     result.last_modified_by = kwargs["user_id"]
@@ -248,7 +258,10 @@ to {new_expression}"""
             # a measure value change (which requires reconstructing the unit at the time
             # of the measure value change), a full (measure value + unit info) message
             # is created here and stored
-            units = {u.id: u for u in Unit.select().namedtuples()}
+            # Avoid circular import (reference data models depend on this module)
+            from .reference_data import reference_data_cache
+
+            units = reference_data_cache.by_id(Unit)
             unit_field = (
                 "weight_display_unit_id"
                 if field_name == "weight"
@@ -17,8 +17,11 @@ from .blueprints import (
     shared_bp,
 )
 from .bridges import authenticate_auth0_log_stream, send_transformed_logs_to_slack
+from .business_logic.statistics import statistics_queries
 from .exceptions import AuthenticationFailed
+from .graph_ql.cost import PUBLIC_API_COST_LIMITS, QUERY_API_COST_LIMITS
 from .graph_ql.execution import execute_async
+from .graph_ql.persisted_queries import PersistedQueryError, persisted_query_registry
 from .graph_ql.schema import full_api_schema, public_api_schema, query_api_schema
 from .logging import (
     API_CONTEXT,
@@ -44,6 +47,13 @@ def handle_auth_error(ex):
     return response
 
 
+@app_bp.errorhandler(PersistedQueryError)
+def handle_persisted_query_error(ex):
+    response = jsonify(ex.error)
+    response.status_code = ex.status_code
+    return response
+
+
 @api_bp.get(API_GRAPHQL_PATH)
 def query_api_explorer():
     return EXPLORER_HTML, 200
@@ -53,7 +63,13 @@ def query_api_explorer():
 @requires_auth
 def query_api_server():
     with log_profiled_request_to_gcloud(context=API_CONTEXT):
-        return execute_async(schema=query_api_schema, introspection=True)
+        # The query API is read-only, hence it can be served by the replica entirely
+        return execute_async(
+            schema=query_api_schema,
+            introspection=True,
+            cost_limits=QUERY_API_COST_LIMITS,
+            replica_fields=query_api_schema.query_type.fields,
+        )
 
 
 @shared_bp.post(SHARED_GRAPHQL_PATH)
@@ -73,8 +89,16 @@ def query_api_server():
     allow_headers="*" if in_development_environment() else CORS_HEADERS,
 )
 def public_api_server():
-    log_request_to_gcloud(context=SHARED_CONTEXT)
-    return execute_async(schema=public_api_schema, introspection=True)
+    try:
+        return execute_async(
+            schema=public_api_schema,
+            introspection=True,
+            cost_limits=PUBLIC_API_COST_LIMITS,
+            replica_fields=public_api_schema.query_type.fields,
+        )
+    finally:
+        # Log after execution to include the computed query cost
+        log_request_to_gcloud(context=SHARED_CONTEXT)
 
 
 @api_bp.post("/token")
@@ -115,8 +139,15 @@ def graphql_server():
     with log_profiled_request_to_gcloud(context=WEBAPP_CONTEXT):
         # Schema introspection is enabled for local development via current_app.debug.
         # If the beta-level check fails, a bad-request (400) response with an "errors"
-        # field is returned
-        return execute_async(schema=full_api_schema, check_beta_level=True)
+        # field is returned.
+        # The client may send a query hash instead of the full query text
+        data = persisted_query_registry.resolve(request.get_json())
+        return execute_async(
+            schema=full_api_schema,
+            data=data,
+            check_beta_level=True,
+            replica_fields=statistics_queries(),
+        )
 
 
 @app_bp.get(APP_GRAPHQL_PATH)
@@ -162,6 +193,15 @@ def cron(job_name):
         nr_addresses = clean_up_user_email_addresses()
         return jsonify({"message": f"cleaned up {nr_addresses} email addresses"}), 200
 
+    if job_name == "refresh-statistics":
+        from .cron.statistics import refresh_statistics
+
+        base_ids = refresh_statistics()
+        return (
+            jsonify({"message": f"refreshed statistics of {len(base_ids)} bases"}),
+            200,
+        )
+
     if job_name == "internal-stats":
         from .cron.internal_stats import post_internal_stats_to_slack
 
@@ -0,0 +1,123 @@
+"""Counting of SQL statements executed while processing a request, and detection of
+N+1 query patterns.
+
+All statements run through the `execute_sql` method of a database interface using the
+SqlQueryCountingMixin are recorded by the active SqlQueryCounter (see
+`track_sql_queries`). Statements are grouped by their shape, i.e. the SQL text with
+literal values and the number of parameters in IN-lists normalized. A shape executed
+more often than a threshold within a single GraphQL operation hints at a resolver
+querying the database once per parent object instead of using a DataLoader.
+"""
+
+import contextlib
+import os
+import re
+from collections import Counter
+from contextvars import ContextVar
+
+from peewee import MySQLDatabase
+
+# Shapes executed more often than this within one operation are reported as N+1 queries
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+
+_current_counter: ContextVar["SqlQueryCounter | None"] = ContextVar(
+    "current_sql_query_counter", default=None
+)
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w`])-?\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_WRITE_STATEMENT = re.compile(r"(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+
+def n_plus_one_threshold() -> int:
+    return int(os.getenv("N_PLUS_ONE_THRESHOLD", DEFAULT_N_PLUS_ONE_THRESHOLD))
+
+
+def normalize_sql(sql):
+    """Return the shape of the given SQL statement: literals are replaced by
+    placeholders, lists of placeholders (e.g. `IN (%s, %s, %s)`) are collapsed into
+    `(...)`, and whitespace is condensed.
+    """
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _VALUE_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class SqlQueryCounter:
+    """Container for the number of executed statements per shape. Statements are also
+    recorded in the counter that was active when this one was created (e.g. a counter
+    wrapping an entire test also sees the statements counted per GraphQL operation).
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.shapes = Counter()
+
+    def record(self, sql):
+        self.shapes[normalize_sql(sql)] += 1
+        if self.parent is not None:
+            self.parent.record(sql)
+
+    @property
+    def count(self):
+        return self.shapes.total()
+
+    @property
+    def writes(self):
+        """Number of executed statements that modify data."""
+        return sum(
+            count
+            for shape, count in self.shapes.items()
+            if _WRITE_STATEMENT.match(shape)
+        )
+
+    def repeated_shapes(self, threshold=None):
+        """Return list of shapes executed more than `threshold` times (default: value
+        of the N_PLUS_ONE_THRESHOLD environment variable), most frequent first.
+        """
+        if threshold is None:
+            threshold = n_plus_one_threshold()
+        return [
+            {"sql": shape, "count": count}
+            for shape, count in self.shapes.most_common()
+            if count > threshold
+        ]
+
+    def report(self, threshold=None):
+        return {
+            "count": self.count,
+            "shapes": dict(self.shapes.most_common()),
+            "repeated": self.repeated_shapes(threshold),
+        }
+
+
+@contextlib.contextmanager
+def track_sql_queries():
+    """Context manager yielding a SqlQueryCounter that records all statements executed
+    inside the block (also from coroutines started in it).
+    """
+    counter = SqlQueryCounter(parent=_current_counter.get())
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+
+class SqlQueryCountingMixin:
+    """Mixin for peewee database interfaces to record every executed statement in the
+    active SqlQueryCounter, if any.
+    """
+
+    def execute_sql(self, sql, params=None):
+        counter = _current_counter.get()
+        if counter is not None:
+            counter.record(sql)
+        return super().execute_sql(sql, params)
+
+
+class CountingMySQLDatabase(SqlQueryCountingMixin, MySQLDatabase):
+    pass
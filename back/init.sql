@@ -567,6 +567,28 @@ INSERT INTO `cms_users` VALUES (1,'bf13b44feae208fc808b1d6b2266edb7','some admin
 /*!40000 ALTER TABLE `cms_users` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `consistency_tokens`
+--
+
+DROP TABLE IF EXISTS `consistency_tokens`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `consistency_tokens` (
+  `id` int unsigned NOT NULL AUTO_INCREMENT,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `consistency_tokens`
+--
+
+LOCK TABLES `consistency_tokens` WRITE;
+/*!40000 ALTER TABLE `consistency_tokens` DISABLE KEYS */;
+/*!40000 ALTER TABLE `consistency_tokens` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `distro_events`
 --
@@ -873,6 +895,30 @@ INSERT INTO `history` VALUES (30918,'tags',45,'Record created',23,NULL,'2025-07-
 /*!40000 ALTER TABLE `history` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `history_messages`
+--
+
+DROP TABLE IF EXISTS `history_messages`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `history_messages` (
+  `history_id` int unsigned NOT NULL,
+  `message` text NOT NULL,
+  PRIMARY KEY (`history_id`),
+  CONSTRAINT `history_messages_ibfk_1` FOREIGN KEY (`history_id`) REFERENCES `history` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `history_messages`
+--
+
+LOCK TABLES `history_messages` WRITE;
+/*!40000 ALTER TABLE `history_messages` DISABLE KEYS */;
+/*!40000 ALTER TABLE `history_messages` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `itemsout`
 --
@@ -2222,6 +2268,161 @@ INSERT INTO `standard_product` VALUES (1,'Baby Bibs',8,9,6,1,'2023-01-01 01:23:4
 /*!40000 ALTER TABLE `standard_product` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `statistics_beneficiary_demographics`
+--
+
+DROP TABLE IF EXISTS `statistics_beneficiary_demographics`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `statistics_beneficiary_demographics` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `base_id` int unsigned NOT NULL,
+  `gender` varchar(255) NOT NULL,
+  `created_on` date DEFAULT NULL,
+  `deleted_on` date DEFAULT NULL,
+  `date_of_birth` date DEFAULT NULL,
+  `tag_ids` text,
+  `count` int NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `beneficiarydemographicsfact_base_id` (`base_id`),
+  CONSTRAINT `statistics_beneficiary_demographics_ibfk_1` FOREIGN KEY (`base_id`) REFERENCES `camps` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `statistics_beneficiary_demographics`
+--
+
+LOCK TABLES `statistics_beneficiary_demographics` WRITE;
+/*!40000 ALTER TABLE `statistics_beneficiary_demographics` DISABLE KEYS */;
+/*!40000 ALTER TABLE `statistics_beneficiary_demographics` ENABLE KEYS */;
+UNLOCK TABLES;
+
+--
+-- Table structure for table `statistics_created_boxes`
+--
+
+DROP TABLE IF EXISTS `statistics_created_boxes`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `statistics_created_boxes` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `base_id` int unsigned NOT NULL,
+  `created_on` datetime DEFAULT NULL,
+  `product_id` int NOT NULL,
+  `category_id` int NOT NULL,
+  `gender` int NOT NULL,
+  `tag_ids` text,
+  `boxes_count` int NOT NULL,
+  `items_count` int NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `createdboxesfact_base_id` (`base_id`),
+  CONSTRAINT `statistics_created_boxes_ibfk_1` FOREIGN KEY (`base_id`) REFERENCES `camps` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `statistics_created_boxes`
+--
+
+LOCK TABLES `statistics_created_boxes` WRITE;
+/*!40000 ALTER TABLE `statistics_created_boxes` DISABLE KEYS */;
+/*!40000 ALTER TABLE `statistics_created_boxes` ENABLE KEYS */;
+UNLOCK TABLES;
+
+--
+-- Table structure for table `statistics_refreshes`
+--
+
+DROP TABLE IF EXISTS `statistics_refreshes`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `statistics_refreshes` (
+  `base_id` int unsigned NOT NULL,
+  `history_id` int NOT NULL,
+  `refreshed_on` datetime NOT NULL,
+  PRIMARY KEY (`base_id`),
+  CONSTRAINT `statistics_refreshes_ibfk_1` FOREIGN KEY (`base_id`) REFERENCES `camps` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `statistics_refreshes`
+--
+
+LOCK TABLES `statistics_refreshes` WRITE;
+/*!40000 ALTER TABLE `statistics_refreshes` DISABLE KEYS */;
+/*!40000 ALTER TABLE `statistics_refreshes` ENABLE KEYS */;
+UNLOCK TABLES;
+
+--
+-- Table structure for table `statistics_stock_overview`
+--
+
+DROP TABLE IF EXISTS `statistics_stock_overview`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `statistics_stock_overview` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `base_id` int unsigned NOT NULL,
+  `size_id` int DEFAULT NULL,
+  `location_id` int NOT NULL,
+  `box_state` int DEFAULT NULL,
+  `category_id` int NOT NULL,
+  `product_name` varchar(255) NOT NULL,
+  `absolute_measure_value` double DEFAULT NULL,
+  `dimension_id` int DEFAULT NULL,
+  `gender` int NOT NULL,
+  `tag_ids` text,
+  `boxes_count` int NOT NULL,
+  `items_count` int DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `stockoverviewfact_base_id` (`base_id`),
+  CONSTRAINT `statistics_stock_overview_ibfk_1` FOREIGN KEY (`base_id`) REFERENCES `camps` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `statistics_stock_overview`
+--
+
+LOCK TABLES `statistics_stock_overview` WRITE;
+/*!40000 ALTER TABLE `statistics_stock_overview` DISABLE KEYS */;
+/*!40000 ALTER TABLE `statistics_stock_overview` ENABLE KEYS */;
+UNLOCK TABLES;
+
+--
+-- Table structure for table `statistics_top_products_donated`
+--
+
+DROP TABLE IF EXISTS `statistics_top_products_donated`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `statistics_top_products_donated` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `base_id` int unsigned NOT NULL,
+  `created_on` date DEFAULT NULL,
+  `donated_on` date DEFAULT NULL,
+  `size_id` int DEFAULT NULL,
+  `product_id` int NOT NULL,
+  `category_id` int NOT NULL,
+  `items_count` int NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `topproductsdonatedfact_base_id` (`base_id`),
+  CONSTRAINT `statistics_top_products_donated_ibfk_1` FOREIGN KEY (`base_id`) REFERENCES `camps` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `statistics_top_products_donated`
+--
+
+LOCK TABLES `statistics_top_products_donated` WRITE;
+/*!40000 ALTER TABLE `statistics_top_products_donated` DISABLE KEYS */;
+/*!40000 ALTER TABLE `statistics_top_products_donated` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `stock`
 --
@@ -2256,6 +2457,7 @@ CREATE TABLE `stock` (
   UNIQUE KEY `qr_id_unique` (`qr_id`),
   KEY `box_id` (`box_id`),
   KEY `location_id` (`location_id`),
+  KEY `location_modified_id` (`location_id`,`modified`,`id`),
   KEY `product_id` (`product_id`),
   KEY `size_id` (`size_id`),
   KEY `box_state_id` (`box_state_id`),
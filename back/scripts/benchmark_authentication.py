@@ -0,0 +1,117 @@
+"""Benchmark of authenticating requests, comparing the cold path (verifying the JWT
+signature and deriving the CurrentUser from the claims) to the warm path (look-up in
+the cache of verified tokens, see `auth.VerifiedTokenCache`).
+
+A token with the permissions of a user having access to a number of bases (default: 10)
+is signed by a local key. The decorated dummy endpoint is called repeatedly within a
+Flask request context, and the average duration per call is reported.
+
+Usage:
+    python back/scripts/benchmark_authentication.py [number_of_bases]
+"""
+
+import os
+import sys
+import time
+
+import jwt
+from boxtribute_server.auth import (
+    JWT_CLAIM_PREFIX,
+    requires_auth,
+    verified_token_cache,
+)
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from flask import Flask, g
+
+DOMAIN = "auth.example.org"
+AUDIENCE = "boxtribute-api"
+RESOURCES = [
+    "base",
+    "beneficiary",
+    "box_state",
+    "distro_event",
+    "history",
+    "location",
+    "product",
+    "product_category",
+    "qr",
+    "shipment",
+    "size",
+    "size_range",
+    "stock",
+    "tag",
+    "tag_relation",
+    "transaction",
+    "transfer_agreement",
+    "user",
+]
+NUMBER_OF_CALLS = 2000
+
+
+def create_token(private_key, number_of_bases):
+    base_ids = list(range(1, number_of_bases + 1))
+    prefix = f"base_{'-'.join(str(b) for b in base_ids)}"
+    permissions = [
+        f"{prefix}/{resource}:{method}"
+        for resource in RESOURCES
+        for method in ["read", "write"]
+    ]
+    payload = {
+        f"{JWT_CLAIM_PREFIX}/organisation_id": 1,
+        f"{JWT_CLAIM_PREFIX}/base_ids": base_ids,
+        f"{JWT_CLAIM_PREFIX}/roles": ["base_1_coordinator"],
+        f"{JWT_CLAIM_PREFIX}/permissions": permissions,
+        f"{JWT_CLAIM_PREFIX}/beta_user": 3,
+        "sub": "auth0|8",
+        "aud": AUDIENCE,
+        "iss": f"https://{DOMAIN}/",
+        "exp": int(time.time()) + 3600,
+    }
+    return jwt.encode(payload, private_key, algorithm="RS256")
+
+
+def measure(app, endpoint, token, *, warm):
+    headers = {"Authorization": f"Bearer {token}"}
+    verified_token_cache.clear()
+    start = time.perf_counter()
+    for _ in range(NUMBER_OF_CALLS):
+        if not warm:
+            verified_token_cache.clear()
+        with app.test_request_context(headers=headers):
+            endpoint()
+    return (time.perf_counter() - start) / NUMBER_OF_CALLS
+
+
+def main():
+    number_of_bases = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    os.environ["AUTH0_PUBLIC_KEY"] = (
+        private_key.public_key()
+        .public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        .decode()
+    )
+    os.environ["AUTH0_DOMAIN"] = DOMAIN
+    os.environ["AUTH0_AUDIENCE"] = AUDIENCE
+
+    token = create_token(private_key, number_of_bases)
+    app = Flask(__name__)
+    endpoint = requires_auth(lambda: g.user)
+
+    # Each request context incurs some overhead; measure it for reference
+    durations = {
+        "request context only": measure(app, lambda: None, token, warm=True),
+        "cold (verify + parse)": measure(app, endpoint, token, warm=False),
+        "warm (cached token)": measure(app, endpoint, token, warm=True),
+    }
+    print(f"Authenticated {NUMBER_OF_CALLS} calls, {number_of_bases} bases in token")
+    for name, duration in durations.items():
+        print(f"{name:>22}: {duration * 1000:8.3f} ms per call")
+    print(f"Token cache: {verified_token_cache.info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Micro-benchmark of per-item authorization checks for a large page of boxes,
+comparing `authorize()` with Forbidden exceptions as control flow to the non-raising
+`is_authorized()`.
+
+The user is granted `product:read` for a number of bases (default: 10). The page
+contains boxes whose products belong to one of the user's bases, or (for every fourth
+box, e.g. in a shipment from a partner organisation) to a base the user has no access
+to. For each box the check of `Box.product` is performed; the average duration per
+page is reported.
+
+Usage:
+    python back/scripts/benchmark_authorization.py [number_of_bases] [page_size]
+"""
+
+import sys
+import time
+
+from boxtribute_server.auth import CurrentUser
+from boxtribute_server.authz import authorize, is_authorized
+from boxtribute_server.exceptions import Forbidden
+
+NUMBER_OF_PAGES = 200
+
+
+def check_with_exception(user, base_ids):
+    results = []
+    for base_id in base_ids:
+        try:
+            authorize(user, permission="product:read", base_id=base_id)
+            results.append(True)
+        except Forbidden:
+            results.append(False)
+    return results
+
+
+def check_without_exception(user, base_ids):
+    return [
+        is_authorized(user, permission="product:read", base_id=base_id)
+        for base_id in base_ids
+    ]
+
+
+def measure(check, user, base_ids):
+    start = time.perf_counter()
+    for _ in range(NUMBER_OF_PAGES):
+        check(user, base_ids)
+    return (time.perf_counter() - start) / NUMBER_OF_PAGES
+
+
+def main():
+    number_of_bases = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    user_base_ids = list(range(1, number_of_bases + 1))
+    user = CurrentUser(
+        id=1, organisation_id=1, base_ids={"product:read": user_base_ids}
+    )
+    other_base_id = number_of_bases + 1
+    base_ids = [
+        other_base_id if i % 4 == 0 else user_base_ids[i % number_of_bases]
+        for i in range(page_size)
+    ]
+    assert check_with_exception(user, base_ids) == check_without_exception(
+        user, base_ids
+    )
+
+    durations = {
+        "authorize + Forbidden": measure(check_with_exception, user, base_ids),
+        "is_authorized": measure(check_without_exception, user, base_ids),
+    }
+    print(f"Checked pages of {page_size} boxes, {number_of_bases} bases of user")
+    for name, duration in durations.items():
+        print(f"{name:>22}: {duration * 1000:8.3f} ms per page")
+
+
+if __name__ == "__main__":
+    main()
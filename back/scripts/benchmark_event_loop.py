@@ -0,0 +1,50 @@
+"""Micro-benchmark comparing the event loop modes of GraphQL execution: a fresh event
+loop per request (`asyncio.run`) vs. a persistent event loop per thread.
+
+Each simulated request instantiates a few DataLoaders and batch-loads some keys, similar
+to what `execute_async` does. No database is involved.
+
+Usage:
+    python back/scripts/benchmark_event_loop.py [number_of_requests]
+"""
+
+import sys
+import timeit
+from functools import partial
+
+from aiodataloader import DataLoader
+from boxtribute_server.graph_ql.execution import run_coroutine
+
+NR_LOADERS = 30
+
+
+class EchoLoader(DataLoader):
+    async def batch_load_fn(self, keys):
+        return keys
+
+
+async def simulate_request():
+    loaders = [EchoLoader() for _ in range(NR_LOADERS)]
+    return [await loader.load_many(range(10)) for loader in loaders[:3]]
+
+
+def run_coroutine_in_mode(*, persistent_loop):
+    return run_coroutine(simulate_request(), persistent_loop=persistent_loop)
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for persistent_loop in [False, True]:
+        duration = timeit.timeit(
+            partial(run_coroutine_in_mode, persistent_loop=persistent_loop),
+            number=number,
+        )
+        mode = "persistent" if persistent_loop else "per-request"
+        print(
+            f"{mode:>12}: {duration:.3f}s for {number} requests "
+            f"({duration / number * 1e6:.1f} µs/request)"
+        )
+
+
+if __name__ == "__main__":
+    main()
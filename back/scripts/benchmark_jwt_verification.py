@@ -0,0 +1,132 @@
+"""Benchmark of verifying JWTs, comparing the cached JWKS public key (as implemented in
+`jwks.PublicKeyCache`) to fetching the PEM certificate and extracting the public key
+with an openssl subprocess for every request (the former implementation).
+
+A local stub key server serves a self-signed certificate and the corresponding JWKS.
+Tokens are signed with the private key, and the average verification duration (i.e.
+obtaining the public key and decoding the token) is reported for both approaches.
+
+Usage (requires the openssl executable):
+    python back/scripts/benchmark_jwt_verification.py [number_of_tokens]
+"""
+
+import json
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from boxtribute_server.auth import decode_jwt
+from boxtribute_server.jwks import PublicKeyCache
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+DOMAIN = "auth.example.org"
+AUDIENCE = "boxtribute-api"
+KEY_ID = "benchmark-key"
+
+
+def create_key_material():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, DOMAIN)])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(private_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + timedelta(days=1))
+        .sign(private_key, hashes.SHA256())
+    )
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update(kid=KEY_ID, use="sig", alg="RS256")
+    responses = {
+        "/pem": certificate.public_bytes(serialization.Encoding.PEM),
+        "/.well-known/jwks.json": json.dumps({"keys": [jwk]}).encode(),
+    }
+    return private_key, responses
+
+
+def start_key_server(responses):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = responses[self.path]
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def public_key_from_pem(base_url):
+    response = urllib.request.urlopen(f"{base_url}/pem")
+    cert = response.read()
+    p = subprocess.run(
+        ["openssl", "x509", "-pubkey", "-noout"], input=cert, capture_output=True
+    )
+    return p.stdout.decode()
+
+
+def public_key_from_cache(cache, base_url, token):
+    key_id = jwt.get_unverified_header(token)["kid"]
+    return cache.get_key(f"{base_url}/.well-known/jwks.json", key_id)
+
+
+def measure(tokens, get_key):
+    start = time.perf_counter()
+    for token in tokens:
+        decode_jwt(
+            token=token, public_key=get_key(token), domain=DOMAIN, audience=AUDIENCE
+        )
+    return (time.perf_counter() - start) / len(tokens)
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    private_key, responses = create_key_material()
+    server, base_url = start_key_server(responses)
+
+    payload = {"aud": AUDIENCE, "iss": f"https://{DOMAIN}/"}
+    tokens = [
+        jwt.encode(
+            {**payload, "sub": f"auth0|{i}"},
+            private_key,
+            algorithm="RS256",
+            headers={"kid": KEY_ID},
+        )
+        for i in range(number)
+    ]
+
+    cache = PublicKeyCache()
+    durations = {
+        "PEM + openssl per request": measure(
+            tokens, lambda _: public_key_from_pem(base_url)
+        ),
+        "cached JWKS": measure(
+            tokens, lambda token: public_key_from_cache(cache, base_url, token)
+        ),
+    }
+    server.shutdown()
+
+    print(f"Verified {number} tokens")
+    for name, duration in durations.items():
+        print(f"{name:>26}: {duration * 1000:8.3f} ms per token")
+    print(f"Key set fetches of the cache: {cache.info()['fetches']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark of paging through boxes ordered by modification date, comparing keyset
+pagination (as implemented in `load_into_page`) to OFFSET-based pagination.
+
+A number of boxes (default: 100k) is inserted into a location of the development
+database within a transaction that is rolled back at the end. Then all pages of a
+location's boxes are fetched, and the average duration per page is reported for the
+first and the last tenth of the pages.
+
+Usage (requires the `db` docker-compose service, and MYSQL_* environment variables):
+    dotenv run python back/scripts/benchmark_keyset_pagination.py [number_of_boxes]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from boxtribute_server.db import create_db_interface
+from boxtribute_server.graph_ql.pagination import (
+    DEFAULT_PAGINATION_LIMIT,
+    load_into_page,
+)
+from boxtribute_server.models import MODELS
+from boxtribute_server.models.definitions.box import Box
+from boxtribute_server.models.definitions.location import Location
+from boxtribute_server.models.definitions.product import Product
+
+BATCH_SIZE = 5000
+
+
+def insert_boxes(*, number, location, product):
+    start = datetime(2020, 1, 1)
+    rows = [
+        {
+            "label_identifier": f"B{i:010}",
+            "location": location.id,
+            "product": product.id,
+            "number_of_items": 1,
+            "created_on": start,
+            # Many boxes share the same modification date, e.g. after a bulk action
+            "last_modified_on": start + timedelta(minutes=random.randint(0, number)),
+        }
+        for i in range(number)
+    ]
+    for start_index in range(0, number, BATCH_SIZE):
+        end_index = start_index + BATCH_SIZE
+        Box.insert_many(rows[start_index:end_index]).execute()
+
+
+def page_with_keyset(location_id):
+    durations = []
+    box_ids = []
+    pagination_input = {"first": DEFAULT_PAGINATION_LIMIT}
+    while True:
+        start = time.perf_counter()
+        page = load_into_page(
+            Box,
+            Box.location == location_id,
+            selection=Box.select(Box.id, Box.last_modified_on),
+            order_by_field=Box.last_modified_on.desc(),
+            pagination_input=pagination_input,
+        )
+        durations.append(time.perf_counter() - start)
+        box_ids.extend(b.id for b in page["elements"])
+        if not page["page_info"].has_next_page:
+            return durations, box_ids
+        pagination_input["after"] = page["page_info"].end_cursor
+
+
+def page_with_offset(location_id, number_of_pages):
+    durations = []
+    box_ids = []
+    for page_number in range(number_of_pages):
+        start = time.perf_counter()
+        elements = list(
+            Box.select(Box.id, Box.last_modified_on)
+            .where(Box.location == location_id)
+            .order_by(Box.last_modified_on.desc(), Box.id.desc())
+            .limit(DEFAULT_PAGINATION_LIMIT)
+            .offset(page_number * DEFAULT_PAGINATION_LIMIT)
+        )
+        durations.append(time.perf_counter() - start)
+        box_ids.extend(b.id for b in elements)
+    return durations, box_ids
+
+
+def report(name, durations):
+    tenth = max(len(durations) // 10, 1)
+    first = sum(durations[:tenth]) / tenth * 1000
+    last = sum(durations[-tenth:]) / tenth * 1000
+    print(
+        f"{name:>7}: {len(durations)} pages, {first:.2f} ms/page (first tenth), "
+        f"{last:.2f} ms/page (last tenth), {sum(durations):.2f}s in total"
+    )
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    database = create_db_interface(
+        user=os.environ["MYSQL_USER"],
+        password=os.environ["MYSQL_PASSWORD"],
+        database=os.environ["MYSQL_DB"],
+        host=os.getenv("MYSQL_HOST"),
+        port=int(os.getenv("MYSQL_PORT", 0)),
+    )
+    database.bind(MODELS, bind_refs=False, bind_backrefs=False)
+
+    with database.atomic() as transaction:
+        location = Location.select().where(Location.deleted_on.is_null()).first()
+        product = Product.select().where(Product.base == location.base_id).first()
+        print(f"Inserting {number} boxes into location {location.id}...")
+        insert_boxes(number=number, location=location, product=product)
+
+        keyset_durations, keyset_ids = page_with_keyset(location.id)
+        offset_durations, offset_ids = page_with_offset(
+            location.id, len(keyset_durations)
+        )
+        assert keyset_ids == offset_ids, "Pagination methods return different boxes"
+        assert len(set(keyset_ids)) == len(keyset_ids), "Boxes repeated across pages"
+
+        report("keyset", keyset_durations)
+        report("offset", offset_durations)
+        transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Benchmark of computing the moved-boxes facts of all bases, comparing the reference
+MOVED_BOXES_QUERY (box versions reconstructed by correlated subqueries) to the history
+replay in `history_replay.py` plus SHIPPED_AND_LOST_BOXES_QUERY (as used by
+`compute_moved_boxes`).
+
+The fake dataset of the development database is scaled up by a number of boxes (default:
+20k) with a random history each (changes of number of items, location, and box state
+between InStock and Donated; some boxes are deleted). They are inserted within a
+transaction that is rolled back at the end. The results of both computations are
+checked for equality.
+
+Usage (requires the `db` docker-compose service, and MYSQL_* environment variables):
+    dotenv run python back/scripts/benchmark_moved_boxes.py [number_of_boxes]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from boxtribute_server.business_logic.statistics.crud import compute_moved_boxes
+from boxtribute_server.business_logic.statistics.sql import MOVED_BOXES_QUERY
+from boxtribute_server.db import create_db_interface, execute_sql
+from boxtribute_server.enums import BoxState, TargetType
+from boxtribute_server.models import MODELS
+from boxtribute_server.models.definitions.base import Base
+from boxtribute_server.models.definitions.box import Box
+from boxtribute_server.models.definitions.history import DbChangeHistory
+from boxtribute_server.models.definitions.location import Location
+from boxtribute_server.models.definitions.product import Product
+from boxtribute_server.models.utils import (
+    HISTORY_CREATION_MESSAGE,
+    HISTORY_DELETION_MESSAGE,
+    convert_ids,
+)
+
+BATCH_SIZE = 5000
+NUMBER_OF_CHANGES = 8
+
+
+def insert_boxes_with_history(*, number):
+    locations = {}
+    for location in Location.select(Location.id, Location.base).where(
+        Location.deleted_on.is_null()
+    ):
+        locations.setdefault(location.base_id, []).append(location.id)
+    products = {}
+    for product in Product.select(Product.id, Product.base):
+        products.setdefault(product.base_id, []).append(product.id)
+    base_ids = sorted(set(locations) & set(products))
+
+    start = datetime(2023, 1, 1)
+    boxes = []
+    for i in range(number):
+        base_id = random.choice(base_ids)
+        boxes.append(
+            {
+                "label_identifier": f"M{i:010}",
+                "location": random.choice(locations[base_id]),
+                "product": random.choice(products[base_id]),
+                "number_of_items": random.randint(1, 50),
+                "state": BoxState.InStock,
+                "created_on": start + timedelta(days=random.randint(0, 700)),
+            }
+        )
+    for start_index in range(0, number, BATCH_SIZE):
+        end_index = start_index + BATCH_SIZE
+        Box.insert_many(boxes[start_index:end_index]).execute()
+
+    history = []
+    new_boxes = (
+        Box.select(Box.id, Box.created_on, Box.location, Location.base)
+        .join(Location)
+        .where(Box.label_identifier.startswith("M"))
+        .tuples()
+    )
+    for box_id, created_on, location_id, base_id in new_boxes:
+        entry = {"table_name": "stock", "record_id": box_id}
+        changed_on = created_on
+        history.append(
+            entry | {"changes": HISTORY_CREATION_MESSAGE, "change_date": changed_on}
+        )
+        items, state = 50, BoxState.InStock
+        for _ in range(random.randint(0, NUMBER_OF_CHANGES)):
+            changed_on += timedelta(hours=random.randint(1, 100))
+            change = random.choice(["items", "location_id", "box_state_id"])
+            if change == "items":
+                old, items = items, random.randint(1, 50)
+            elif change == "location_id":
+                old, location_id = location_id, random.choice(locations[base_id])
+            else:
+                old = state
+                state = (
+                    BoxState.Donated if state == BoxState.InStock else BoxState.InStock
+                )
+            new = {"items": items, "location_id": location_id, "box_state_id": state}
+            history.append(
+                entry
+                | {
+                    "changes": change,
+                    "change_date": changed_on,
+                    "from_int": old,
+                    "to_int": new[change],
+                }
+            )
+        if random.random() < 0.05:
+            changed_on += timedelta(hours=1)
+            history.append(
+                entry | {"changes": HISTORY_DELETION_MESSAGE, "change_date": changed_on}
+            )
+    for start_index in range(0, len(history), BATCH_SIZE):
+        end_index = start_index + BATCH_SIZE
+        DbChangeHistory.insert_many(history[start_index:end_index]).execute()
+    return len(history)
+
+
+def query_moved_boxes(*base_ids):
+    facts = execute_sql(
+        base_ids,
+        1,
+        TargetType.BoxState.name,
+        TargetType.BoxState.name,
+        TargetType.OutgoingLocation.name,
+        TargetType.OutgoingLocation.name,
+        TargetType.OutgoingShipment.name,
+        base_ids,
+        TargetType.IncomingShipment.name,
+        base_ids,
+        TargetType.BoxState.name,
+        base_ids,
+        query=MOVED_BOXES_QUERY,
+    )
+    for fact in facts:
+        fact["tag_ids"] = convert_ids(fact["tag_ids"])
+    return facts
+
+
+def normalize(facts):
+    for fact in facts:
+        for field in ["boxes_count", "items_count"]:
+            if fact[field] is not None:
+                fact[field] = int(fact[field])
+    return sorted(facts, key=repr)
+
+
+def measure(function, *base_ids):
+    start = time.perf_counter()
+    result = function(*base_ids)
+    return time.perf_counter() - start, result
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    database = create_db_interface(
+        user=os.environ["MYSQL_USER"],
+        password=os.environ["MYSQL_PASSWORD"],
+        database=os.environ["MYSQL_DB"],
+        host=os.getenv("MYSQL_HOST"),
+        port=int(os.getenv("MYSQL_PORT", 0)),
+    )
+    database.bind(MODELS, bind_refs=False, bind_backrefs=False)
+
+    with database.atomic() as transaction:
+        print(f"Inserting {number} boxes with history...")
+        nr_entries = insert_boxes_with_history(number=number)
+        base_ids = [base.id for base in Base.select(Base.id)]
+        nr_boxes = Box.select().count()
+        nr_history = DbChangeHistory.select().count()
+        print(
+            f"Computing moved boxes of {len(base_ids)} bases ({nr_boxes} boxes, "
+            f"{nr_history} history entries incl. {nr_entries} new ones)"
+        )
+
+        sql_duration, sql_facts = measure(query_moved_boxes, *base_ids)
+        replay_duration, cube = measure(compute_moved_boxes, *base_ids)
+        assert normalize(cube.facts) == normalize(sql_facts), "Facts differ"
+
+        print(f"{'SQL':>14}: {sql_duration:8.3f}s ({len(sql_facts)} facts)")
+        print(f"{'history replay':>14}: {replay_duration:8.3f}s (incl. dimensions)")
+        transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Benchmark of loading the sizes of many size ranges (as for `products { sizeRange {
+sizes } }`, cf. scenario D in load-test.js), comparing
+- the former SizesForSizeRangeLoader which selected the entire size catalog
+- the current SizesForSizeRangeLoader which selects only the requested size ranges
+- the SizesForSizeRangeLoader served by the reference data cache
+
+A synthetic size catalog (default: 5000 size ranges with 10 sizes each) is inserted
+into the development database within a transaction that is rolled back at the end.
+Then the sizes of 500 size ranges are loaded repeatedly, and the average duration per
+batch is reported.
+
+Usage (requires the `db` docker-compose service, and MYSQL_* environment variables):
+    dotenv run python back/scripts/benchmark_size_loaders.py [number_of_size_ranges]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+from boxtribute_server.app import create_app
+from boxtribute_server.auth import CurrentUser
+from boxtribute_server.db import create_db_interface
+from boxtribute_server.graph_ql.loaders import SizesForSizeRangeLoader
+from boxtribute_server.models import MODELS
+from boxtribute_server.models.definitions.size import Size
+from boxtribute_server.models.definitions.size_range import SizeRange
+from boxtribute_server.models.definitions.size_range_size import SizeRangeSize
+from boxtribute_server.models.reference_data import reference_data_cache
+from flask import g
+
+BATCH_SIZE = 5000
+SIZES_PER_RANGE = 10
+NUMBER_OF_KEYS = 500
+REPETITIONS = 20
+
+
+def insert_size_catalog(number):
+    SizeRange.insert_many(
+        [{"label": f"benchmark range {i}", "seq": i} for i in range(number)]
+    ).execute()
+    size_range_ids = [
+        r.id
+        for r in SizeRange.select(SizeRange.id)
+        .where(SizeRange.label.startswith("benchmark range "))
+        .order_by(SizeRange.id)
+    ]
+
+    sizes = [{"label": f"benchmark size {i}"} for i in range(number * SIZES_PER_RANGE)]
+    for start_index in range(0, len(sizes), BATCH_SIZE):
+        end_index = start_index + BATCH_SIZE
+        Size.insert_many(sizes[start_index:end_index]).execute()
+    size_ids = [
+        s.id
+        for s in Size.select(Size.id)
+        .where(Size.label.startswith("benchmark size "))
+        .order_by(Size.id)
+    ]
+
+    rows = [
+        {
+            "size_range": size_range_ids[i // SIZES_PER_RANGE],
+            "size": size_id,
+            "seq": i % SIZES_PER_RANGE,
+        }
+        for i, size_id in enumerate(size_ids)
+    ]
+    for start_index in range(0, len(rows), BATCH_SIZE):
+        end_index = start_index + BATCH_SIZE
+        SizeRangeSize.insert_many(rows[start_index:end_index]).execute()
+    return size_range_ids
+
+
+def load_entire_catalog(keys):
+    # Former implementation of SizesForSizeRangeLoader.batch_load_fn
+    sizes = defaultdict(list)
+    for srs in (
+        SizeRangeSize.select(SizeRangeSize, Size)
+        .join(Size)
+        .order_by(SizeRangeSize.size_range, SizeRangeSize.seq)
+    ):
+        sizes[srs.size_range_id].append(srs.size)
+    return [sizes.get(i, []) for i in keys]
+
+
+def load_with_loader(keys):
+    async def load():
+        return await SizesForSizeRangeLoader().load_many(keys)
+
+    return asyncio.run(load())
+
+
+def measure(name, load, keys):
+    durations = []
+    for _ in range(REPETITIONS):
+        start = time.perf_counter()
+        result = load(keys)
+        durations.append(time.perf_counter() - start)
+    average = sum(durations) / len(durations) * 1000
+    print(f"{name:>14}: {average:.2f} ms per batch of {len(keys)} size ranges")
+    return [[s.id for s in sizes] for sizes in result]
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    database = create_db_interface(
+        user=os.environ["MYSQL_USER"],
+        password=os.environ["MYSQL_PASSWORD"],
+        database=os.environ["MYSQL_DB"],
+        host=os.getenv("MYSQL_HOST"),
+        port=int(os.getenv("MYSQL_PORT", 0)),
+    )
+    database.bind(MODELS, bind_refs=False, bind_backrefs=False)
+
+    app = create_app()
+    with app.app_context(), database.atomic() as transaction:
+        g.user = CurrentUser(id=1, organisation_id=None, is_god=True)
+        print(f"Inserting {number} size ranges with {SIZES_PER_RANGE} sizes each...")
+        size_range_ids = insert_size_catalog(number)
+        keys = random.sample(size_range_ids, min(NUMBER_OF_KEYS, number))
+
+        results = [
+            measure("entire catalog", load_entire_catalog, keys),
+            measure("requested keys", load_with_loader, keys),
+        ]
+        os.environ["REFERENCE_DATA_CACHE"] = "true"
+        reference_data_cache.clear()
+        results.append(measure("cached", load_with_loader, keys))
+        assert all(r == results[0] for r in results), "Loaders return different sizes"
+
+        transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -302,15 +302,34 @@ def test_mutations(auth0_client_with_rollback, mocker):
 def test_replica_usage(auth0_client, mocker):
     from boxtribute_server.db import db
 
-    db.replica = mocker.MagicMock()
+    connect = mocker.spy(db.replica, "connect")
+    execute = mocker.spy(db.replica, "execute_sql")
     query = 'query { resolveLink(code: "abc") { __typename } }'
     assert_successful_request(auth0_client, query, endpoint="public")
-    db.replica.connect.assert_called_once()  # in DatabaseManager.connect_db
-    db.replica.bind_ctx.assert_called_once()  # in use_db_replica()
-    db.replica.reset_mock()
+    connect.assert_called_once()  # in DatabaseManager.use_replica
+    execute.assert_called()  # routed to replica
+    connect.reset_mock()
+    execute.reset_mock()
 
     query = "query { createdBoxes(baseId: 1) { __typename } }"
     assert_successful_request(auth0_client, query)
-    db.replica.connect.assert_called_once()  # in DatabaseManager.connect_db
-    db.replica.bind_ctx.assert_called_once()  # in use_db_replica()
-    db.replica.reset_mock()
+    connect.assert_called_once()  # in DatabaseManager.use_replica
+    execute.assert_called()  # routed to replica
+    connect.reset_mock()
+    execute.reset_mock()
+
+    # Entire query API is served by the replica
+    query = "query { bases { id } }"
+    assert_successful_request(auth0_client, query, endpoint="")
+    connect.assert_called_once()
+    execute.assert_called()
+    connect.reset_mock()
+    execute.reset_mock()
+
+    # Field name only mentioned in comment; no replica connection opened
+    query = """query {
+        # createdBoxes
+        bases { id } }"""
+    assert_successful_request(auth0_client, query)
+    connect.assert_not_called()
+    execute.assert_not_called()
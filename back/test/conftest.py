@@ -14,7 +14,9 @@ import os
 import pymysql
 import pytest
 from boxtribute_server.db import create_db_interface
+from boxtribute_server.graph_ql.document_cache import document_cache
 from boxtribute_server.models import MODELS
+from boxtribute_server.models.reference_data import reference_data_cache
 
 # Imports fixtures into tests
 from data import *  # noqa: F401,F403
@@ -60,3 +62,13 @@ def setup_testing_database(testing_database):
         create_test_data()
         testing_database.close()
     yield testing_database
+
+
+@pytest.fixture(autouse=True)
+def clear_document_cache():
+    """Avoid that cached beta-level check results leak from one test into another (e.g.
+    when the check is patched, or the user's beta-level is mocked). Likewise for cached
+    reference data that might have been modified in a rolled-back transaction.
+    """
+    document_cache.clear()
+    reference_data_cache.clear()
@@ -1,11 +1,24 @@
 import peewee
 import pytest
 from auth import mock_user_for_request
+from boxtribute_server.graph_ql.cost import CostLimits
+from boxtribute_server.graph_ql.execution import LOADER_FACTORIES
+from boxtribute_server.graph_ql.persisted_queries import (
+    PersistedQueryRegistry,
+    compute_query_hash,
+)
 from boxtribute_server.logging import API_CONTEXT, SHARED_CONTEXT, WEBAPP_CONTEXT
+from boxtribute_server.models.definitions.consistency_token import ConsistencyToken
+from boxtribute_server.models.definitions.history import DbChangeHistory
+from boxtribute_server.sql_counter import (
+    DEFAULT_N_PLUS_ONE_THRESHOLD,
+    track_sql_queries,
+)
 from utils import (
     assert_bad_request,
     assert_bad_user_input,
     assert_internal_server_error,
+    assert_max_sql_queries,
     assert_successful_request,
 )
 
@@ -512,6 +525,13 @@ def test_gcloud_logging(client, mocker):
     assert mocked_log_struct.call_args.kwargs == {"severity": "INFO"}
     call_args = mocked_log_struct.call_args.args[0]
     assert call_args.pop("execution_time") < 10
+    assert call_args.pop("data_loaders") == {
+        "used": [],
+        "available": len(LOADER_FACTORIES),
+    }
+    assert call_args.pop("query_cost") == 1
+    assert call_args.pop("sql_queries") == {"count": 1, "repeated": []}
+    assert call_args.pop("query_depth") == 2
     assert call_args == {"query": query}
     assert bases == [{"id": "1"}]
     mocked_loggers[API_CONTEXT].log_struct.assert_not_called()
@@ -527,6 +547,13 @@ def test_gcloud_logging(client, mocker):
     assert mocked_log_struct.call_args.kwargs == {"severity": "INFO"}
     call_args = mocked_log_struct.call_args.args[0]
     assert call_args.pop("execution_time") < 10
+    assert call_args.pop("data_loaders") == {
+        "used": [],
+        "available": len(LOADER_FACTORIES),
+    }
+    assert call_args.pop("query_cost") == 1
+    assert call_args.pop("sql_queries") == {"count": 1, "repeated": []}
+    assert call_args.pop("query_depth") == 2
     assert call_args == {"query": query}
     assert bases == [{"id": "1"}]
     mocked_loggers[WEBAPP_CONTEXT].log_struct.assert_not_called()
@@ -541,7 +568,172 @@ def test_gcloud_logging(client, mocker):
     mocked_log_struct = mocked_loggers[SHARED_CONTEXT].log_struct
     mocked_log_struct.assert_called_once()
     assert mocked_log_struct.call_args.kwargs == {"severity": "INFO"}
-    assert mocked_log_struct.call_args.args == ({"query": query},)
+    call_args = mocked_log_struct.call_args.args[0]
+    assert call_args.pop("data_loaders") == {
+        "used": [],
+        "available": len(LOADER_FACTORIES),
+    }
+    assert call_args.pop("query_cost") == 1
+    assert call_args.pop("sql_queries") == {"count": 1, "repeated": []}
+    # The __typename field is not taken into account
+    assert call_args.pop("query_depth") == 1
+    assert call_args == {"query": query}
     assert response == {"__typename": "UnknownLinkError"}
     mocked_loggers[WEBAPP_CONTEXT].log_struct.assert_not_called()
     mocked_loggers[API_CONTEXT].log_struct.assert_not_called()
+
+
+def test_persisted_query(client, mocker):
+    mocker.patch(
+        "boxtribute_server.routes.persisted_query_registry", PersistedQueryRegistry()
+    )
+    query = "query { bases { id } }"
+    query_hash = compute_query_hash(query)
+    extensions = {"persistedQuery": {"version": 1, "sha256Hash": query_hash}}
+
+    # Unknown hash
+    response = client.post("/graphql", json={"extensions": extensions})
+    assert response.status_code == 200
+    assert response.json == {
+        "errors": [
+            {
+                "message": "PersistedQueryNotFound",
+                "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"},
+            }
+        ]
+    }
+
+    # Hash not matching query
+    response = client.post(
+        "/graphql", json={"query": "query { bases { name } }", "extensions": extensions}
+    )
+    assert response.status_code == 400
+    assert response.json["errors"][0]["extensions"]["code"] == "BAD_REQUEST"
+
+    # Register query, then send hash only
+    for data in [
+        {"query": query, "extensions": extensions},
+        {"extensions": extensions},
+    ]:
+        response = client.post("/graphql", json=data)
+        assert response.status_code == 200
+        assert response.json["data"] == {"bases": [{"id": "1"}]}
+
+
+def test_sql_query_report(client):
+    bases = assert_max_sql_queries(client, "query { bases { id } }", 1)
+    assert bases == [{"id": "1"}]
+
+    # Query.base fetches each base with a separate statement (N+1), whereas the
+    # organisations are batch-loaded with a single statement
+    number = DEFAULT_N_PLUS_ONE_THRESHOLD + 1
+    fields = " ".join(
+        f"b{i}: base(id: 1) {{ organisation {{ id }} }}" for i in range(number)
+    )
+    response = client.post("/graphql", json={"query": f"query {{ {fields} }}"})
+    assert response.status_code == 200
+    report = response.json["extensions"]["sqlQueries"]
+    assert report["count"] == number + 1
+    [repeated] = report["repeated"]
+    assert repeated["count"] == number
+    assert "`camps`" in repeated["sql"]
+    # The batch-loaded organisations are not flagged
+    shapes = report["shapes"]
+    assert shapes.pop(repeated["sql"]) == number
+    [(shape, count)] = shapes.items()
+    assert "`organisations`" in shape
+    assert count == 1
+
+
+def test_reference_data_cache(client, monkeypatch):
+    query = """query { products(baseId: 1) { elements {
+                category { name } sizeRange { name sizes { name } units { symbol } }
+            } } }"""
+    uncached = assert_successful_request(client, query)
+
+    monkeypatch.setenv("REFERENCE_DATA_CACHE", "true")
+    with track_sql_queries() as first_counter:
+        assert assert_successful_request(client, query) == uncached
+    with track_sql_queries() as second_counter:
+        assert assert_successful_request(client, query) == uncached
+    # Categories, size ranges, sizes, size range sizes, and units are served from cache
+    assert second_counter.count == first_counter.count - 5
+
+
+def test_joined_related_resources(client, monkeypatch):
+    query = """query { boxes(baseId: 1) { elements {
+                product { name } location { name } size { label } qrCode { code }
+            } } }"""
+    with track_sql_queries() as joined_counter:
+        joined = assert_successful_request(client, query)
+
+    monkeypatch.setattr(
+        "boxtribute_server.business_logic.warehouse.box.queries.BOX_RELATIONS", {}
+    )
+    with track_sql_queries() as loaded_counter:
+        assert assert_successful_request(client, query) == joined
+    # Products, locations, sizes, and QR codes are not loaded separately
+    assert joined_counter.count == loaded_counter.count - 4
+
+
+def test_consistency_token(client, default_box):
+    query = "query { bases { id } }"
+    response = client.post("/graphql", json={"query": query})
+    assert "consistencyToken" not in response.json.get("extensions", {})
+
+    mutation = """mutation { createTag(creationInput: {
+            name: "new", color: "#ff0000", type: All, baseId: 1 }) {
+            ...on Tag { id } } }"""
+    response = client.post("/graphql", json={"query": mutation})
+    assert response.status_code == 200
+    token = response.json["extensions"]["consistencyToken"]
+    assert token == ConsistencyToken.select(peewee.fn.MAX(ConsistencyToken.id)).scalar()
+    tag_id = response.json["data"]["createTag"]["id"]
+
+    # Tag assignments are not recorded in the history but advance the token
+    nr_history_entries = DbChangeHistory.select().count()
+    mutation = f"""mutation {{ assignTag(assignmentInput: {{
+            id: {tag_id}, resourceId: {default_box["id"]}, resourceType: Box }}) {{
+            ...on Box {{ id }} }} }}"""
+    response = client.post("/graphql", json={"query": mutation})
+    assert response.status_code == 200
+    assert DbChangeHistory.select().count() == nr_history_entries
+    assert response.json["extensions"]["consistencyToken"] > token
+
+    # Without configured replica, the token has no effect (routing with a replica is
+    # tested in unit_tests/test_db.py)
+    data = {"query": query, "extensions": {"consistencyToken": token}}
+    response = client.post("/graphql", json=data)
+    assert response.json["data"] == {"bases": [{"id": "1"}]}
+
+
+@pytest.mark.parametrize(
+    "endpoint,query",
+    [
+        [
+            "",
+            """query { bases { locations { boxes(paginationInput: {first: 1000}) {
+                elements { history { id } tags { id } product { id } } } } } }""",
+        ],
+        ["", "query { bases { locations { base { locations { id } } } } }"],
+        [
+            "public",
+            """query { resolveLink(code: "abc") { ...on ResolvedLink {
+                data { ...on StockOverviewData { dimensions {
+                tag { id } category { id } location { id } size { id } } } }
+            } } }""",
+        ],
+    ],
+)
+def test_query_exceeding_cost_limits(client, mocker, endpoint, query):
+    mocker.patch(
+        "boxtribute_server.routes.QUERY_API_COST_LIMITS",
+        CostLimits(max_cost=50_000, max_depth=4),
+    )
+    mocker.patch(
+        "boxtribute_server.routes.PUBLIC_API_COST_LIMITS",
+        CostLimits(max_cost=200, max_depth=8),
+    )
+    response = assert_bad_request(client, query, endpoint=endpoint, expect_errors=True)
+    assert response.json["errors"][0]["extensions"]["code"] == "BAD_USER_INPUT"
+    assert "data" not in response.json
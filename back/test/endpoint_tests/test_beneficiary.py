@@ -11,7 +11,11 @@ from boxtribute_server.models.utils import (
     HISTORY_DELETION_MESSAGE,
     compute_age,
 )
-from utils import assert_internal_server_error, assert_successful_request
+from utils import (
+    assert_internal_server_error,
+    assert_max_sql_queries,
+    assert_successful_request,
+)
 
 
 def _generate_beneficiary_query(id):
@@ -642,3 +646,16 @@ def test_beneficiaries_filtered_query(client, filters, number):
             if name in f:
                 value = f[name] == "true"
                 assert [b[name] for b in beneficiaries] == number * [value]
+
+
+def test_beneficiaries_query_batches_nested_fields(client):
+    query = """query { beneficiaries { elements {
+                tags { id }
+                tokens
+                languages
+                transactions { id }
+            } } }"""
+    # One statement for the page elements, and one per nested field, regardless of the
+    # number of beneficiaries
+    beneficiaries = assert_max_sql_queries(client, query, 5)["elements"]
+    assert len(beneficiaries) > 1
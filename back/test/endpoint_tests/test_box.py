@@ -5,6 +5,7 @@ import pytest
 from auth import mock_user_for_request
 from boxtribute_server.enums import BoxState, TagType
 from boxtribute_server.models.definitions.history import DbChangeHistory
+from boxtribute_server.models.definitions.history_message import HistoryMessage
 from boxtribute_server.models.utils import (
     HISTORY_CREATION_MESSAGE,
     HISTORY_DELETION_MESSAGE,
@@ -166,6 +167,40 @@ def test_boxes_query(client, default_location_boxes):
     assert boxes == {"totalCount": 3}
 
 
+def test_boxes_query_pagination(client, default_location_boxes):
+    base_id = 1
+    query = f"""query {{ boxes(baseId: {base_id}) {{
+                elements {{ id lastModifiedOn }} }} }}"""
+    all_boxes = assert_successful_request(client, query)["elements"]
+    assert len(all_boxes) == len(default_location_boxes)
+
+    # Page through boxes ordered by modification date; the cursor includes the date,
+    # hence no box is skipped or repeated
+    after = ""
+    forward_boxes = []
+    while True:
+        query = f"""query {{ boxes(baseId: {base_id},
+                    paginationInput: {{ first: 3 {after} }}) {{
+                    elements {{ id lastModifiedOn }}
+                    pageInfo {{ hasNextPage endCursor }} }} }}"""
+        page = assert_successful_request(client, query)
+        forward_boxes.extend(page["elements"])
+        if not page["pageInfo"]["hasNextPage"]:
+            break
+        after = f'after: "{page["pageInfo"]["endCursor"]}"'
+    assert forward_boxes == all_boxes
+
+    # The end cursor of the final page points to the last box
+    before = page["pageInfo"]["endCursor"]
+    query = f"""query {{ boxes(baseId: {base_id},
+                paginationInput: {{ last: 2, before: "{before}" }}) {{
+                elements {{ id lastModifiedOn }}
+                pageInfo {{ hasPreviousPage hasNextPage }} }} }}"""
+    page = assert_successful_request(client, query)
+    assert page["elements"] == all_boxes[-3:-1]
+    assert page["pageInfo"] == {"hasPreviousPage": True, "hasNextPage": True}
+
+
 def test_box_mutations(
     client,
     default_box,
@@ -2241,6 +2276,42 @@ def test_box_with_large_history(
                 {{ history {{ changeDate changes }} }} }}"""
         assert_successful_request(client, mutation)
 
+    label_identifier = box["labelIdentifier"]
+    query = f"""query {{ box(labelIdentifier: "{label_identifier}") {{
+                history {{ id changes }} }} }}"""
+    history = assert_successful_request(client, query)["history"]
+    assert len(history) == 60
+
+    query = f"""query {{ box(labelIdentifier: "{label_identifier}") {{
+                history(first: 5) {{ id changes }} }} }}"""
+    first_page = assert_successful_request(client, query)["history"]
+    assert first_page == history[:5]
+
+    query = f"""query {{ box(labelIdentifier: "{label_identifier}") {{
+                history(first: 5, after: "{first_page[-1]["id"]}") {{ id }} }} }}"""
+    second_page = assert_successful_request(client, query)["history"]
+    assert second_page == [{"id": entry["id"]} for entry in history[5:10]]
+
+    query = f"""query {{ box(labelIdentifier: "{label_identifier}") {{
+                history(after: "{history[-2]["id"]}") {{ changes }} }} }}"""
+    last_page = assert_successful_request(client, query)["history"]
+    assert last_page == [{"changes": "created box"}]
+
+    query = f"""query {{ box(labelIdentifier: "{label_identifier}") {{
+                history(first: -1) {{ id }} }} }}"""
+    assert_bad_user_input(client, query)
+
+    # Messages are stored when writing the history entries
+    stored_messages = (
+        HistoryMessage.select(HistoryMessage.message)
+        .join(DbChangeHistory)
+        .where(DbChangeHistory.id << [int(entry["id"]) for entry in history])
+        .order_by(DbChangeHistory.id.desc())
+    )
+    assert [{"changes": m.message} for m in stored_messages] == [
+        {"changes": entry["changes"]} for entry in history
+    ]
+
 
 def test_mutate_box_with_invalid_location_or_product(
     client,
@@ -4,7 +4,7 @@ from boxtribute_server.business_logic.warehouse.location.crud import (
     update_location,
 )
 from boxtribute_server.enums import BoxState
-from utils import assert_successful_request
+from utils import assert_max_sql_queries, assert_successful_request
 
 
 def test_location_query(
@@ -61,6 +61,32 @@ def test_locations_query(client, base1_classic_locations):
     assert locations == [{"name": loc["name"]} for loc in base1_classic_locations]
 
 
+def test_locations_boxes_query(client, default_location, default_location_boxes):
+    query = """query { locations {
+                id
+                boxes(paginationInput: {first: 2}) {
+                    totalCount
+                    elements { id }
+                    pageInfo { hasNextPage hasPreviousPage }
+                } } }"""
+    # One statement for the locations, one for the first pages of boxes of all
+    # locations, and one for the total counts of all locations
+    locations = assert_max_sql_queries(client, query, 3)
+    assert len(locations) > 1
+    for location in locations:
+        boxes = location["boxes"]
+        assert len(boxes["elements"]) <= 2
+        assert boxes["pageInfo"] == {
+            "hasNextPage": boxes["totalCount"] > 2,
+            "hasPreviousPage": False,
+        }
+        if location["id"] == str(default_location["id"]):
+            assert boxes["totalCount"] == len(default_location_boxes)
+            assert boxes["elements"] == [
+                {"id": str(b["id"])} for b in default_location_boxes[:2]
+            ]
+
+
 def test_crud(client, default_base):
     from flask import g
 
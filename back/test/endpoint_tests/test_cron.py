@@ -13,11 +13,13 @@ from utils import assert_successful_request
 reseed_db_path = f"{CRON_PATH}/reseed-db"
 housekeeping_path = f"{CRON_PATH}/housekeeping"
 internal_stats_path = f"{CRON_PATH}/internal-stats"
+refresh_statistics_path = f"{CRON_PATH}/refresh-statistics"
 headers = [("X-AppEngine-Cron", "true")]
 
 
 @pytest.mark.parametrize(
-    "url", [reseed_db_path, housekeeping_path, internal_stats_path]
+    "url",
+    [reseed_db_path, housekeeping_path, internal_stats_path, refresh_statistics_path],
 )
 def test_cron_job_endpoint_errors(client, monkeypatch, url):
     monkeypatch.setenv("MYSQL_DB", "dropapp_dev")
@@ -55,6 +57,19 @@ def test_housekeeping(client, mocker, default_users):
     assert response == {"email": user["email"]}
 
 
+def test_refresh_statistics(client):
+    response = client.get(refresh_statistics_path, headers=headers)
+    assert response.status_code == 200
+    message = response.json["message"]
+    assert message.startswith("refreshed statistics of ")
+    assert message != "refreshed statistics of 0 bases"
+
+    # Nothing changed since the previous refresh
+    response = client.get(refresh_statistics_path, headers=headers)
+    assert response.status_code == 200
+    assert response.json == {"message": "refreshed statistics of 0 bases"}
+
+
 @pytest.mark.skipif(
     not os.getenv("AUTH0_MANAGEMENT_API_CLIENT_SECRET"),
     reason="AUTH0_MANAGEMENT_API_CLIENT_SECRET not set",
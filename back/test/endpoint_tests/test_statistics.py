@@ -6,6 +6,9 @@ from boxtribute_server.business_logic.statistics.crud import (
     get_data_for_number_of_moved_boxes,
     number_of_boxes_moved_between,
 )
+from boxtribute_server.business_logic.statistics.sql import MOVED_BOXES_QUERY
+from boxtribute_server.cron.statistics import refresh_statistics
+from boxtribute_server.db import execute_sql
 from boxtribute_server.enums import (
     BeneficiaryReachType,
     BoxState,
@@ -13,9 +16,10 @@ from boxtribute_server.enums import (
     ProductGender,
     TargetType,
 )
+from boxtribute_server.models.definitions.base import Base
 from boxtribute_server.models.definitions.box import Box
 from boxtribute_server.models.definitions.location import Location
-from boxtribute_server.models.utils import compute_age
+from boxtribute_server.models.utils import compute_age, convert_ids
 from utils import assert_forbidden_request, assert_successful_request
 
 
@@ -992,3 +996,106 @@ def test_statistics_after_create_box_from_box(
     assert moved_box_facts[0]["boxesCount"] == 2
     assert moved_box_facts[0]["itemsCount"] == 2 * new_box_items
     assert moved_box_facts[0]["gender"] == product_gender
+
+
+def test_materialized_statistics(client, monkeypatch, default_box, tags):
+    queries = {
+        "beneficiaryDemographics": """query { beneficiaryDemographics(baseId: 1) {
+            facts { gender age createdOn deletedOn count tagIds }
+            dimensions { tag { id } } } }""",
+        "createdBoxes": """query { createdBoxes(baseId: 1) {
+            facts { createdOn categoryId productId gender boxesCount itemsCount tagIds }
+            dimensions { product { id } category { id } tag { id } } } }""",
+        "topProductsDonated": """query { topProductsDonated(baseId: 1) {
+            facts { createdOn donatedOn sizeId productId categoryId rank itemsCount }
+            dimensions { product { id } size { id } } } }""",
+        "stockOverview": """query { stockOverview(baseId: 1) {
+            facts { categoryId productName gender sizeId locationId boxState tagIds
+                absoluteMeasureValue dimensionId itemsCount boxesCount }
+            dimensions { location { id } dimension { id } tag { id } } } }""",
+    }
+
+    def query_statistics():
+        results = {}
+        for name, query in queries.items():
+            data = assert_successful_request(client, query, endpoint="graphql")
+            data["facts"] = sorted(data["facts"], key=repr)
+            results[name] = data
+        return results
+
+    def assert_parity():
+        monkeypatch.delenv("STATISTICS_STORE", raising=False)
+        computed = query_statistics()
+        monkeypatch.setenv("STATISTICS_STORE", "true")
+        assert query_statistics() == computed
+
+    # Initial refresh materializes all non-deleted bases
+    base_ids = refresh_statistics()
+    assert 1 in base_ids
+    assert_parity()
+    assert refresh_statistics() == []
+
+    # Assigning a tag is not recorded in the history but must trigger a refresh
+    tag_id = str(tags[5]["id"])
+    mutation = f"""mutation {{ assignTag(assignmentInput: {{
+            id: {tag_id}, resourceId: {default_box['id']}, resourceType: Box
+        }} ) {{ ...on Box {{ tags {{ id }} }} }} }}"""
+    assert_successful_request(client, mutation)
+    assert refresh_statistics() == [1]
+    assert_parity()
+
+    mutation = f"""mutation {{ updateBox( updateInput: {{
+        labelIdentifier: "{default_box['label_identifier']}", numberOfItems: 1
+    }} ) {{ numberOfItems }} }}"""
+    assert_successful_request(client, mutation)
+    assert refresh_statistics() == [1]
+    assert_parity()
+
+
+def test_moved_boxes_history_replay(
+    client, default_box, default_location, non_default_box_state_location
+):
+    # Move the box to a Donated location and back, change its number of items, and
+    # eventually delete it
+    label_identifier = default_box["label_identifier"]
+    for update in [
+        f"locationId: {non_default_box_state_location['id']}",
+        "numberOfItems: 3",
+        f"locationId: {default_location['id']}",
+        f"locationId: {non_default_box_state_location['id']}",
+    ]:
+        mutation = f"""mutation {{ updateBox( updateInput: {{
+            labelIdentifier: "{label_identifier}", {update} }} ) {{ id }} }}"""
+        assert_successful_request(client, mutation)
+    mutation = f"""mutation {{ deleteBoxes(labelIdentifiers: ["{label_identifier}"]) {{
+            ...on BoxesResult {{ updatedBoxes {{ id }} }} }} }}"""
+    assert_successful_request(client, mutation)
+
+    def normalize(facts):
+        for fact in facts:
+            for field in ["boxes_count", "items_count"]:
+                if fact[field] is not None:
+                    fact[field] = int(fact[field])
+        return sorted(facts, key=repr)
+
+    base_ids = [b.id for b in Base.select(Base.id)]
+    expected_facts = execute_sql(
+        base_ids,
+        1,
+        TargetType.BoxState.name,
+        TargetType.BoxState.name,
+        TargetType.OutgoingLocation.name,
+        TargetType.OutgoingLocation.name,
+        TargetType.OutgoingShipment.name,
+        base_ids,
+        TargetType.IncomingShipment.name,
+        base_ids,
+        TargetType.BoxState.name,
+        base_ids,
+        query=MOVED_BOXES_QUERY,
+    )
+    for fact in expected_facts:
+        fact["tag_ids"] = convert_ids(fact["tag_ids"])
+    facts = compute_moved_boxes(*base_ids).facts
+    assert normalize(facts) == normalize(expected_facts)
+    assert any(f["target_id"] == "Deleted" for f in facts)
@@ -10,8 +10,11 @@ from boxtribute_server.cli.service import Auth0Service, _user_data_without_base_
 from boxtribute_server.db import execute_sql
 from boxtribute_server.exceptions import ServiceError
 from boxtribute_server.models.definitions.base import Base
+from boxtribute_server.models.definitions.history import DbChangeHistory
+from boxtribute_server.models.definitions.history_message import HistoryMessage
 from boxtribute_server.models.definitions.organisation import Organisation
 from boxtribute_server.models.definitions.user import User
+from boxtribute_server.models.history_messages import backfill_box_history_messages
 
 
 class MockItem:
@@ -447,3 +450,18 @@ def test_remove_base_access_without_force(usergroup_tables):
     deleted_users = User.select().where(User.deleted.is_null(False)).count()
     remove_base_access(base_id=base_id, service=service, force=False)
     assert deleted_users == User.select().where(User.deleted.is_null(False)).count()
+
+
+def test_backfill_history_messages(setup_testing_database):
+    box_history = DbChangeHistory.select().where(DbChangeHistory.table_name == "stock")
+    with setup_testing_database.atomic() as transaction:
+        # Entries of other tables (e.g. of beneficiaries) are skipped
+        assert backfill_box_history_messages(batch_size=10) == box_history.count()
+        messages = {m.history_id: m.message for m in HistoryMessage.select()}
+        assert sorted(messages) == sorted(entry.id for entry in box_history)
+        assert messages[1] == "created box"
+        assert messages[111] == "changed box state from InStock to Lost"
+
+        # Entries with stored messages are not processed again
+        assert backfill_box_history_messages() == 0
+        transaction.rollback()
@@ -1,6 +1,17 @@
+import time
+
+import jwt
 import pytest
-from boxtribute_server.auth import get_token_from_auth_header
+from auth import _create_jwt_payload
+from boxtribute_server.auth import (
+    VerifiedTokenCache,
+    get_token_from_auth_header,
+    requires_auth,
+)
 from boxtribute_server.exceptions import AuthenticationFailed
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from flask import Flask, g
 
 
 def test_get_invalid_jwt_no_auth_header():
@@ -21,3 +32,66 @@ def test_get_invalid_jwt_bearer_no_token():
 def test_get_invalid_jwt_bearer_with_additonal_data():
     with pytest.raises(AuthenticationFailed):
         get_token_from_auth_header("bearer token additional")
+
+
+def test_verified_token_cache(monkeypatch):
+    cache = VerifiedTokenCache()
+    now = time.time()
+    cache.put("a", "user_a", {"exp": now + 60})
+    cache.put("b", "user_b", {"exp": now + 60})
+    # Tokens without expiration time, or expired ones are not cached
+    cache.put("c", "user_c", {})
+    cache.put("d", "user_d", {"exp": now - 1})
+    assert cache.get("a") == ("user_a", {"exp": now + 60})
+    assert cache.get("c") is None
+    assert cache.get("d") is None
+    assert cache.info() == {"hits": 1, "misses": 2, "size": 2}
+
+    # The least recently used entry is evicted
+    monkeypatch.setenv("AUTH_TOKEN_CACHE_SIZE", "2")
+    cache.put("e", "user_e", {"exp": now + 60})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    # Entries are dropped when the token expires
+    monkeypatch.setattr("time.time", lambda: now + 61)
+    assert cache.get("a") is None
+    assert cache.info()["size"] == 1
+
+    monkeypatch.setenv("AUTH_TOKEN_CACHE_SIZE", "0")
+    cache.put("f", "user_f", {"exp": now + 120})
+    assert cache.get("f") is None
+
+    cache.clear()
+    assert cache.info() == {"hits": 0, "misses": 0, "size": 0}
+
+
+def test_requires_auth_caches_verified_token(monkeypatch, mocker):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_key = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    monkeypatch.setenv("AUTH0_PUBLIC_KEY", public_key.decode())
+    monkeypatch.setenv("AUTH0_DOMAIN", "auth.example.org")
+    monkeypatch.setenv("AUTH0_AUDIENCE", "api")
+    cache = VerifiedTokenCache()
+    monkeypatch.setattr("boxtribute_server.auth.verified_token_cache", cache)
+    decode = mocker.spy(jwt, "decode")
+
+    payload = _create_jwt_payload(user_id=3)
+    payload.update(
+        aud="api", iss="https://auth.example.org/", exp=int(time.time()) + 60
+    )
+    token = jwt.encode(payload, private_key, algorithm="RS256")
+    endpoint = requires_auth(lambda: g.user)
+
+    app = Flask(__name__)
+    users = []
+    for _ in range(3):
+        headers = {"Authorization": f"Bearer {token}"}
+        with app.test_request_context(headers=headers):
+            users.append(endpoint())
+    assert [u.id for u in users] == [3, 3, 3]
+    assert users[0] is users[2]
+    assert decode.call_count == 1
+    assert cache.info() == {"hits": 2, "misses": 1, "size": 1}
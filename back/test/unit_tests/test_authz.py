@@ -13,6 +13,7 @@ from boxtribute_server.authz import (
     authorize_cross_organisation_access,
     check_user_beta_level,
     handle_unauthorized,
+    is_authorized,
 )
 from boxtribute_server.business_logic.statistics import statistics_queries
 from boxtribute_server.exceptions import AuthenticationFailed, Forbidden
@@ -152,6 +153,40 @@ def test_user_with_insufficient_permissions():
         authorize(user, permission="product_category:read")
 
 
+def test_is_authorized():
+    user = CurrentUser(
+        id=3,
+        organisation_id=2,
+        base_ids={"beneficiary:create": [2, "3"], "stock:write": [], "qr:read": [1]},
+    )
+    assert user.authorized_base_ids("beneficiary:create") == frozenset({2, 3})
+    assert is_authorized(user, permission="beneficiary:create", base_id=2)
+    assert is_authorized(user, permission="beneficiary:create", base_id="3")
+    assert is_authorized(user, permission="beneficiary:create", base_ids=[1, 3])
+    assert is_authorized(user, permission="qr:read")
+    assert is_authorized(user, organisation_id=2)
+    assert is_authorized(user, user_id=3)
+    assert not is_authorized(user, permission="beneficiary:create", base_id=1)
+    assert not is_authorized(user, permission="beneficiary:create", base_ids=[1, 4])
+    assert not is_authorized(user, permission="stock:write", base_id=1)
+    assert not is_authorized(user, permission="product:read", base_id=2)
+    assert not is_authorized(user, permission="product_category:read")
+    assert not is_authorized(user, organisation_ids=[1])
+    with pytest.raises(ValueError):
+        is_authorized(user, permission="beneficiary:create")
+    with pytest.raises(ValueError):
+        is_authorized(user)
+
+    god_user = CurrentUser(id=0, organisation_id=0, is_god=True)
+    assert is_authorized(god_user, permission="product:read", base_id=1)
+
+    assert user.to_dict()["base_ids"] == {
+        "beneficiary:create": [2, 3],
+        "stock:write": [],
+        "qr:read": [1],
+    }
+
+
 def test_invalid_authorize_function_call():
     user = CurrentUser(id=3, organisation_id=2, base_ids={"beneficiary:create": [2]})
     with pytest.raises(ValueError):
@@ -0,0 +1,79 @@
+import graphql
+import pytest
+from boxtribute_server.graph_ql.cost import (
+    DEFAULT_LIST_SIZE,
+    CostLimits,
+    analyze_query_cost,
+    check_cost_limits,
+)
+from boxtribute_server.graph_ql.pagination import DEFAULT_PAGINATION_LIMIT
+from boxtribute_server.graph_ql.schema import public_api_schema, query_api_schema
+
+
+@pytest.mark.parametrize(
+    "query,variables,cost,depth",
+    [
+        ["query { bases { id name } }", None, 1, 2],
+        ["query { __schema { types { name fields { name } } } }", None, 0, 0],
+        [
+            "query { bases { locations { id } } }",
+            None,
+            1 + DEFAULT_LIST_SIZE * 1,
+            3,
+        ],
+        [
+            "query { boxes(baseId: 1) { totalCount elements { product { id } } } }",
+            None,
+            1 + DEFAULT_PAGINATION_LIMIT * (1 + 1),
+            4,
+        ],
+        [
+            """query Boxes($first: Int) {
+            boxes(baseId: 1, paginationInput: {first: $first}) {
+                elements { ...BoxFields } } }
+            fragment BoxFields on Box { history { id } tags { id } }""",
+            {"first": 1000},
+            1 + 1000 * (1 + 5 + 1),
+            4,
+        ],
+        [
+            """query { boxes(
+                baseId: 1, paginationInput: {last: 2, before: "MDAwMDAwMDE="}
+            ) { elements { product { id } } } }""",
+            None,
+            1 + 2 * (1 + 1),
+            4,
+        ],
+    ],
+)
+def test_analyze_query_cost(query, variables, cost, depth):
+    document = graphql.parse(query)
+    assert not graphql.validate(query_api_schema, document)
+    assert analyze_query_cost(
+        schema=query_api_schema, document=document, variables=variables
+    ) == (cost, depth)
+
+
+def test_analyze_query_cost_for_public_api():
+    query = """query { resolveLink(code: "abc") {
+        ...on ResolvedLink { data { ...on StockOverviewData { facts { boxesCount } } } }
+    } }"""
+    document = graphql.parse(query)
+    # resolveLink + data (weight 200) + list of data cubes * facts
+    assert analyze_query_cost(schema=public_api_schema, document=document) == (
+        1 + 200 + DEFAULT_LIST_SIZE * 1,
+        4,
+    )
+
+
+def test_check_cost_limits():
+    assert check_cost_limits(cost=100, depth=10, limits=None) == []
+    limits = CostLimits(max_cost=100, max_depth=10)
+    assert check_cost_limits(cost=100, depth=10, limits=limits) == []
+
+    [error] = check_cost_limits(cost=101, depth=10, limits=limits)
+    assert error.extensions["code"] == "BAD_USER_INPUT"
+    assert "cost (101)" in error.message
+
+    [error] = check_cost_limits(cost=1, depth=11, limits=limits)
+    assert "depth (11)" in error.message
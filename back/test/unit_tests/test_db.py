@@ -1,12 +1,27 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ariadne
 import pytest
 from boxtribute_server.app import create_app
 from boxtribute_server.db import (
     DatabaseManager,
+    DatabaseRouter,
+    PooledDatabase,
+    connection_pool_options,
     create_db_interface,
     current_database,
+    db,
     execute_sql,
 )
+from boxtribute_server.graph_ql.execution import execute_async
+from boxtribute_server.models.definitions.consistency_token import ConsistencyToken
 from boxtribute_server.routes import api_bp
+from boxtribute_server.sql_counter import SqlQueryCountingMixin
+from flask import current_app
+from peewee import CharField, Model, SqliteDatabase
 
 
 @pytest.mark.parametrize(
@@ -41,3 +56,235 @@ def test_uninitialized_database_manager():
     with app.test_request_context(method="POST", json={"query": "foo"}):
         with pytest.raises(RuntimeError, match="database not set"):
             manager.connect_db()
+
+
+def test_connection_pool_options(monkeypatch):
+    monkeypatch.delenv("MYSQL_CONNECTION_POOL", raising=False)
+    assert connection_pool_options() is None
+
+    monkeypatch.setenv("MYSQL_CONNECTION_POOL", "true")
+    monkeypatch.setenv("MYSQL_POOL_MAX_CONNECTIONS", "3")
+    monkeypatch.setenv("MYSQL_POOL_HEALTH_CHECK", "false")
+    assert connection_pool_options() == {
+        "max_connections": 3,
+        "stale_timeout": 300,
+        "timeout": 10,
+        "health_check": False,
+    }
+
+
+def test_pooled_database(mocker):
+    connect = mocker.patch("peewee.mysql.connect")
+    connect.return_value.server_version = "8.0.0"
+    database = create_db_interface(
+        user="db-user",
+        password="secret",
+        database="db",
+        pool_options={"max_connections": 1, "timeout": 0.1, "stale_timeout": 300},
+    )
+    assert isinstance(database, PooledDatabase)
+
+    database.connect()
+    assert database.stats() == {
+        "in_use": 1,
+        "available": 0,
+        "max_connections": 1,
+        "checkouts": 1,
+        "waits": 0,
+        "recycled": 0,
+    }
+    # All connections in use; checkout from another thread times out
+    thread = threading.Thread(target=lambda: pytest.raises(Exception, database.connect))
+    thread.start()
+    thread.join()
+    database.close()
+    assert database.stats()["waits"] == 1
+
+    # Connection is returned to the pool and re-used
+    database.connect()
+    database.close()
+    assert connect.call_count == 1
+    assert database.stats() == {
+        "in_use": 0,
+        "available": 1,
+        "max_connections": 1,
+        "checkouts": 2,
+        "waits": 1,
+        "recycled": 0,
+    }
+
+    # Broken connection fails the health check and is replaced
+    connect.return_value.ping.side_effect = OSError
+    database.connect()
+    database.close()
+    assert connect.call_count == 2
+    assert database.stats()["recycled"] == 1
+
+
+def test_database_router_under_concurrency(tmp_path):
+    class Record(Model):
+        origin = CharField()
+
+    primary = SqliteDatabase(tmp_path / "primary.db", pragmas={"busy_timeout": 10000})
+    replica = SqliteDatabase(tmp_path / "replica.db")
+    replica.bind([Record])
+    replica.create_tables([Record])
+    Record.create(origin="replica")
+    primary.bind([Record])
+    primary.create_tables([Record])
+
+    router = DatabaseRouter()
+    router.initialize(primary)
+    router.bind([Record])
+    assert Record._meta.database.target is primary
+
+    def write(i):
+        Record.create(origin=f"primary-{i}")
+        return Record._meta.database.target
+
+    def read(_):
+        with router.use(replica):
+            origins = [r.origin for r in Record.select()]
+            # Give other threads the chance to write in between
+            time.sleep(0.001)
+            origins += [r.origin for r in Record.select()]
+            return origins
+
+    number = 200
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [
+            executor.submit(read if i % 2 else write, i) for i in range(2 * number)
+        ]
+        results = [f.result() for f in futures]
+
+    assert all(r is primary for r in results[::2])
+    assert all(r == ["replica", "replica"] for r in results[1::2])
+    assert Record.select().count() == number
+
+    async def read_async():
+        with router.use(replica):
+            await asyncio.sleep(0)
+            return [r.origin for r in Record.select()]
+
+    async def write_async(i):
+        await asyncio.sleep(0)
+        Record.create(origin=f"async-{i}")
+        return Record._meta.database.target
+
+    async def interleave():
+        return await asyncio.gather(
+            *[read_async() if i % 2 else write_async(i) for i in range(100)]
+        )
+
+    results = asyncio.run(interleave())
+    assert all(r is primary for r in results[::2])
+    assert all(r == ["replica"] for r in results[1::2])
+    with router.use(replica):
+        assert Record.select().count() == 1
+    assert Record.select().count() == number + 50
+
+
+def test_replica_consistency(mocker):
+    log = mocker.patch("boxtribute_server.db.add_fields_to_request_log")
+    manager = DatabaseManager()
+    manager.database = SqliteDatabase(":memory:")
+    manager.replica = SqliteDatabase(":memory:")
+    manager.router.initialize(manager.database)
+    for database in [manager.database, manager.replica]:
+        database.execute_sql("CREATE TABLE consistency_tokens (id INTEGER PRIMARY KEY)")
+
+    # Every call advances the token, older tokens are removed
+    assert [manager.consistency_token() for _ in range(3)] == [1, 2, 3]
+    cursor = manager.database.execute_sql("SELECT id FROM consistency_tokens")
+    assert cursor.fetchall() == [(3,)]
+    token = 3
+    manager.replica.execute_sql("INSERT INTO consistency_tokens (id) VALUES (1)")
+
+    # Replica lags behind: fall back to primary
+    with manager.require_consistency(token):
+        for _ in range(2):
+            with manager.use_replica():
+                assert manager.router.target is manager.database
+    log.assert_called_once_with(replica_lag={"tokens": 2, "fallback": True})
+    log.reset_mock()
+
+    # Replica caught up
+    manager.replica.execute_sql("INSERT INTO consistency_tokens (id) VALUES (3)")
+    with manager.require_consistency(token):
+        with manager.use_replica():
+            assert manager.router.target is manager.replica
+    log.assert_called_once_with(replica_lag={"tokens": 0, "fallback": False})
+
+    # No token sent
+    with manager.use_replica():
+        assert manager.router.target is manager.replica
+
+
+class CountingSqliteDatabase(SqlQueryCountingMixin, SqliteDatabase):
+    pass
+
+
+class Origin(Model):
+    name = CharField()
+
+
+@pytest.fixture
+def replicated_schema(monkeypatch):
+    """Executable schema with a query that reads from the database replica, and a
+    mutation that writes without creating a history entry. The global DatabaseManager
+    is set up with a primary and a replica database.
+    """
+    type_defs = """
+        type Query { origin: String! }
+        type Mutation { createOrigin(name: String!): String! }
+    """
+    query = ariadne.QueryType()
+    mutation = ariadne.MutationType()
+    query.set_field("origin", lambda *_: Origin.get().name)
+    mutation.set_field("createOrigin", lambda *_, name: Origin.create(name=name).name)
+
+    primary = CountingSqliteDatabase(":memory:")
+    replica = SqliteDatabase(":memory:")
+    for database in [primary, replica]:
+        database.bind([Origin, ConsistencyToken])
+        database.create_tables([Origin, ConsistencyToken])
+    Origin.insert(name="replica").execute(replica)
+    monkeypatch.setattr(db, "database", primary)
+    monkeypatch.setattr(db, "replica", replica)
+    monkeypatch.setattr(db.router, "obj", primary)
+    db.router.bind([Origin, ConsistencyToken])
+
+    app = create_app()
+    with app.app_context():
+        yield ariadne.make_executable_schema(type_defs, query, mutation)
+
+
+def _execute(schema, data):
+    with current_app.test_request_context(method="POST", json=data):
+        response, _ = execute_async(schema=schema, data=data, replica_fields={"origin"})
+    return response.json
+
+
+def test_request_with_consistency_token_falls_back_to_primary(replicated_schema):
+    mutation = 'mutation { createOrigin(name: "primary") }'
+    response = _execute(replicated_schema, {"query": mutation})
+    token = response["extensions"]["consistencyToken"]
+    assert token == 1
+
+    # Replica hasn't applied the write yet
+    data = {"query": "query { origin }", "extensions": {"consistencyToken": token}}
+    assert _execute(replicated_schema, data)["data"] == {"origin": "primary"}
+
+
+def test_request_with_consistency_token_uses_caught_up_replica(replicated_schema):
+    mutation = 'mutation { createOrigin(name: "primary") }'
+    response = _execute(replicated_schema, {"query": mutation})
+    token = response["extensions"]["consistencyToken"]
+    db.replica.execute_sql(f"INSERT INTO consistency_tokens (id) VALUES ({token})")
+
+    data = {"query": "query { origin }", "extensions": {"consistencyToken": token}}
+    assert _execute(replicated_schema, data)["data"] == {"origin": "replica"}
+    # Reads don't advance the token
+    assert "extensions" not in _execute(
+        replicated_schema, {"query": "query { origin }"}
+    )
@@ -0,0 +1,175 @@
+import asyncio
+import contextlib
+import threading
+
+import graphql
+import pytest
+from boxtribute_server.app import create_app
+from boxtribute_server.auth import CurrentUser
+from boxtribute_server.graph_ql import execution
+from boxtribute_server.graph_ql.document_cache import DocumentCache
+from boxtribute_server.graph_ql.execution import (
+    LOADER_FACTORIES,
+    create_cached_query_handlers,
+    is_read_only_operation,
+    run_coroutine,
+)
+from boxtribute_server.graph_ql.loaders import BoxLoader, DataLoaderRegistry
+from boxtribute_server.graph_ql.schema import full_api_schema, query_api_schema
+from flask import g
+
+
+async def _current_loop():
+    return asyncio.get_running_loop()
+
+
+def test_run_coroutine_with_persistent_loop():
+    first_loop = run_coroutine(_current_loop(), persistent_loop=True)
+    second_loop = run_coroutine(_current_loop(), persistent_loop=True)
+    assert first_loop is second_loop
+    assert not first_loop.is_closed()
+
+    # Every thread has its own event loop
+    loops = []
+
+    def run_in_thread():
+        loops.append(run_coroutine(_current_loop(), persistent_loop=True))
+
+    thread = threading.Thread(target=run_in_thread)
+    thread.start()
+    thread.join()
+    assert loops[0] is not first_loop
+
+    # Pending tasks are not carried over to the next run
+    async def spawn_task():
+        asyncio.get_running_loop().create_task(asyncio.sleep(10))
+
+    run_coroutine(spawn_task(), persistent_loop=True)
+    assert not asyncio.all_tasks(first_loop)
+
+
+def test_run_coroutine_with_fresh_loop():
+    first_loop = run_coroutine(_current_loop(), persistent_loop=False)
+    second_loop = run_coroutine(_current_loop(), persistent_loop=False)
+    assert first_loop is not second_loop
+    assert first_loop.is_closed()
+
+
+def test_document_cache():
+    cache = DocumentCache(max_size=2)
+    query = "query { base(id: 1) { name } }"
+    entry = cache.get(schema=full_api_schema, query=query, introspection=False)
+    assert cache.get(schema=full_api_schema, query=query, introspection=False) is entry
+    assert cache.info() == {"hits": 1, "misses": 1, "size": 1, "max_size": 2}
+
+    # Different schema or introspection setting results in separate entries
+    cache.get(schema=query_api_schema, query=query, introspection=False)
+    cache.get(schema=full_api_schema, query=query, introspection=True)
+    assert cache.info() == {"hits": 1, "misses": 3, "size": 2, "max_size": 2}
+    # Least recently used entry has been evicted
+    assert cache.get(schema=full_api_schema, query=query, introspection=False) is not (
+        entry
+    )
+
+    with pytest.raises(graphql.GraphQLError):
+        cache.get(schema=full_api_schema, query="query {", introspection=False)
+
+    cache.clear()
+    assert cache.info() == {"hits": 0, "misses": 0, "size": 0, "max_size": 2}
+
+
+def test_cached_query_handlers(mocker):
+    app = create_app()
+    query = "mutation { createTag { id } }"
+    validate = mocker.spy(graphql, "validate")
+    beta_level_check = mocker.spy(execution, "check_user_beta_level")
+
+    with app.app_context():
+        for max_beta_level, authzed in [(0, False), (0, False), (5, True)]:
+            g.user = CurrentUser(id=1, organisation_id=1, max_beta_level=max_beta_level)
+            parse, validate_query = create_cached_query_handlers(
+                schema=full_api_schema, introspection=False, check_beta_level=True
+            )
+            if authzed:
+                document = parse(None, {"query": query})
+            else:
+                with pytest.raises(graphql.GraphQLError, match="beta-level"):
+                    parse(None, {"query": query})
+        assert beta_level_check.call_count == 2
+
+        for _ in range(2):
+            errors = validate_query(full_api_schema, document)
+        assert len(errors) == 1
+        assert validate.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "query,operation_name,read_only",
+    [
+        ["query { a b }", None, True],
+        ["{ a __typename }", None, True],
+        ["query { a c }", None, False],
+        ["mutation { a }", None, False],
+        ["query { ...F } fragment F on Query { a }", None, True],
+        ["query { ...F } fragment F on Query { c }", None, False],
+        ["query { ... on Query { b } }", None, True],
+        ["query { ... on Query { c } }", None, False],
+        ['query { a(text: "c") } # c', None, True],
+        ["query A { a } query C { c }", "A", True],
+        ["query A { a } query C { c }", "C", False],
+        ["query A { a } query C { c }", "D", False],
+    ],
+)
+def test_is_read_only_operation(query, operation_name, read_only):
+    document = graphql.parse(query)
+    assert (
+        is_read_only_operation(
+            document, operation_name=operation_name, fields={"a", "b"}
+        )
+        is read_only
+    )
+
+
+def test_cached_query_handlers_route_to_replica(mocker):
+    app = create_app()
+    use_replica = mocker.patch.object(
+        execution.db, "use_replica", side_effect=contextlib.nullcontext
+    )
+
+    with app.app_context():
+        for query, routed in [
+            ("query { bases { id } }", False),
+            ("query { createdBoxes(baseId: 1) { __typename } }", True),
+        ]:
+            routing = contextlib.ExitStack()
+            parse, validate_query = create_cached_query_handlers(
+                schema=full_api_schema,
+                introspection=False,
+                check_beta_level=False,
+                replica_fields={"createdBoxes"},
+                routing=routing,
+            )
+            document = parse(None, {"query": query})
+            assert validate_query(full_api_schema, document) == []
+            assert use_replica.called is routed
+
+
+def test_data_loader_registry():
+    async def access_loaders():
+        registry = DataLoaderRegistry(LOADER_FACTORIES)
+        assert registry.used_loaders == []
+
+        loader = registry["box_loader"]
+        assert isinstance(loader, BoxLoader)
+        assert registry["box_loader"] is loader
+        assert registry["instock_items_count_for_base_loader"].metric is not None
+        assert registry.used_loaders == [
+            "box_loader",
+            "instock_items_count_for_base_loader",
+        ]
+        assert len(registry.available_loaders) == len(LOADER_FACTORIES)
+
+        with pytest.raises(KeyError):
+            registry["unknown_loader"]
+
+    run_coroutine(access_loaders())
@@ -0,0 +1,27 @@
+import pytest
+from boxtribute_server.models import history_messages
+from boxtribute_server.models.definitions.history import DbChangeHistory
+from boxtribute_server.models.utils import NO_SUCH_TABLE
+from peewee import ProgrammingError
+
+
+def test_save_box_history_messages_without_table(monkeypatch):
+    entries = [DbChangeHistory(id=3, table_name="stock", record_id=1)]
+
+    def insert(*conditions):
+        raise ProgrammingError(NO_SUCH_TABLE, "Table doesn't exist")
+
+    monkeypatch.setattr(history_messages, "_insert_box_history_messages", insert)
+    history_messages.save_box_history_messages(entries)
+
+    def insert(*conditions):
+        raise ProgrammingError(1142, "INSERT command denied")
+
+    monkeypatch.setattr(history_messages, "_insert_box_history_messages", insert)
+    with pytest.raises(ProgrammingError):
+        history_messages.save_box_history_messages(entries)
+
+    # Entries not referring to boxes are skipped
+    history_messages.save_box_history_messages(
+        [DbChangeHistory(id=4, table_name="people", record_id=1)]
+    )
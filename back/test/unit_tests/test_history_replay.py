@@ -0,0 +1,126 @@
+import random
+from datetime import datetime
+
+from boxtribute_server.business_logic.statistics.history_replay import (
+    ATTRIBUTES,
+    CREATED_DONATED,
+    DELETED,
+    STATE_CHANGED,
+    UNDELETED,
+    _merge_box_streams,
+    replay_box_history,
+)
+
+EVENTS = {
+    "Record created": CREATED_DONATED,
+    "Record deleted": DELETED,
+    "Box was undeleted.": UNDELETED,
+}
+
+
+def reconstruct_like_sql(changes, current, min_history_id):
+    """Literal translation of the correlated subqueries of the HistoryReconstruction
+    CTE in MOVED_BOXES_QUERY.
+    """
+    versions = []
+    for history_id, change, changed_on, from_int, to_int in changes:
+        if history_id < min_history_id:
+            continue
+        if to_int is None and change not in EVENTS:
+            continue
+        if change not in EVENTS and change != "box_state_id":
+            continue
+        version = []
+        for index, attribute in enumerate(ATTRIBUTES):
+            if change == attribute:
+                version.append(to_int)
+                continue
+            following = [c for c in changes if c[1] == attribute and c[0] > history_id]
+            previous = [c for c in changes if c[1] == attribute and c[0] < history_id]
+            value = following[0][3] if following else None
+            if value is None:
+                value = previous[-1][4] if previous else None
+            if value is None:
+                value = current[index]
+            version.append(value)
+        if change == "box_state_id":
+            previous_state = from_int if from_int is not None else to_int
+            row = (STATE_CHANGED, changed_on.date(), tuple(version), previous_state)
+        else:
+            row = (EVENTS[change], changed_on.date(), tuple(version), None)
+        versions.append(row)
+    return versions
+
+
+def test_replay_box_history():
+    # Box created in stock with 10 items, moved to Donated, items taken out, moved
+    # back to InStock in another location
+    changes = [
+        (1, "Record created", datetime(2023, 1, 1), None, None),
+        (2, "box_state_id", datetime(2023, 1, 2), 1, 5),
+        (3, "items", datetime(2023, 1, 3), 10, 4),
+        (4, "location_id", datetime(2023, 1, 4), 7, 8),
+        (5, "box_state_id", datetime(2023, 1, 4), 5, 1),
+    ]
+    current = (4, 8, 1, 20, 3)
+    versions = list(replay_box_history(changes, current, min_history_id=1))
+    assert versions == [
+        (CREATED_DONATED, datetime(2023, 1, 1).date(), (10, 7, 1, 20, 3), None),
+        (STATE_CHANGED, datetime(2023, 1, 2).date(), (10, 7, 5, 20, 3), 1),
+        (STATE_CHANGED, datetime(2023, 1, 4).date(), (4, 8, 1, 20, 3), 5),
+    ]
+
+    versions = list(replay_box_history(changes, current, min_history_id=3))
+    assert versions == [
+        (STATE_CHANGED, datetime(2023, 1, 4).date(), (4, 8, 1, 20, 3), 5),
+    ]
+    assert list(replay_box_history([], current, min_history_id=1)) == []
+
+
+def test_replay_box_history_parity_with_sql():
+    rng = random.Random(42)
+    kinds = [*ATTRIBUTES, *EVENTS, "comments"]
+    for _ in range(500):
+        changes = []
+        for history_id in range(1, rng.randint(1, 15)):
+            change = rng.choice(kinds)
+            from_int = rng.choice([None, 1, 2, 5])
+            to_int = rng.choice([None, 1, 5, 6])
+            if change in EVENTS:
+                from_int = to_int = None
+            changed_on = datetime(2023, 1, rng.randint(1, 3))
+            changes.append((history_id, change, changed_on, from_int, to_int))
+        current = tuple(rng.choice([None, 3, 4]) for _ in ATTRIBUTES)
+        min_history_id = rng.randint(1, 4)
+
+        versions = list(
+            replay_box_history(changes, current, min_history_id=min_history_id)
+        )
+        assert versions == reconstruct_like_sql(changes, current, min_history_id)
+
+
+def test_merge_box_streams():
+    created_on = datetime(2023, 1, 1)
+    history = [
+        (1, 10, "Record created", created_on, None, None),
+        # Box 2 missing from the box stream, e.g. moved to another base meanwhile
+        (2, 11, "Record created", created_on, None, None),
+        (3, 12, "Record created", created_on, None, None),
+        (3, 13, "items", created_on, 5, 4),
+        # Box 5 is beyond the end of the box stream
+        (5, 14, "Record created", created_on, None, None),
+    ]
+    boxes = iter([(1, 5), (3, 4), (4, 1)])
+    tags = iter([(2, 8), (3, 9), (3, 7), (4, 6)])
+    assert list(_merge_box_streams(iter(history), boxes, tags)) == [
+        ((1, 5), [(10, "Record created", created_on, None, None)], None),
+        (
+            (3, 4),
+            [
+                (12, "Record created", created_on, None, None),
+                (13, "items", created_on, 5, 4),
+            ],
+            "7,9",
+        ),
+    ]
+    assert list(_merge_box_streams(iter(history), iter([]), iter([]))) == []
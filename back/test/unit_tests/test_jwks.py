@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+import pytest
+from boxtribute_server.auth import decode_jwt, get_public_key
+from boxtribute_server.exceptions import AuthenticationFailed
+from boxtribute_server.jwks import PublicKeyCache
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+DOMAIN = "auth.example.org"
+
+
+def _create_jwk(key_id):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update(kid=key_id, use="sig", alg="RS256")
+    return private_key, jwk
+
+
+class KeyServer(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), KeyRequestHandler)
+        self.jwks = {"keys": []}
+        self.requests = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/.well-known/jwks.json"
+
+
+class KeyRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        body = json.dumps(self.server.jwks).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture
+def key_server():
+    server = KeyServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_public_key_cache(key_server, monkeypatch):
+    private_key, jwk = _create_jwk("key-1")
+    key_server.jwks["keys"] = [jwk]
+    cache = PublicKeyCache()
+
+    key = cache.get_key(key_server.url, "key-1")
+    assert key.public_numbers() == private_key.public_key().public_numbers()
+    assert cache.get_key(key_server.url) is key
+    assert cache.get_key(key_server.url, "key-1") is key
+    assert key_server.requests == 1
+    assert cache.info() == {"hits": 3, "fetches": 1, "key_sets": 1}
+
+    # Unknown key ID: the key set is not re-fetched within the minimum interval
+    with pytest.raises(AuthenticationFailed):
+        cache.get_key(key_server.url, "key-2")
+    assert key_server.requests == 1
+
+    # After key rotation, the key set is re-fetched for the new key ID
+    monkeypatch.setenv("AUTH0_JWKS_MIN_REFRESH_INTERVAL", "0")
+    new_private_key, new_jwk = _create_jwk("key-2")
+    key_server.jwks["keys"] = [new_jwk]
+    new_key = cache.get_key(key_server.url, "key-2")
+    assert new_key.public_numbers() == new_private_key.public_key().public_numbers()
+    assert key_server.requests == 2
+    with pytest.raises(AuthenticationFailed):
+        cache.get_key(key_server.url, "key-1")
+    assert key_server.requests == 3
+
+    # Past the TTL, cached keys are served while the key set is re-fetched in the
+    # background
+    monkeypatch.setenv("AUTH0_JWKS_TTL", "0")
+    assert cache.get_key(key_server.url, "key-2") is not None
+    for _ in range(100):
+        if cache.info()["fetches"] == 4:
+            break
+        time.sleep(0.01)
+    assert cache.info()["fetches"] == 4
+
+    cache.clear()
+    assert cache.info() == {"hits": 0, "fetches": 0, "key_sets": 0}
+
+
+def test_public_key_cache_unavailable_key_server(key_server):
+    url = key_server.url
+    key_server.shutdown()
+    key_server.server_close()
+    with pytest.raises(AuthenticationFailed) as exc_info:
+        PublicKeyCache().get_key(url, "key-1")
+    assert exc_info.value.status_code == 500
+
+
+def test_get_public_key(key_server, monkeypatch):
+    private_key, jwk = _create_jwk("key-1")
+    key_server.jwks["keys"] = [jwk]
+    monkeypatch.setenv("AUTH0_PUBLIC_KEY", "")
+    monkeypatch.setattr("boxtribute_server.auth.jwks_url", lambda _: key_server.url)
+    monkeypatch.setattr("boxtribute_server.auth.public_key_cache", PublicKeyCache())
+
+    payload = {"sub": "auth0|8", "aud": "api", "iss": f"https://{DOMAIN}/"}
+    token = jwt.encode(
+        payload, private_key, algorithm="RS256", headers={"kid": "key-1"}
+    )
+    public_key = get_public_key(DOMAIN, token)
+    assert (
+        decode_jwt(token=token, public_key=public_key, domain=DOMAIN, audience="api")
+        == payload
+    )
+
+    with pytest.raises(AuthenticationFailed):
+        get_public_key(DOMAIN, "invalid_token")
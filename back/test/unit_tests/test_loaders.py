@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from boxtribute_server.auth import CurrentUser
+from boxtribute_server.graph_ql.loaders import (
+    SizesForSizeRangeLoader,
+    UnitsForDimensionLoader,
+)
+from boxtribute_server.models.definitions.size import Size
+from boxtribute_server.models.definitions.size_range import SizeRange
+from boxtribute_server.models.definitions.size_range_size import SizeRangeSize
+from boxtribute_server.models.definitions.unit import Unit
+from boxtribute_server.sql_counter import SqlQueryCountingMixin, track_sql_queries
+from flask import g
+from peewee import SqliteDatabase
+
+
+class CountingSqliteDatabase(SqlQueryCountingMixin, SqliteDatabase):
+    pass
+
+
+MODELS = [Size, SizeRange, SizeRangeSize, Unit]
+
+
+@pytest.fixture
+def database():
+    database = CountingSqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS, bind_refs=False, bind_backrefs=False):
+        database.create_tables(MODELS)
+        for size_range_id in [1, 2, 3]:
+            SizeRange.create(id=size_range_id, label=f"range {size_range_id}")
+            for seq in [2, 1]:
+                size = Size.create(label=f"size {size_range_id}-{seq}")
+                SizeRangeSize.create(size=size, size_range=size_range_id, seq=seq)
+            Unit.create(
+                name=f"unit {size_range_id}",
+                symbol=f"u{size_range_id}",
+                conversion_factor=1,
+                dimension=size_range_id,
+            )
+        yield database
+
+
+def _load(loader_class, keys):
+    async def load():
+        # DataLoaders are bound to the event loop when created
+        return await loader_class().load_many(keys)
+
+    with track_sql_queries() as counter:
+        result = asyncio.run(load())
+    return result, counter
+
+
+def test_sizes_and_units_loaded_for_requested_keys_only(
+    no_db_client, database, monkeypatch
+):
+    monkeypatch.delenv("REFERENCE_DATA_CACHE", raising=False)
+    g.user = CurrentUser(id=1, organisation_id=1, base_ids={"size:read": [1]})
+
+    sizes, counter = _load(SizesForSizeRangeLoader, [3, 1, 4])
+    assert [[s.label for s in range_sizes] for range_sizes in sizes] == [
+        ["size 3-1", "size 3-2"],
+        ["size 1-1", "size 1-2"],
+        [],
+    ]
+    # A single query restricted to the requested size ranges, no full-table scan
+    assert counter.count == 1
+    assert "IN (...)" in next(iter(counter.shapes))
+
+    units, counter = _load(UnitsForDimensionLoader, [2, 4])
+    assert [[u.symbol for u in dimension_units] for dimension_units in units] == [
+        ["u2"],
+        [],
+    ]
+    assert counter.count == 1
+    assert "IN (...)" in next(iter(counter.shapes))
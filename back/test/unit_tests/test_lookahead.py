@@ -0,0 +1,124 @@
+from types import SimpleNamespace
+
+import graphql
+import pytest
+from boxtribute_server.auth import CurrentUser
+from boxtribute_server.graph_ql.lookahead import (
+    JoinPlan,
+    Relation,
+    plan_joins,
+    selected_field_names,
+)
+from boxtribute_server.models.definitions.size_range import SizeRange
+from boxtribute_server.models.definitions.unit import Unit
+from flask import g
+from peewee import SqliteDatabase
+
+
+class RecordingLoader:
+    def __init__(self):
+        self.primed = {}
+
+    def prime(self, key, value):
+        self.primed[key] = value
+
+
+def _info(query, context=None):
+    document = graphql.parse(query)
+    operation = graphql.get_operation_ast(document)
+    fragments = {
+        d.name.value: d
+        for d in document.definitions
+        if isinstance(d, graphql.FragmentDefinitionNode)
+    }
+    return SimpleNamespace(
+        field_nodes=[operation.selection_set.selections[0]],
+        fragments=fragments,
+        context=context,
+    )
+
+
+def test_selected_field_names():
+    info = _info("""query { boxes(baseId: 1) {
+        totalCount
+        elements { id product { name } ...BoxFields ... on Box { qrCode { code } } }
+    } }
+    fragment BoxFields on Box { location { name } size { label } }""")
+    assert selected_field_names(info) == {"totalCount", "elements"}
+    assert selected_field_names(info, "elements") == {
+        "id",
+        "product",
+        "location",
+        "size",
+        "qrCode",
+    }
+    assert selected_field_names(info, "elements", "product") == {"name"}
+    assert selected_field_names(info, "pageInfo") == set()
+
+
+@pytest.fixture
+def database():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx([Unit, SizeRange], bind_refs=False, bind_backrefs=False):
+        database.create_tables([Unit, SizeRange])
+        SizeRange.create(id=1, label="mass")
+        SizeRange.create(id=2, label="volume")
+        Unit.create(name="kilogram", symbol="kg", conversion_factor=1, dimension=1)
+        Unit.create(name="liter", symbol="l", conversion_factor=1, dimension=2)
+        # Dangling reference
+        Unit.create(name="other", symbol="o", conversion_factor=1, dimension=9)
+        yield database
+
+
+def test_join_plan(database):
+    loader = RecordingLoader()
+    relation = Relation(field=Unit.dimension, loader_name="size_range_loader")
+    plan = JoinPlan(Unit, [relation], {"size_range_loader": loader})
+
+    units = plan.fetch(Unit.select().order_by(Unit.id))
+    assert [u.symbol for u in units] == ["kg", "l", "o"]
+    assert {i: s.label for i, s in loader.primed.items()} == {1: "mass", 2: "volume"}
+
+    # The referenced table might be joined already, e.g. for filtering
+    loader.primed.clear()
+    units = plan.fetch(
+        Unit.select()
+        .join(SizeRange, on=(Unit.dimension == SizeRange.id))
+        .where(SizeRange.label != "volume")
+    )
+    assert [u.symbol for u in units] == ["kg"]
+    assert {i: s.label for i, s in loader.primed.items()} == {1: "mass"}
+
+    # Nothing joined or primed for empty plans
+    plan = JoinPlan(Unit, [], {"size_range_loader": loader})
+    assert plan.join(Unit.select()).sql() == Unit.select().sql()
+
+
+def test_plan_joins(no_db_client, monkeypatch):
+    relations = {
+        "dimension": [Relation(field=Unit.dimension, loader_name="size_range_loader")],
+        "sizeRange": [
+            Relation(
+                field=Unit.dimension,
+                loader_name="size_range_loader",
+                permission="size_range:read",
+            )
+        ],
+    }
+    g.user = CurrentUser(id=1, organisation_id=1, base_ids={"unit:read": [1]})
+    info = _info("query { units { dimension { id } symbol } }", context={})
+    monkeypatch.delenv("REFERENCE_DATA_CACHE", raising=False)
+    assert [r.field for r in plan_joins(info, Unit, relations).relations] == [
+        Unit.dimension
+    ]
+
+    # Tables served by the reference data cache are not joined
+    monkeypatch.setenv("REFERENCE_DATA_CACHE", "true")
+    assert plan_joins(info, Unit, relations).relations == []
+    monkeypatch.delenv("REFERENCE_DATA_CACHE")
+
+    # Relations requiring a permission that the user isn't granted are not joined
+    info = _info("query { units { sizeRange { id } } }", context={})
+    assert plan_joins(info, Unit, relations).relations == []
+    g.user = CurrentUser(id=1, organisation_id=1, base_ids={"size_range:read": [1]})
+    assert len(plan_joins(info, Unit, relations).relations) == 1
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from boxtribute_server.graph_ql.pagination import (
+    Cursor,
+    _encode_cursor,
+    generate_page,
+)
+from boxtribute_server.models.definitions.box import Box
+
+
+def test_generate_page_defers_queries(mocker, monkeypatch):
+    selection = mocker.MagicMock()
+    selection.model.id = 0
+    elements = [mocker.Mock(id=i) for i in range(1, 4)]
+    page = generate_page(
+        elements=elements, cursor=Cursor(), selection=selection, limit=2
+    )
+    assert page["elements"] == elements[:2]
+    page_info = page["page_info"]
+    assert page_info.has_next_page is True
+    # No database query run as long as hasPreviousPage and totalCount not accessed
+    selection.where.assert_not_called()
+    selection.count.assert_not_called()
+
+    selection.where.return_value.get_or_none.return_value = None
+    assert page_info.has_previous_page is False
+    assert page_info.has_previous_page is False
+    selection.where.assert_called_once()
+
+    selection.count.return_value = 7
+    assert page["total_count"](None) == 7
+    selection.count.assert_called_once_with()
+
+    monkeypatch.setenv("PAGINATION_TOTAL_COUNT_LIMIT", "5")
+    capped_selection = selection.order_by.return_value.limit.return_value
+    capped_selection.count.return_value = 5
+    assert page["total_count"](None) == 5
+    selection.order_by.return_value.limit.assert_called_once_with(5)
+
+
+def test_cursor_with_sort_value(mocker):
+    sort_field = Box.last_modified_on
+    box = mocker.Mock(id=12, last_modified_on=datetime(2024, 1, 2, 3, 4, 5))
+    cursor = Cursor(_encode_cursor(box, sort_field))
+    assert cursor.value == 12
+    assert cursor.has_sort_value
+    assert sort_field.python_value(cursor.sort_value) == box.last_modified_on
+
+    box.last_modified_on = None
+    cursor = Cursor(_encode_cursor(box, sort_field), forwards=False)
+    assert cursor.value == 12
+    assert cursor.has_sort_value
+    assert cursor.sort_value is None
+
+    # Plain ID cursors remain valid
+    cursor = Cursor(_encode_cursor(box))
+    assert cursor.value == 12
+    assert not cursor.has_sort_value
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+from boxtribute_server.graph_ql.persisted_queries import (
+    PersistedQueryHashMismatch,
+    PersistedQueryNotFound,
+    PersistedQueryRegistry,
+    compute_query_hash,
+)
+
+
+def _payload(query_hash, **kwargs):
+    return {
+        "extensions": {"persistedQuery": {"version": 1, "sha256Hash": query_hash}},
+        **kwargs,
+    }
+
+
+def test_persisted_query_registry(tmp_path):
+    registry = PersistedQueryRegistry(max_size=1)
+    query = "query { bases { id } }"
+    other_query = "query { tags { id } }"
+    query_hash = compute_query_hash(query)
+    other_query_hash = compute_query_hash(other_query)
+
+    # Payloads without persisted-query extension are passed through
+    assert registry.resolve({"query": query}) == {"query": query}
+    assert registry.lookup({"query": query}) == query
+    assert registry.lookup(None) is None
+
+    with pytest.raises(PersistedQueryNotFound):
+        registry.resolve(_payload(query_hash))
+    assert registry.lookup(_payload(query_hash)) is None
+    with pytest.raises(PersistedQueryHashMismatch):
+        registry.resolve(_payload(query_hash, query=other_query))
+
+    registry.resolve(_payload(query_hash, query=query))
+    assert registry.resolve(_payload(query_hash))["query"] == query
+    assert registry.lookup(_payload(query_hash)) == query
+
+    # Registering another query evicts the first one
+    registry.resolve(_payload(other_query_hash, query=other_query))
+    assert registry.get(other_query_hash) == other_query
+    assert registry.get(query_hash) is None
+
+    # Preloaded queries are never evicted
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps({"operations": [{"id": "x", "body": query}]}))
+    registry.load_manifest(manifest)
+    registry.resolve(_payload(other_query_hash, query=other_query))
+    assert registry.get(query_hash) == query
+
+    manifest.write_text(json.dumps({"abc": "query { users { id } }"}))
+    registry.load_manifest(manifest)
+    assert registry.get(compute_query_hash("query { users { id } }")) is not None
@@ -0,0 +1,67 @@
+import asyncio
+from functools import partial
+
+import ariadne
+from aiodataloader import DataLoader
+from boxtribute_server.graph_ql.loaders import DataLoaderRegistry
+from boxtribute_server.graph_ql.profiling import ProfilingExtension
+
+type_defs = """
+    type Query {
+        items: [Item!]!
+    }
+    type Item {
+        id: Int!
+        parent: Item
+    }
+"""
+
+
+class ParentLoader(DataLoader):
+    async def batch_load_fn(self, keys):
+        await asyncio.sleep(0)
+        return [{"id": key} for key in keys]
+
+
+query = ariadne.QueryType()
+item = ariadne.ObjectType("Item")
+
+
+@query.field("items")
+def resolve_items(*_):
+    return [{"id": i, "parent_id": i % 2} for i in range(4)]
+
+
+@item.field("parent")
+def resolve_item_parent(obj, info):
+    return info.context["parent_loader"].load(obj["parent_id"])
+
+
+schema = ariadne.make_executable_schema(type_defs, query, item)
+
+
+def test_profiling_extension():
+    context = DataLoaderRegistry({"parent_loader": ParentLoader})
+    success, result = asyncio.run(
+        ariadne.graphql(
+            schema,
+            data={"query": "query { items { id parent { id } } }"},
+            context_value=context,
+            extensions=[partial(ProfilingExtension, in_response=True)],
+        )
+    )
+    assert success
+
+    profile = result["extensions"]["profile"]
+    # Default resolvers (e.g. Item.id) are not profiled
+    assert set(profile["resolvers"]) == {"items", "items.parent"}
+    assert profile["resolvers"]["items"]["calls"] == 1
+    assert profile["resolvers"]["items.parent"]["calls"] == 4
+    assert profile["resolvers"]["items.parent"]["duration"] >= 0
+
+    loader_profile = profile["data_loaders"]["parent_loader"]
+    assert loader_profile["batches"] == 1
+    assert loader_profile["batch_sizes"] == [2]
+    assert loader_profile["keys"] == 2
+    assert loader_profile["deduplicated_keys"] == 2
+    assert loader_profile["duration"] >= 0
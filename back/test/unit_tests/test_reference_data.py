@@ -0,0 +1,72 @@
+import pytest
+from boxtribute_server.models.definitions.size_range import SizeRange
+from boxtribute_server.models.definitions.unit import Unit
+from boxtribute_server.models.reference_data import ReferenceDataCache
+from peewee import SqliteDatabase
+
+
+@pytest.fixture
+def database():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx([Unit, SizeRange], bind_refs=False, bind_backrefs=False):
+        database.create_tables([Unit, SizeRange])
+        for dimension_id in [1, 2]:
+            SizeRange.create(id=dimension_id, label=f"dimension {dimension_id}")
+        Unit.create(name="kilogram", symbol="kg", conversion_factor=1, dimension=1)
+        Unit.create(name="liter", symbol="l", conversion_factor=1, dimension=2)
+        yield database
+
+
+def test_reference_data_cache(database, monkeypatch):
+    cache = ReferenceDataCache(version_fields={Unit: [Unit.id]})
+
+    # Disabled cache loads from database on every access
+    monkeypatch.delenv("REFERENCE_DATA_CACHE", raising=False)
+    assert cache.rows(Unit) is not cache.rows(Unit)
+    assert cache.get(Unit, 1).symbol == "kg"
+    assert cache.info()["loads"] == 0
+
+    monkeypatch.setenv("REFERENCE_DATA_CACHE", "true")
+    monkeypatch.setenv("REFERENCE_DATA_CACHE_CHECK_INTERVAL", "3600")
+    units = cache.by_id(Unit)
+    assert [u.symbol for u in units.values()] == ["kg", "l"]
+    # Rows are copied when handed out
+    assert cache.by_id(Unit)[1] is not units[1]
+    assert [u.symbol for u in cache.grouped(Unit.dimension)[2]] == ["l"]
+    assert cache.get(Unit, 2).symbol == units[2].symbol
+    with pytest.raises(Unit.DoesNotExist):
+        cache.get(Unit, 3)
+    assert cache.info() == {
+        "hits": 4,
+        "loads": 1,
+        "version_checks": 0,
+        "hit_rate": 0.8,
+        "tables": 1,
+    }
+
+    # New row is only detected after the check interval
+    Unit.create(name="gram", symbol="g", conversion_factor=0.001, dimension=1)
+    assert len(cache.rows(Unit)) == 2
+    monkeypatch.setenv("REFERENCE_DATA_CACHE_CHECK_INTERVAL", "0")
+    assert len(cache.rows(Unit)) == 3
+    assert [u.symbol for u in cache.grouped(Unit.dimension)[1]] == ["kg", "g"]
+
+    # Unchanged version
+    table = cache.table(Unit)
+    assert cache.table(Unit) is table
+    assert cache.info()["loads"] == 2
+    assert cache.info()["version_checks"] == 4
+
+    Unit.delete().where(Unit.id == 3).execute()
+    assert len(cache.rows(Unit)) == 2
+
+    # Accessing a foreign key of a handed-out row doesn't modify the cached row
+    unit = cache.get(Unit, 1)
+    unit.name = "kilo"
+    assert unit.dimension.label == "dimension 1"
+    cached_unit = cache.table(Unit).by_id()[1]
+    assert cached_unit.name == "kilogram"
+    assert cached_unit.__rel__ == {}
+
+    cache.clear()
+    assert cache.info()["tables"] == 0
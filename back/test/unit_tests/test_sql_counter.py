@@ -0,0 +1,68 @@
+import asyncio
+
+from boxtribute_server.sql_counter import (
+    SqlQueryCounter,
+    normalize_sql,
+    track_sql_queries,
+)
+
+
+def test_normalize_sql():
+    assert (
+        normalize_sql("""SELECT `t1`.`id` FROM `stock` AS `t1`
+            WHERE ((`t1`.`id` IN (%s, %s, %s)) AND (`t1`.`box_state_id` = %s))""")
+        == "SELECT `t1`.`id` FROM `stock` AS `t1` "
+        "WHERE ((`t1`.`id` IN (...)) AND (`t1`.`box_state_id` = %s))"
+    )
+    assert normalize_sql("SELECT * FROM tags WHERE id = 3 AND name = 'a\\'b'") == (
+        "SELECT * FROM tags WHERE id = ? AND name = ?"
+    )
+    # Lists of placeholders of different length result in the same shape
+    assert normalize_sql("SELECT id FROM t WHERE id IN (%s,%s)") == normalize_sql(
+        "SELECT id FROM t WHERE id IN (%s, %s, %s, %s)"
+    )
+
+
+def test_sql_query_counter():
+    counter = SqlQueryCounter()
+    for i in range(4):
+        counter.record(f"SELECT name FROM tags WHERE id = {i}")
+    counter.record("SELECT id FROM stock")
+
+    assert counter.count == 5
+    assert counter.repeated_shapes(threshold=3) == [
+        {"sql": "SELECT name FROM tags WHERE id = ?", "count": 4}
+    ]
+    assert counter.repeated_shapes(threshold=4) == []
+    assert counter.writes == 0
+    assert counter.report(threshold=4) == {
+        "count": 5,
+        "shapes": {"SELECT name FROM tags WHERE id = ?": 4, "SELECT id FROM stock": 1},
+        "repeated": [],
+    }
+
+
+def test_sql_query_counter_writes():
+    counter = SqlQueryCounter()
+    counter.record("INSERT INTO tags (name) VALUES ('a')")
+    counter.record("update stock SET items = 1")
+    counter.record("DELETE FROM tags_relations WHERE id = 1")
+    counter.record("SELECT updated FROM stock")
+    assert counter.writes == 3
+
+
+async def _record_queries():
+    with track_sql_queries() as counter:
+        counter.record("SELECT 1")
+        await asyncio.sleep(0)
+        counter.record("SELECT 2")
+    return counter
+
+
+def test_track_sql_queries():
+    with track_sql_queries() as outer_counter:
+        inner_counter = asyncio.run(_record_queries())
+    assert inner_counter.count == 2
+    # Statements recorded in a nested counter are also recorded in the outer one
+    assert outer_counter.count == 2
+    assert outer_counter.shapes == {"SELECT ?": 2}
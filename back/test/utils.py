@@ -1,3 +1,6 @@
+from boxtribute_server.sql_counter import track_sql_queries
+
+
 def _assert_erroneous_request(
     client,
     query,
@@ -96,6 +99,18 @@ def assert_successful_request(client, query, field=None, **kwargs):
     return response.json["data"][field]
 
 
+def assert_max_sql_queries(client, query, max_count, field=None, **kwargs):
+    """Send GraphQL request with query using given client.
+    Assert response HTTP code 200, and that at most `max_count` SQL statements were
+    executed. Return main response JSON data field.
+    """
+    with track_sql_queries() as counter:
+        response = _assert_web_request(client, query, **kwargs)
+    assert counter.count <= max_count, counter.report()
+    field = field or _extract_field(query)
+    return response.json["data"][field]
+
+
 def _assert_web_request(
     client, query, *, http_code=200, endpoint="graphql", expect_errors=False
 ):